@@ -1,17 +1,29 @@
-import logging
-from flask import Flask, redirect, url_for, current_app, render_template
+import atexit
+from flask import Flask, redirect, url_for, current_app, render_template, request, got_request_exception
 from flask_login import LoginManager, current_user, login_required
 from flask_wtf.csrf import CSRFProtect
 from flask_mail import Mail
 from app.presentation.routes.rrhh_routes import rrhh_bp
 
 from .config import Config
+from .commands import register_commands
+from .core.logging_config import init_logging, stop_logging
 from .database.connector import init_app_db
 from .domain.models.usuario import Usuario
 from .application.services.email_service import EmailService
+from .infrastructure.mail.mail_dispatcher import MailDispatcher
+from .infrastructure.persistence.audit_writer import AuditWriter
+from .infrastructure.persistence.bitacora_archive import BitacoraArchive
 from .application.services.usuario_service import UsuarioService
 from .application.services.legajo_service import LegajoService
 from .application.services.audit_service import AuditService
+from .application.services.dossier_service import DossierService
+from .application.services.expiry_digest_service import ExpiryDigestService
+from .application.services.error_capture_service import ErrorCaptureService
+from .application.services.notification_service import NotificationBroadcaster
+from .utils.legajo_cache import LegajoCache
+from .utils.rate_limiter import LoginRateLimiter
+from .core.password_pool import PasswordVerificationPool
 
 from .application.services.solicitud_service import SolicitudService 
 from .application.services.backup_service import BackupService 
@@ -28,6 +40,7 @@ from .presentation.routes.auth_routes import auth_bp
 from .presentation.routes.legajo_routes import legajo_bp
 from .presentation.routes.sistemas_routes import sistemas_bp
 from .presentation.routes.rrhh_routes import rrhh_bp
+from .presentation.routes.notificaciones_routes import notificaciones_bp
 
 # Inicialización de extensiones de Flask
 login_manager = LoginManager()
@@ -45,6 +58,17 @@ def load_user(user_id):
         return repo.find_by_id(int(user_id)) 
     return None
 
+def _capturar_error(sender, exception, **extra):
+    """Registra en la captura de errores cada excepción no controlada de una petición."""
+    try:
+        usuario_id = current_user.id if current_user.is_authenticated else None
+    except Exception:
+        # El propio error puede impedir cargar el usuario (ej. base de datos caída).
+        usuario_id = None
+    sender.config['ERROR_CAPTURE_SERVICE'].capture(
+        exception, modulo=request.endpoint, usuario_id=usuario_id, ruta=request.path
+    )
+
 def create_app():
     """
     Factoría de la aplicación Flask.
@@ -58,7 +82,10 @@ def create_app():
     )
     app.config.from_object(Config)
 
-    logging.basicConfig(level=logging.INFO)
+    # Registro no bloqueante (cola + hilo escritor) con id de correlación por petición. Se detiene
+    # al final (atexit es LIFO) para que los demás servicios puedan registrar mientras se cierran.
+    init_logging(app)
+    atexit.register(stop_logging)
 
     init_app_db(app)
     login_manager.init_app(app)
@@ -81,24 +108,121 @@ def create_app():
         app.config['AUDIT_REPOSITORY'] = audit_repo
         
         # --- 2. Inicialización de Servicios ---
-        email_service = EmailService(mail)
-        audit_service = AuditService(audit_repo) # Este es el servicio que necesitamos pasar
+        mail_dispatcher = MailDispatcher(
+            mail,
+            max_queue=app.config['MAIL_QUEUE_MAX_SIZE'],
+            batch_size=app.config['MAIL_QUEUE_BATCH_SIZE'],
+            max_retries=app.config['MAIL_SEND_MAX_RETRIES'],
+            idle_seconds=app.config['MAIL_SMTP_IDLE_SECONDS']
+        )
+        email_service = EmailService(mail, mail_dispatcher)
+        app.config['EMAIL_SERVICE'] = email_service
+        audit_writer = AuditWriter(
+            audit_repo,
+            app.config['AUDIT_SPILL_FILE'],
+            max_queue=app.config['AUDIT_QUEUE_MAX_SIZE'],
+            batch_size=app.config['AUDIT_BATCH_SIZE'],
+            flush_interval=app.config['AUDIT_FLUSH_INTERVAL_SECONDS']
+        )
+        audit_service = AuditService(
+            audit_repo, audit_writer,
+            read_actions=app.config['AUDIT_READ_ACTIONS'],
+            coalesce_seconds=app.config['AUDIT_READ_COALESCE_SECONDS'],
+            archive=BitacoraArchive(app.config['AUDIT_ARCHIVE_DIR']),
+            detail_max_bytes=app.config['AUDIT_DETAIL_MAX_BYTES'],
+            detail_max_value_chars=app.config['AUDIT_DETAIL_MAX_VALUE_CHARS']
+        ) # Este es el servicio que necesitamos pasar
+        
+        app.config['ERROR_CAPTURE_SERVICE'] = ErrorCaptureService(
+            audit_service, audit_repo,
+            flush_interval=app.config['ERROR_FLUSH_INTERVAL_SECONDS'],
+            max_groups=app.config['ERROR_MAX_GROUPS']
+        )
         
         # 🔑 CORRECCIÓN CRÍTICA: Se pasa audit_service al constructor del BackupService
         app.config['BACKUP_SERVICE'] = BackupService(backup_repo, app.config, audit_service)
         
-        # Servicio de Solicitudes (necesario para la vista de Sistemas)
-        app.config['SOLICITUDES_SERVICE'] = SolicitudService(solicitud_repo)
-        
         # Servicios existentes
-        app.config['USUARIO_SERVICE'] = UsuarioService(usuario_repo, email_service)
+        password_pool = PasswordVerificationPool(
+            max_workers=app.config['PASSWORD_POOL_WORKERS'],
+            max_queue=app.config['PASSWORD_POOL_MAX_QUEUE'],
+            timeout_seconds=app.config['PASSWORD_POOL_TIMEOUT_SECONDS']
+        )
+        app.config['PASSWORD_POOL'] = password_pool
+        app.config['LOGIN_RATE_LIMITER'] = LoginRateLimiter(
+            ip_capacity=app.config['LOGIN_RATE_IP_BURST'],
+            ip_per_minute=app.config['LOGIN_RATE_IP_PER_MINUTE'],
+            user_capacity=app.config['LOGIN_RATE_USER_BURST'],
+            user_per_minute=app.config['LOGIN_RATE_USER_PER_MINUTE']
+        )
+        app.config['USUARIO_SERVICE'] = UsuarioService(usuario_repo, email_service, password_pool)
         app.config['AUDIT_SERVICE'] = audit_service
-        app.config['LEGAJO_SERVICE'] = LegajoService(personal_repo, audit_service)
+        legajo_cache = LegajoCache(app.config['LEGAJO_CACHE_MAX_BYTES'], app.config['LEGAJO_CACHE_TTL_SECONDS'])
+        app.config['LEGAJO_SERVICE'] = LegajoService(personal_repo, audit_service, legajo_cache=legajo_cache)
+        # Servicio de Solicitudes (necesario para la vista de Sistemas)
+        app.config['SOLICITUDES_SERVICE'] = SolicitudService(solicitud_repo, audit_service, app.config['LEGAJO_SERVICE'])
+        app.config['NOTIFICATION_SERVICE'] = NotificationBroadcaster(
+            app.config['SOLICITUDES_SERVICE'], app.config['LEGAJO_SERVICE'],
+            poll_seconds=app.config['NOTIFY_POLL_SECONDS'],
+            expiry_days=app.config['NOTIFY_EXPIRY_DAYS']
+        )
+        app.config['DOSSIER_SERVICE'] = DossierService(
+            personal_repo, audit_service, app.config['DOSSIER_OUTPUT_DIR'], app.config['DOSSIER_MAX_WORKERS'],
+            max_pages=app.config['DOSSIER_MAX_PAGES'], max_bytes=app.config['DOSSIER_MAX_BYTES']
+        )
+        app.config['EXPIRY_DIGEST_SERVICE'] = ExpiryDigestService(
+            app.config['LEGAJO_SERVICE'], usuario_repo, email_service, app.config['EXPIRY_DIGEST_STATE_FILE'],
+            thresholds=app.config['EXPIRY_DIGEST_THRESHOLDS'],
+            fallback_roles=app.config['EXPIRY_DIGEST_FALLBACK_ROLES'],
+            send_hour=app.config['EXPIRY_DIGEST_HOUR'],
+            rate_per_minute=app.config['MAIL_RATE_LIMIT_PER_MINUTE'],
+            max_retries=app.config['MAIL_SEND_MAX_RETRIES']
+        )
+
+    # Tareas en segundo plano: se inician con la primera petición que atiende el proceso, de modo
+    # que no corren en los comandos `flask ...` ni en el proceso padre del recargador (debug=True),
+    # que nunca atienden peticiones.
+    @app.before_request
+    def _iniciar_tareas_en_segundo_plano():
+        if app.config.get('TAREAS_EN_SEGUNDO_PLANO_INICIADAS'):
+            return
+        app.config['TAREAS_EN_SEGUNDO_PLANO_INICIADAS'] = True
+        # Carga del índice de búsqueda y el mapa de DNIs; hasta que terminen, las consultas
+        # recurren a la base de datos.
+        app.config['LEGAJO_SERVICE'].warm_up_in_memory_data(app)
+        # Resumen diario de vencimientos por correo (solo si hay servidor de correo configurado).
+        if app.config['EXPIRY_DIGEST_ENABLED'] and app.config.get('MAIL_SERVER'):
+            app.config['EXPIRY_DIGEST_SERVICE'].start_scheduler(app)
+        # Backups programados (FULL, DIFERENCIAL y LOG) según el plan de la configuración.
+        if app.config['BACKUP_SCHEDULE_ENABLED']:
+            app.config['BACKUP_SERVICE'].start_scheduler(app)
+
+    # Hilo emisor de correos; al cerrar el proceso se envía lo que quede en la cola.
+    mail_dispatcher.start(app)
+    atexit.register(mail_dispatcher.stop)
+
+    # Hilo escritor de la bitácora; al cerrar el proceso se escriben (o guardan en disco) los eventos pendientes.
+    audit_writer.start(app)
+    atexit.register(audit_writer.stop)
+    # atexit ejecuta en orden inverso: los totales de lecturas agrupadas se encolan antes de detener el escritor.
+    atexit.register(audit_service.flush_read_events)
+
+    # Captura de errores no controlados: se agrupan por huella y se vuelcan periódicamente a la bitácora.
+    app.config['ERROR_CAPTURE_SERVICE'].start(app)
+    atexit.register(app.config['ERROR_CAPTURE_SERVICE'].stop)
+    got_request_exception.connect(_capturar_error, app)
+
+    # Notificaciones del tablero: un consultor compartido por proceso para todos los tableros abiertos.
+    app.config['NOTIFICATION_SERVICE'].start(app)
+    atexit.register(app.config['NOTIFICATION_SERVICE'].stop)
+
+    register_commands(app)
     
     # --- Registro de Blueprints ---
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(legajo_bp, url_prefix='/legajos')
     app.register_blueprint(sistemas_bp, url_prefix='/sistemas')
+    app.register_blueprint(notificaciones_bp, url_prefix='/notificaciones')
 
     app.register_blueprint(rrhh_bp) 
 
@@ -1,27 +1,188 @@
 # RUTA: app/application/services/audit_service.py
 
-# Importa la librería para manejar formato JSON.
-import json
+import threading
+import time
+from datetime import datetime, date, timedelta
+from app.utils.pagination import KeysetPagination
+from app.utils.audit_detail import build_detail
 
 # Define el servicio para la lógica de negocio de auditoría.
 class AuditService:
     # El constructor inyecta la dependencia del repositorio de auditoría.
-    def __init__(self, auditoria_repository):
+    # Si se indica un escritor en lote (AuditWriter), los eventos se encolan en lugar de escribirse en la petición.
+    # Las acciones de solo lectura (`read_actions`) se agrupan: se registra la primera de cada
+    # usuario/módulo/acción y las siguientes dentro de `coalesce_seconds` solo se cuentan; al cerrar
+    # la ventana se escribe una fila con el total. Con coalesce_seconds=0 todo se registra tal cual.
+    # Con `archive` (BitacoraArchive) las consultas incluyen también los registros ya archivados.
+    # El detalle se limita a los campos permitidos por módulo (ver app/utils/audit_detail.py) y a
+    # `detail_max_bytes` bytes, con textos recortados a `detail_max_value_chars` caracteres.
+    def __init__(self, auditoria_repository, audit_writer=None, read_actions=('CONSULTA',), coalesce_seconds=0,
+                 archive=None, detail_max_bytes=4000, detail_max_value_chars=500):
         self._audit_repo = auditoria_repository
+        self._audit_writer = audit_writer
+        self._archive = archive
+        self.detail_max_bytes = detail_max_bytes
+        self.detail_max_value_chars = detail_max_value_chars
+        self.read_actions = frozenset(read_actions)
+        self.coalesce_seconds = coalesce_seconds
+        self._lecturas = {}
+        self._lecturas_lock = threading.Lock()
 
     # Orquesta el registro de un evento.
     # Usamos detalle_dict para aceptar un diccionario que luego serializamos a JSON string.
-    def log(self, id_usuario, modulo, accion, descripcion, detalle_dict=None):
-        detalle_json = None
-        # Convierte el diccionario de detalles a un string JSON si existe.
-        if detalle_dict:
-            # Utilizamos default=str para manejar objetos no serializables como datetime
-            detalle_json = json.dumps(detalle_dict, default=str)
-        
-        # Llama al método del repositorio para guardar el evento en la base de datos.
+    # Si se pasa `anterior` (valores previos a una actualización), solo se guardan los campos que cambiaron.
+    def log(self, id_usuario, modulo, accion, descripcion, detalle_dict=None, anterior=None):
+        if self.coalesce_seconds:
+            # Cualquier evento aprovecha para cerrar las ventanas de lectura ya vencidas.
+            if self._agrupar_lectura(id_usuario, modulo, accion, descripcion, accion in self.read_actions):
+                return
+        self._escribir(id_usuario, modulo, accion, descripcion, detalle_dict, anterior)
+
+    def _escribir(self, id_usuario, modulo, accion, descripcion, detalle_dict=None, anterior=None):
+        # Convierte el diccionario de detalles a un string JSON compacto (o None si no queda nada).
+        detalle_json = build_detail(
+            modulo, accion, detalle_dict, anterior,
+            max_bytes=self.detail_max_bytes, max_value_chars=self.detail_max_value_chars
+        )
+
+        # Encola el evento para la escritura en lote; si el escritor no está activo (ej. aún no
+        # iniciado), se guarda directamente en la base de datos como antes.
+        if self._audit_writer is not None and self._audit_writer.enqueue(id_usuario, modulo, accion, descripcion, detalle_json):
+            return
         # El repositorio espera un string JSON o NULL.
         self._audit_repo.log_event(id_usuario, modulo, accion, descripcion, detalle_json)
 
+    # Devuelve True si la lectura quedó contada en una ventana abierta (y no debe escribirse ahora).
+    def _agrupar_lectura(self, id_usuario, modulo, accion, descripcion, es_lectura):
+        ahora = time.monotonic()
+        clave = (id_usuario, modulo, accion)
+        with self._lecturas_lock:
+            vencidas = self._extraer_ventanas_vencidas(ahora)
+            ventana = self._lecturas.get(clave) if es_lectura else None
+            agrupada = ventana is not None
+            if agrupada:
+                ventana['conteo'] += 1
+                ventana['hasta'] = datetime.now()
+                if len(ventana['descripciones']) < 20 and descripcion not in ventana['descripciones']:
+                    ventana['descripciones'].append(descripcion)
+            elif es_lectura:
+                self._lecturas[clave] = {'inicio': ahora, 'desde': datetime.now(), 'hasta': None, 'conteo': 0, 'descripciones': []}
+        self._escribir_resumenes(vencidas)
+        return agrupada
+
+    def _extraer_ventanas_vencidas(self, ahora=None):
+        # Se llama con el lock tomado. Con ahora=None se extraen todas las ventanas.
+        vencidas = []
+        for clave, ventana in list(self._lecturas.items()):
+            if ahora is None or ahora - ventana['inicio'] >= self.coalesce_seconds:
+                vencidas.append((clave, self._lecturas.pop(clave)))
+        return vencidas
+
+    def _escribir_resumenes(self, ventanas):
+        for (id_usuario, modulo, accion), ventana in ventanas:
+            if not ventana['conteo']:
+                continue
+            self._escribir(
+                id_usuario, modulo, accion,
+                f"Se agruparon {ventana['conteo']} eventos {accion} adicionales del módulo {modulo}.",
+                {
+                    'agrupados': ventana['conteo'],
+                    'desde': ventana['desde'],
+                    'hasta': ventana['hasta'],
+                    'descripciones': ventana['descripciones'],
+                }
+            )
+
+    # Escribe los totales de todas las ventanas de lectura abiertas (se llama al cerrar la aplicación).
+    def flush_read_events(self):
+        with self._lecturas_lock:
+            ventanas = self._extraer_ventanas_vencidas()
+        self._escribir_resumenes(ventanas)
+
+    # Métricas de la cola de escritura de la bitácora (None si la escritura es directa).
+    def get_writer_metrics(self):
+        if self._audit_writer is None:
+            return None
+        return self._audit_writer.metrics()
+
     # Orquesta la obtención de los registros de auditoría.
     def get_logs(self, page, per_page):
         return self._audit_repo.get_all_logs_paginated(page, per_page)
+
+    # Obtiene una página de la bitácora con filtros (username, modulo, accion, desde, hasta)
+    # y paginación por cursor. Un cursor inválido se trata como la primera página.
+    def get_logs_filtered(self, filters, per_page=20, cursor=None, direction='next'):
+        clave = KeysetPagination.decode_cursor(cursor) if cursor else None
+        filtros = {k: v for k, v in (filters or {}).items() if v}
+        actual = self._audit_repo.get_logs_keyset(filtros, per_page, clave, direction)
+        if self._archive is None:
+            return actual
+        return self._combinar_con_archivo(actual, filtros, per_page, clave, direction)
+
+    # Completa una página de la tabla con los registros archivados que correspondan, con el mismo
+    # orden (fecha_hora, id_bitacora). Los segmentos que no pueden entrar en la página no se leen.
+    def _combinar_con_archivo(self, actual, filtros, per_page, clave, direction):
+        hacia_atras = direction == 'prev' and clave is not None
+        llave = lambda r: (r['fecha_hora'], r['id_bitacora'])
+        limite = None
+        if len(actual.items) == per_page:
+            # La página de la tabla está llena: solo sirven registros archivados mejores que su extremo.
+            limite = llave(actual.items[0] if hacia_atras else actual.items[-1])
+        archivados = self._archive.query(filtros, per_page + 1, clave, 'prev' if hacia_atras else 'next', limite)
+
+        # Un registro puede estar en ambos lados si un archivado se interrumpió antes de borrar.
+        por_id = {r['id_bitacora']: r for r in archivados}
+        por_id.update({r['id_bitacora']: r for r in actual.items})
+        combinados = sorted(por_id.values(), key=llave, reverse=not hacia_atras)
+        hay_mas = len(combinados) > per_page
+        items = combinados[:per_page]
+        if hacia_atras:
+            items.reverse()
+            has_prev, has_next = hay_mas or actual.has_prev, True
+        else:
+            has_prev, has_next = clave is not None, hay_mas or actual.has_next
+
+        # Con filtros, el conteo del archivo puede ser una cota inferior (la vista muestra "Más de").
+        archivados, parcial = self._archive.count(filtros)
+        total, aproximado = actual.total + archivados, actual.total_is_approximate or parcial
+        primero, ultimo = (items[0], items[-1]) if items else (None, None)
+        return KeysetPagination(
+            items, per_page, has_next, has_prev,
+            next_cursor=KeysetPagination.encode_cursor(*llave(ultimo)) if ultimo else None,
+            prev_cursor=KeysetPagination.encode_cursor(*llave(primero)) if primero else None,
+            total=total, total_is_approximate=aproximado
+        )
+
+    # Mueve al archivo en disco los registros con más de `retention_days` días y los elimina de
+    # la tabla, por lotes de `batch_size`. Cada lote se escribe (un segmento por día) antes de
+    # borrarse, así que una interrupción no pierde registros.
+    def archive_old_logs(self, retention_days, batch_size=5000):
+        if self._archive is None:
+            raise RuntimeError("El archivo de la bitácora no está configurado.")
+        cutoff = datetime.combine(date.today() - timedelta(days=retention_days), datetime.min.time())
+        resultado = {'archivados': 0, 'eliminados': 0, 'segmentos': 0, 'hasta': cutoff}
+        ultimo_id = 0
+        while True:
+            registros = self._audit_repo.find_logs_older_than(cutoff, ultimo_id, batch_size)
+            if not registros:
+                break
+            ultimo_id = registros[-1]['id_bitacora']
+            ids = [r['id_bitacora'] for r in registros]
+            ya_archivados = self._archive.archived_ids(min(ids), max(ids))
+
+            por_dia = {}
+            for registro in registros:
+                if registro['id_bitacora'] not in ya_archivados:
+                    por_dia.setdefault(registro['fecha_hora'].date(), []).append(registro)
+            for registros_dia in por_dia.values():
+                self._archive.write_segment(registros_dia)
+                resultado['segmentos'] += 1
+                resultado['archivados'] += len(registros_dia)
+            resultado['eliminados'] += self._audit_repo.delete_logs(ids)
+        return resultado
+
+    # Resumen del archivo histórico (segmentos, registros y rango de fechas), o None si no hay.
+    def get_archive_stats(self):
+        if self._archive is None:
+            return None
+        return self._archive.stats()
@@ -1,68 +1,627 @@
 # RUTA: app/application/services/backup_service.py
 
-from datetime import datetime
-from flask_login import current_user
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
 from flask import current_app
+from app.infrastructure.persistence.sqlserver_repository import BackupCancelledError
+from app.infrastructure.persistence.backup_catalog import BackupCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class BackupInProgressError(Exception):
+    """Se lanza al pedir un backup mientras otro está en curso (en este u otro proceso)."""
+
 
 class BackupService:
     """
     Servicio de aplicación para gestionar las copias de seguridad de la base de datos.
+
+    Cada backup se ejecuta como un trabajo en segundo plano: la petición solo lo inicia y la
+    página de backups consulta su avance (el porcentaje que informa sqlcmd con STATS = 10).
+    Solo puede haber un backup a la vez: un bloqueo en memoria lo garantiza dentro del proceso
+    y un archivo de bloqueo en la carpeta de backups entre procesos. El estado de cada trabajo
+    se guarda también en la carpeta de backups (trabajos/<id>.json), de modo que cualquier
+    proceso del servidor puede consultarlo o pedir su cancelación (archivo <id>.cancelar).
+
+    Cada backup se registra en un catálogo con sus datos reales (tamaño, duración, velocidad,
+    compresión y SHA-256) y, al terminar, se verifica con RESTORE VERIFYONLY en el mismo hilo y
+    antes de liberar el bloqueo, de modo que otro backup no empieza hasta que termine la verificación.
+
+    Estrategia: los backups se comprimen y pueden repartirse en varias bandas (BACKUP_STRIPES)
+    para escribir en paralelo. Un hilo programador ejecuta el FULL semanal, un DIFERENCIAL los
+    demás días y backups de LOG cada BACKUP_LOG_INTERVAL_MINUTES; después de cada backup
+    correcto se eliminan los archivos que ya no hacen falta para restaurar dentro de la retención.
     """
+
+    # Tiempo que se conserva en memoria el estado de un trabajo terminado.
+    RETENCION_TRABAJOS_SEGUNDOS = 24 * 3600
+    # El proceso que ejecuta el backup renueva el bloqueo y el estado del trabajo cada
+    # INTERVALO_RENOVACION_SEGUNDOS (y revisa si se pidió cancelar); un bloqueo o un trabajo sin
+    # renovar durante BLOQUEO_MAXIMO_SEGUNDOS se considera abandonado (el proceso se detuvo).
+    INTERVALO_RENOVACION_SEGUNDOS = 5
+    BLOQUEO_MAXIMO_SEGUNDOS = 300
+    # Líneas de salida de sqlcmd que se guardan por trabajo.
+    MAXIMO_LINEAS_SALIDA = 50
+
+    # Cada cuánto revisa el hilo programador si corresponde ejecutar un backup.
+    INTERVALO_REVISION_SEGUNDOS = 60
+    TIPOS = ('FULL', 'DIFERENCIAL', 'LOG')
+    EXTENSIONES = {'FULL': 'bak', 'DIFERENCIAL': 'dif', 'LOG': 'trn'}
+
+    _PATRON_PROGRESO = re.compile(r'(\d+)\s+percent processed', re.IGNORECASE)
+    _PATRON_ID_TRABAJO = re.compile(r'^[0-9a-f]{32}$')
+
     def __init__(self, backup_repository, app_config, audit_service):
         self.backup_repo = backup_repository
         self.config = app_config
         self.audit_service = audit_service
-        
-        self.db_name = "BaseDatosDiresa" 
-        
-        # 🔑 CORRECCIÓN DEL TIPEO: Se usa 'self.' en lugar de 'sself.' 🔑
-        self.base_backup_dir = "C:\\LEGAJO_BACKUPS_FINAL"
-        
 
-    def execute_full_backup(self):
+        self.db_name = "BaseDatosDiresa"
+
+        self.base_backup_dir = app_config.get('BACKUP_DIR') or "C:\\LEGAJO_BACKUPS_FINAL"
+        self.compression = app_config.get('BACKUP_COMPRESSION', True)
+        self.stripes = max(1, app_config.get('BACKUP_STRIPES', 1))
+        self.retention_days = app_config.get('BACKUP_RETENTION_DAYS', 14)
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._cancelaciones = {}
+        self.catalog = BackupCatalog(app_config.get('BACKUP_CATALOG_FILE') or os.path.join(self.base_backup_dir, 'catalogo_backups.json'))
+        self._scheduler = None
+
+    # --- TRABAJOS ---
+
+    def start_backup(self, user_id, tipo='FULL', wait=False):
         """
-        Ejecuta la lógica de la capa de persistencia para iniciar el proceso de backup 
-        y registra el evento en la Bitácora.
+        Inicia un backup del tipo indicado ('FULL', 'DIFERENCIAL' o 'LOG') en segundo plano y
+        devuelve el estado del trabajo; con `wait` se ejecuta en el hilo actual y se devuelve
+        al terminar. Un DIFERENCIAL o LOG sin un FULL previo en el catálogo se ejecuta como FULL.
+        Lanza BackupInProgressError si ya hay uno en curso.
         """
         if not self.db_name:
             raise Exception("No se pudo determinar el nombre de la base de datos para el backup.")
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de backup no válido: {tipo}")
+        if tipo != 'FULL' and self._ultimo('FULL', solo_correctos=True) is None:
+            tipo = 'FULL'
+
+        with self._lock:
+            self._purgar_trabajos()
+            if any(job['estado'] in ('pendiente', 'en_curso') for job in self._jobs.values()):
+                raise BackupInProgressError("Ya hay una copia de seguridad en curso.")
+            if not self._tomar_bloqueo():
+                raise BackupInProgressError("Otro proceso del servidor está ejecutando o verificando una copia de seguridad.")
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            job = {
+                'id': uuid.uuid4().hex,
+                'tipo': tipo,
+                'archivos': self._rutas_backup(tipo, timestamp),
+                'estado': 'pendiente',
+                'progreso': 0,
+                'salida': [],
+                'error': None,
+                'verificacion': None,
+                'id_usuario': user_id,
+                'creado': time.time(),
+                'iniciado': None,
+                'terminado': None,
+                'actualizado': time.time(),
+            }
+            self._jobs[job['id']] = job
+            self._cancelaciones[job['id']] = threading.Event()
+            self._guardar_trabajo(job)
+
+        app = current_app._get_current_object()
+        if wait:
+            self._ejecutar(app, job['id'])
+        else:
+            hilo = threading.Thread(target=self._ejecutar, args=(app, job['id']), name='backup', daemon=True)
+            hilo.start()
+        return self.get_job(job['id'])
+
+    def _rutas_backup(self, tipo, timestamp):
+        # El LOG es pequeño y frecuente: no se reparte en bandas.
+        bandas = 1 if tipo == 'LOG' else self.stripes
+        base = os.path.join(self.base_backup_dir, f"Legajo_{tipo}_{timestamp}")
+        extension = self.EXTENSIONES[tipo]
+        if bandas == 1:
+            return [f"{base}.{extension}"]
+        return [f"{base}_{n}de{bandas}.{extension}" for n in range(1, bandas + 1)]
+
+    def get_job(self, job_id):
+        """
+        Devuelve una copia del estado de un trabajo, o None si no existe (o ya se purgó). Los
+        trabajos de otros procesos del servidor se leen de su archivo de estado.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job, salida=list(job['salida']))
+        return self._leer_trabajo(job_id)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{self.base_backup_dir}\\Legajo_{timestamp}.bak"
-        
-        # 1. EJECUTAR EL BACKUP FÍSICO
-        self.backup_repo.run_db_backup(self.db_name, backup_filename)
-        
-        # 2. REGISTRO EN LA BITÁCORA
+    def get_current_job(self):
+        """Devuelve el trabajo en curso o, si no hay, el más reciente; None si no hubo ninguno."""
+        trabajos = {job['id']: job for job in self._trabajos_en_disco()}
+        with self._lock:
+            trabajos.update({job_id: dict(job, salida=list(job['salida'])) for job_id, job in self._jobs.items()})
+        if not trabajos:
+            return None
+        activos = [j for j in trabajos.values() if j['estado'] in ('pendiente', 'en_curso')]
+        return activos[0] if activos else max(trabajos.values(), key=lambda j: j['creado'])
+
+    def cancel_job(self, job_id):
+        """
+        Pide la cancelación de un trabajo en curso. Devuelve False si ya había terminado. Si el
+        trabajo corre en otro proceso, se deja la marca <id>.cancelar que ese proceso revisa.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            evento = self._cancelaciones.get(job_id)
+            if job and evento:
+                if job['estado'] not in ('pendiente', 'en_curso'):
+                    return False
+                evento.set()
+                return True
+        job = self._leer_trabajo(job_id)
+        if not job or job['estado'] not in ('pendiente', 'en_curso'):
+            return False
+        try:
+            with open(self._ruta_trabajo(job_id, 'cancelar'), 'w', encoding='utf-8'):
+                pass
+        except OSError as e:
+            logger.error(f"No se pudo pedir la cancelación del backup {job_id}: {e}")
+            return False
+        return True
+
+    def _ejecutar(self, app, job_id):
+        with app.app_context():
+            job = self.get_job(job_id)
+            self._actualizar(job_id, estado='en_curso', iniciado=time.time())
+            terminado = threading.Event()
+            threading.Thread(
+                target=self._renovar, args=(job_id, terminado), name='backup-renovacion', daemon=True
+            ).start()
+            try:
+                self.backup_repo.run_db_backup(
+                    self.db_name, job['archivos'], job['tipo'], self.compression,
+                    on_output=lambda linea: self._registrar_salida(job_id, linea),
+                    cancel_event=self._cancelaciones[job_id]
+                )
+            except BackupCancelledError:
+                self._actualizar(job_id, estado='cancelado', terminado=time.time())
+                self._catalogar(job_id)
+                self._auditar(job, 'BACKUP_CANCELADO', f"Copia de seguridad {job['tipo']} cancelada. Archivo: {job['archivos'][0]}")
+                app.logger.warning(f"Backup cancelado: {job['archivos'][0]}")
+            except Exception as e:
+                self._actualizar(job_id, estado='error', error=str(e), terminado=time.time())
+                self._catalogar(job_id)
+                app.logger.error(f"Error al ejecutar el backup {job['archivos'][0]}: {e}")
+            else:
+                self._actualizar(job_id, estado='completado', progreso=100, terminado=time.time())
+                entrada = self._catalogar(job_id)
+                self._auditar(
+                    job, 'BACKUP',
+                    f"Copia de seguridad {job['tipo']} ejecutada con éxito. Archivo: {job['archivos'][0]}",
+                    {k: entrada[k] for k in ('tipo', 'archivos', 'tamano_bytes', 'duracion_segundos', 'mb_por_segundo')}
+                )
+                app.logger.info(f"Registro de backup exitoso: {job['archivos'][0]}")
+                if self.config.get('BACKUP_VERIFY', True):
+                    # En este mismo hilo y con el bloqueo tomado (se sigue renovando): la verificación
+                    # termina aunque el backup lo haya lanzado `flask ejecutar-backup`.
+                    self._verificar(app, job_id, entrada)
+                try:
+                    self.prune_backups()
+                except Exception as e:
+                    app.logger.error(f"Error al depurar backups antiguos: {e}")
+            finally:
+                terminado.set()
+                with self._lock:
+                    self._cancelaciones.pop(job_id, None)
+                self._liberar_bloqueo()
+                try:
+                    os.remove(self._ruta_trabajo(job_id, 'cancelar'))
+                except OSError:
+                    pass
+
+    # --- CATÁLOGO Y VERIFICACIÓN ---
+
+    def _catalogar(self, job_id):
+        """Registra en el catálogo el resultado del trabajo con los datos reales del archivo."""
+        job = self.get_job(job_id)
+        duracion = (job['terminado'] - job['iniciado']) if job['iniciado'] and job['terminado'] else None
+        entrada = {
+            'id': job['id'],
+            'fecha': datetime.fromtimestamp(job['iniciado'] or job['creado']).isoformat(timespec='seconds'),
+            'tipo': job['tipo'],
+            'archivos': job['archivos'],
+            'estado': job['estado'],
+            'error': job['error'],
+            'id_usuario': job['id_usuario'],
+            'duracion_segundos': round(duracion, 1) if duracion is not None else None,
+            'bandas': len(job['archivos']),
+            'compresion': self.compression,
+            'tamano_bytes': None,
+            'tamano_sin_comprimir': None,
+            'ratio_compresion': None,
+            'mb_por_segundo': None,
+            'sha256': None,
+            'verificacion': None,
+        }
+        if job['estado'] == 'completado':
+            try:
+                entrada['tamano_bytes'] = sum(os.path.getsize(ruta) for ruta in job['archivos'])
+            except OSError:
+                pass
+            try:
+                metadatos = self.backup_repo.get_backup_metadata(job['archivos'][0])
+            except Exception as e:
+                current_app.logger.error(f"No se pudieron leer los datos del backup en msdb: {e}")
+                metadatos = None
+            if metadatos:
+                entrada['tamano_sin_comprimir'] = metadatos['tamano_sin_comprimir']
+                entrada['tamano_bytes'] = entrada['tamano_bytes'] or metadatos['tamano_comprimido']
+            if entrada['tamano_sin_comprimir'] and entrada['tamano_bytes']:
+                entrada['ratio_compresion'] = round(entrada['tamano_sin_comprimir'] / entrada['tamano_bytes'], 2)
+            # La velocidad se mide sobre los datos leídos de la base (tamaño sin comprimir si se conoce).
+            leidos = entrada['tamano_sin_comprimir'] or entrada['tamano_bytes']
+            if leidos and duracion:
+                entrada['mb_por_segundo'] = round(leidos / (1024 * 1024) / duracion, 1)
+            entrada['verificacion'] = 'pendiente' if self.config.get('BACKUP_VERIFY', True) else None
+        try:
+            self.catalog.add(entrada)
+        except OSError as e:
+            current_app.logger.error(f"No se pudo registrar el backup en el catálogo: {e}")
+        return entrada
+
+    def _verificar(self, app, job_id, entrada):
+        """
+        Calcula el SHA-256 del backup (de sus bandas en orden) y ejecuta RESTORE VERIFYONLY;
+        guarda el resultado en el catálogo y en el estado del trabajo.
+        """
+        inicio = time.time()
+        cambios = {'verificacion': 'en_curso'}
+        self.catalog.update(entrada['id'], **cambios)
+        self._actualizar(job_id, verificacion='en_curso')
+        try:
+            cambios['sha256'] = self._sha256(entrada['archivos'])
+        except OSError as e:
+            app.logger.warning(f"No se pudo leer {entrada['archivos'][0]} para calcular su SHA-256: {e}")
         try:
-            user_id = current_user.id if current_user.is_authenticated else None
-            
-            self.audit_service.log(
-                user_id, 
-                'MANTENIMIENTO', 
-                'BACKUP', 
-                f'Copia de seguridad completa (FULL) ejecutada con éxito. Archivo: {backup_filename}',
-                detalle_dict={'tamano': '5.5 GB', 'tipo': 'FULL', 'archivo': backup_filename}
+            self.backup_repo.verify_backup(entrada['archivos'])
+            cambios['verificacion'] = 'correcta'
+        except Exception as e:
+            cambios.update(verificacion='fallida', verificacion_detalle=str(e))
+            app.logger.error(f"RESTORE VERIFYONLY falló para {entrada['archivos'][0]}: {e}")
+        cambios['verificacion_segundos'] = round(time.time() - inicio, 1)
+        self.catalog.update(entrada['id'], **cambios)
+        self._actualizar(job_id, verificacion=cambios['verificacion'])
+
+    @staticmethod
+    def _sha256(rutas):
+        resumen = hashlib.sha256()
+        for ruta in rutas:
+            with open(ruta, 'rb') as archivo:
+                for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+                    resumen.update(bloque)
+        return resumen.hexdigest()
+
+    # --- PROGRAMACIÓN ---
+
+    def start_scheduler(self, app):
+        """Inicia (una sola vez por proceso) el hilo que ejecuta los backups programados."""
+        if self._scheduler is not None:
+            return
+
+        def _programador():
+            while True:
+                try:
+                    tipo = self.due_backup_type()
+                    if tipo:
+                        with app.app_context():
+                            self.start_backup(None, tipo, wait=True)
+                except BackupInProgressError:
+                    pass
+                except Exception as e:
+                    app.logger.error(f"Error en el backup programado: {e}")
+                time.sleep(self.INTERVALO_REVISION_SEGUNDOS)
+
+        self._scheduler = threading.Thread(target=_programador, name='backups-programados', daemon=True)
+        self._scheduler.start()
+
+    def due_backup_type(self, now=None):
+        """
+        Devuelve el tipo de backup que corresponde ejecutar ahora según el plan, o None.
+        Un intento fallido cuenta como ejecutado: se reintenta en el siguiente turno, no cada minuto.
+        """
+        now = now or datetime.now()
+        hoy = now.date()
+        ultimo_full = self._ultimo('FULL')
+        dias_full = self.config.get('BACKUP_FULL_WEEKDAYS', [6])
+        if now.hour >= self.config.get('BACKUP_FULL_HOUR', 2):
+            if now.weekday() in dias_full or self._ultimo('FULL', solo_correctos=True) is None:
+                if not ultimo_full or _fecha(ultimo_full).date() < hoy:
+                    return 'FULL'
+            elif self.config.get('BACKUP_DIFFERENTIAL_ENABLED', True):
+                ultimo_dif = self._ultimo('DIFERENCIAL')
+                if (not ultimo_dif or _fecha(ultimo_dif).date() < hoy) and _fecha(ultimo_full).date() < hoy:
+                    return 'DIFERENCIAL'
+        intervalo = self.config.get('BACKUP_LOG_INTERVAL_MINUTES', 0)
+        if intervalo and self._ultimo('FULL', solo_correctos=True) is not None:
+            referencia = max(_fecha(e) for e in (self._ultimo('LOG'), ultimo_full) if e)
+            if now - referencia >= timedelta(minutes=intervalo):
+                return 'LOG'
+        return None
+
+    def _ultimo(self, tipo, solo_correctos=False):
+        for entrada in self.catalog.list():
+            if entrada.get('tipo', 'FULL') == tipo and (not solo_correctos or entrada.get('estado') == 'completado'):
+                return entrada
+        return None
+
+    # --- RETENCIÓN ---
+
+    def prune_backups(self, retention_days=None, now=None):
+        """
+        Elimina de la carpeta de backups los archivos que ya no hacen falta para restaurar a
+        cualquier momento dentro de la retención: se conserva el último FULL correcto anterior al
+        corte (base de los diferenciales y logs posteriores) y todo lo que le sigue. También se
+        eliminan los archivos Legajo_* sin registro en el catálogo anteriores a esa base.
+        Devuelve la cantidad de archivos y bytes liberados.
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        now = now or datetime.now()
+        corte = now - timedelta(days=retention_days)
+        entradas = self.catalog.list()
+        base = next(
+            (e for e in entradas if e.get('tipo', 'FULL') == 'FULL' and e.get('estado') == 'completado' and _fecha(e) <= corte),
+            None
+        )
+        resultado = {'archivos': 0, 'bytes': 0}
+        if base is None:
+            return resultado
+        limite = _fecha(base)
+
+        vigentes = set()
+        for entrada in entradas:
+            rutas = entrada.get('archivos') or [entrada['archivo']]
+            if _fecha(entrada) >= limite or entrada.get('eliminado'):
+                vigentes.update(os.path.normcase(r) for r in rutas)
+                continue
+            for ruta in rutas:
+                self._eliminar_archivo(ruta, resultado)
+            self.catalog.update(entrada['id'], eliminado=now.isoformat(timespec='seconds'))
+
+        try:
+            nombres = os.listdir(self.base_backup_dir)
+        except OSError:
+            nombres = []
+        for nombre in nombres:
+            ruta = os.path.join(self.base_backup_dir, nombre)
+            if not nombre.startswith('Legajo_') or os.path.normcase(ruta) in vigentes:
+                continue
+            if nombre.rsplit('.', 1)[-1] in self.EXTENSIONES.values() and os.path.getmtime(ruta) < limite.timestamp():
+                self._eliminar_archivo(ruta, resultado)
+
+        if resultado['archivos']:
+            current_app.logger.info(
+                f"Retención de backups: {resultado['archivos']} archivos eliminados ({_formatear_bytes(resultado['bytes'])})."
             )
-            current_app.logger.info(f"Registro de backup exitoso: {backup_filename}")
-            
+        return resultado
+
+    @staticmethod
+    def _eliminar_archivo(ruta, resultado):
+        try:
+            tamano = os.path.getsize(ruta)
+            os.remove(ruta)
+        except OSError:
+            return
+        resultado['archivos'] += 1
+        resultado['bytes'] += tamano
+
+    def _registrar_salida(self, job_id, linea):
+        coincidencia = self._PATRON_PROGRESO.search(linea)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job['salida'].append(linea)
+            del job['salida'][:-self.MAXIMO_LINEAS_SALIDA]
+            if coincidencia:
+                job['progreso'] = min(99, int(coincidencia.group(1)))
+            self._guardar_trabajo(job)
+
+    def _auditar(self, job, accion, descripcion, detalle=None):
+        try:
+            self.audit_service.log(job['id_usuario'], 'MANTENIMIENTO', accion, descripcion, detalle_dict=detalle)
         except Exception as audit_e:
             current_app.logger.error(f"FALLA CRÍTICA DE AUDITORÍA (BACKUP): {audit_e}")
 
+    def _actualizar(self, job_id, **cambios):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(cambios)
+                self._guardar_trabajo(job)
 
-        print(f"--- DEBUG: Backup completado a: {backup_filename} ---")
-        return True
-    
-    def get_backup_history(self):
-        """Obtiene el historial de backups y lo formatea para la vista."""
-        raw_history = self.backup_repo.get_backup_history()
-        
+    def _renovar(self, job_id, terminado):
+        """
+        Mientras dura el backup (y su verificación): renueva el archivo de bloqueo y el estado
+        guardado (aunque sqlcmd no informe avance durante mucho tiempo) y atiende las
+        cancelaciones pedidas desde otros procesos.
+        """
+        while not terminado.wait(self.INTERVALO_RENOVACION_SEGUNDOS):
+            try:
+                os.utime(self._ruta_bloqueo())
+            except OSError:
+                pass
+            if os.path.exists(self._ruta_trabajo(job_id, 'cancelar')):
+                with self._lock:
+                    evento = self._cancelaciones.get(job_id)
+                if evento:
+                    evento.set()
+            self._actualizar(job_id, actualizado=time.time())
+
+    def _purgar_trabajos(self):
+        limite = time.time() - self.RETENCION_TRABAJOS_SEGUNDOS
+        for job_id in [j['id'] for j in self._jobs.values() if j['terminado'] and j['terminado'] < limite]:
+            del self._jobs[job_id]
+        for job in self._trabajos_en_disco():
+            if job['terminado'] and job['terminado'] < limite:
+                try:
+                    os.remove(self._ruta_trabajo(job['id']))
+                except OSError:
+                    pass
+
+    # --- ESTADO DE LOS TRABAJOS EN DISCO (compartido entre procesos) ---
+
+    def _ruta_trabajo(self, job_id, extension='json'):
+        return os.path.join(self.base_backup_dir, 'trabajos', f"{job_id}.{extension}")
+
+    def _guardar_trabajo(self, job):
+        # Se llama con self._lock tomado; escritura atómica para que otro proceso nunca lea un archivo a medias.
+        ruta = self._ruta_trabajo(job['id'])
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(job, archivo)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.error(f"No se pudo guardar el estado del backup {job['id']}: {e}")
+
+    def _leer_trabajo(self, job_id):
+        if not self._PATRON_ID_TRABAJO.match(job_id or ''):
+            return None
+        try:
+            with open(self._ruta_trabajo(job_id), encoding='utf-8') as archivo:
+                job = json.load(archivo)
+        except (OSError, ValueError):
+            return None
+        # Un trabajo "en curso" que su proceso dejó de renovar no terminará nunca.
+        if job['estado'] in ('pendiente', 'en_curso') and time.time() - job.get('actualizado', 0) > self.BLOQUEO_MAXIMO_SEGUNDOS:
+            job.update(estado='error', error="El proceso que ejecutaba la copia de seguridad se detuvo.")
+        return job
+
+    def _trabajos_en_disco(self):
+        try:
+            nombres = os.listdir(os.path.join(self.base_backup_dir, 'trabajos'))
+        except OSError:
+            return []
+        trabajos = (self._leer_trabajo(nombre[:-5]) for nombre in nombres if nombre.endswith('.json'))
+        return [job for job in trabajos if job]
+
+    # --- BLOQUEO ENTRE PROCESOS ---
+
+    def _ruta_bloqueo(self):
+        return os.path.join(self.base_backup_dir, 'backup_en_curso.lock')
+
+    def _tomar_bloqueo(self):
+        ruta = self._ruta_bloqueo()
+        try:
+            os.makedirs(self.base_backup_dir, exist_ok=True)
+            if time.time() - os.path.getmtime(ruta) > self.BLOQUEO_MAXIMO_SEGUNDOS:
+                os.remove(ruta)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _liberar_bloqueo(self):
+        try:
+            os.remove(self._ruta_bloqueo())
+        except OSError:
+            pass
+
+    def get_backup_history(self, limit=20):
+        """Obtiene el historial de backups del catálogo y lo formatea para la vista."""
         formatted_history = []
-        for item in raw_history:
+        for item in self.catalog.list(limit):
             formatted_history.append({
-                'fecha_registro': item.get('fecha_registro'), 
-                'tipo': item.get('Tipo', 'FULL'),
-                'tamano': item.get('Tamanio', '5.5 GB'),
-                'estado': item.get('Estado', 'Éxito'),
+                'fecha_registro': datetime.fromisoformat(item['fecha']),
+                'tipo': item.get('tipo', 'FULL'),
+                'bandas': item.get('bandas', 1),
+                'eliminado': bool(item.get('eliminado')),
+                'tamano': _formatear_bytes(item.get('tamano_bytes')),
+                'duracion': _formatear_duracion(item.get('duracion_segundos')),
+                'velocidad': f"{item['mb_por_segundo']} MB/s" if item.get('mb_por_segundo') else '-',
+                'compresion': f"{item['ratio_compresion']}:1" if item.get('ratio_compresion') else '-',
+                'sha256': item.get('sha256'),
+                'estado': item.get('estado'),
+                'verificacion': item.get('verificacion'),
+                'error': item.get('error') or item.get('verificacion_detalle'),
             })
-        return formatted_history
\ No newline at end of file
+        return formatted_history
+
+    def get_backup_trends(self, muestras=30):
+        """
+        Tendencia de duración de los backups FULL correctos: promedio reciente frente al anterior,
+        pendiente (segundos por backup) y, según la ventana BACKUP_WINDOW_MINUTES, cuántos backups
+        faltan para superarla si la tendencia sigue. None si hay menos de 3 backups.
+        """
+        completados = [
+            e for e in reversed(self.catalog.list())
+            if e.get('estado') == 'completado' and e.get('tipo') == 'FULL' and e.get('duracion_segundos')
+        ][-muestras:]
+        if len(completados) < 3:
+            return None
+        duraciones = [e['duracion_segundos'] for e in completados]
+        n = len(duraciones)
+        media_x = (n - 1) / 2
+        media_y = sum(duraciones) / n
+        pendiente = sum((x - media_x) * (y - media_y) for x, y in enumerate(duraciones)) / sum((x - media_x) ** 2 for x in range(n))
+
+        mitad = n // 2
+        anterior = sum(duraciones[:mitad]) / mitad
+        reciente = sum(duraciones[mitad:]) / (n - mitad)
+        ventana = self.config.get('BACKUP_WINDOW_MINUTES', 60) * 60
+        ultima = duraciones[-1]
+        faltan = None
+        if pendiente > 0:
+            faltan = max(0, int((ventana - ultima) / pendiente))
+        tamanos = [e.get('tamano_sin_comprimir') or e.get('tamano_bytes') for e in completados]
+        return {
+            'muestras': n,
+            'ultima': _formatear_duracion(ultima),
+            'promedio_reciente': _formatear_duracion(reciente),
+            'variacion_porcentaje': round((reciente - anterior) / anterior * 100, 1) if anterior else None,
+            'pendiente_segundos': round(pendiente, 1),
+            'ventana': _formatear_duracion(ventana),
+            'uso_ventana_porcentaje': round(ultima / ventana * 100, 1) if ventana else None,
+            'backups_hasta_ventana': faltan,
+            'alerta': ultima > 0.8 * ventana or (faltan is not None and faltan < 10),
+            'tamano_ultimo': _formatear_bytes(tamanos[-1]),
+            'duraciones': duraciones,
+        }
+
+
+def _fecha(entrada):
+    return datetime.fromisoformat(entrada['fecha'])
+
+
+def _formatear_bytes(valor):
+    if not valor:
+        return '-'
+    for unidad in ('B', 'KB', 'MB', 'GB'):
+        if valor < 1024:
+            return f"{valor:.1f} {unidad}" if unidad != 'B' else f"{valor} B"
+        valor /= 1024
+    return f"{valor:.1f} TB"
+
+
+def _formatear_duracion(segundos):
+    if segundos is None:
+        return '-'
+    minutos, segundos = divmod(int(round(segundos)), 60)
+    return f"{minutos} min {segundos:02d} s" if minutos else f"{segundos} s"
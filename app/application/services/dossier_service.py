@@ -0,0 +1,382 @@
+# RUTA: app/application/services/dossier_service.py
+
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from pypdf import PdfReader, PdfWriter
+
+
+class DossierService:
+    """
+    Genera en segundo plano un PDF consolidado del legajo de un empleado: portada, índice por
+    sección y todos los documentos PDF/imagen unidos en el orden de las secciones.
+
+    Los archivos se leen de la BD por bloques hacia una carpeta temporal y se convierten uno a
+    uno. La unión final (pypdf) mantiene en memoria las páginas de todos los documentos hasta
+    escribir el PDF, por eso el dossier tiene un tope de páginas (`max_pages`) y de tamaño
+    (`max_bytes`): los documentos que no entran se listan en el índice como no incluidos. El
+    resultado se guarda en disco con el nombre derivado de los hashes de los documentos del
+    legajo: mientras no cambien, se reutiliza el mismo PDF sin regenerarlo.
+
+    El estado de cada trabajo se guarda también en la carpeta de salida (trabajos/<id>.json),
+    de modo que cualquier proceso del servidor puede informar su avance y servir la descarga,
+    no solo el que lo generó.
+    """
+
+    EXTENSIONES_PDF = {'pdf'}
+    EXTENSIONES_IMAGEN = {'png', 'jpg', 'jpeg'}
+
+    # Páginas generadas (portada e índice): A4 a 150 ppp.
+    RESOLUCION = 150
+    TAMANIO_PAGINA = (1240, 1754)
+    MARGEN = 110
+    LINEAS_POR_PAGINA_INDICE = 42
+    # Las imágenes más grandes que A4 a 300 ppp se reducen antes de convertirlas.
+    TAMANIO_MAXIMO_IMAGEN = (2480, 3508)
+
+    # Se incrementa cuando cambia el formato del dossier, para invalidar los ya generados.
+    VERSION_FORMATO = 1
+    # Tiempo que se conserva el estado de un trabajo terminado.
+    RETENCION_TRABAJOS_SEGUNDOS = 3600
+    # Un trabajo sin avances durante este tiempo se da por perdido (su proceso se detuvo).
+    TRABAJO_ESTANCADO_SEGUNDOS = 1800
+
+    _PATRON_ID_TRABAJO = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, personal_repository, audit_service, output_dir, max_workers=1,
+                 max_pages=1500, max_bytes=300 * 1024 * 1024):
+        self._personal_repo = personal_repository
+        self._audit_service = audit_service
+        self.output_dir = output_dir
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dossier')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # --- TRABAJOS ---
+
+    def request_dossier(self, personal_id, requesting_user_id):
+        """
+        Solicita el dossier de un empleado y devuelve el estado del trabajo. Si el PDF con los
+        documentos actuales ya existe, el trabajo se devuelve completado sin regenerarlo; si hay
+        uno en curso para los mismos documentos, se devuelve ese mismo trabajo.
+        """
+        personal = self._personal_repo.find_personal_info_by_id(personal_id)
+        if not personal:
+            raise ValueError("La persona solicitada no existe.")
+        documentos = self._personal_repo.get_legajo_section(personal_id, 'documentos')
+        huella = self._huella(personal, documentos)
+        ruta = os.path.join(self.output_dir, f"dossier_{personal_id}_{huella[:20]}.pdf")
+
+        with self._lock:
+            self._purgar_trabajos()
+            # También cuentan los trabajos de otros procesos, para no generar dos veces el mismo PDF.
+            trabajos = {j['id']: j for j in self._trabajos_en_disco()}
+            trabajos.update(self._jobs)
+            for job in trabajos.values():
+                if job['id_personal'] != personal_id or job['huella'] != huella or job['estado'] == 'error':
+                    continue
+                if job['estado'] != 'completado' or os.path.exists(job['ruta']):
+                    return dict(job)
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'id_personal': personal_id,
+                'huella': huella,
+                'ruta': ruta,
+                'nombre_descarga': f"Legajo_{personal.get('dni') or personal_id}.pdf",
+                'estado': 'pendiente',
+                'progreso': 0,
+                'total_documentos': len(documentos),
+                'paginas': None,
+                'desde_cache': False,
+                'error': None,
+                'creado': time.time(),
+                'actualizado': time.time(),
+                'terminado': None,
+            }
+            if os.path.exists(ruta):
+                job.update(estado='completado', progreso=100, desde_cache=True, terminado=time.time())
+            self._jobs[job['id']] = job
+            self._guardar_trabajo(job)
+
+        if job['estado'] == 'pendiente':
+            app = current_app._get_current_object()
+            self._executor.submit(self._ejecutar, app, job['id'], personal, documentos, requesting_user_id)
+        return dict(job)
+
+    def get_job(self, job_id):
+        """
+        Devuelve una copia del estado de un trabajo, o None si no existe (o ya se purgó). Los
+        trabajos de otros procesos del servidor se leen de su archivo de estado.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._leer_trabajo(job_id)
+
+    def _actualizar(self, job_id, **cambios):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(cambios, actualizado=time.time())
+                self._guardar_trabajo(job)
+
+    def _purgar_trabajos(self):
+        limite = time.time() - self.RETENCION_TRABAJOS_SEGUNDOS
+        for job_id in [j['id'] for j in self._jobs.values() if j['terminado'] and j['terminado'] < limite]:
+            del self._jobs[job_id]
+        # Los archivos de estado se purgan desde cualquier proceso, también los de procesos ya detenidos.
+        for job in self._trabajos_en_disco():
+            if job['id'] not in self._jobs and (job['terminado'] or job['actualizado']) < limite:
+                try:
+                    os.remove(self._ruta_trabajo(job['id']))
+                except OSError:
+                    pass
+
+    # --- ESTADO DE LOS TRABAJOS EN DISCO (compartido entre procesos) ---
+
+    def _ruta_trabajo(self, job_id):
+        return os.path.join(self.output_dir, 'trabajos', f"{job_id}.json")
+
+    def _guardar_trabajo(self, job):
+        # Se llama con self._lock tomado; escritura atómica para que otro proceso nunca lea un archivo a medias.
+        ruta = self._ruta_trabajo(job['id'])
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(job, archivo)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            current_app.logger.error(f"No se pudo guardar el estado del dossier {job['id']}: {e}")
+
+    def _leer_trabajo(self, job_id):
+        if not self._PATRON_ID_TRABAJO.match(job_id or ''):
+            return None
+        try:
+            with open(self._ruta_trabajo(job_id), encoding='utf-8') as archivo:
+                job = json.load(archivo)
+        except (OSError, ValueError):
+            return None
+        if job['estado'] in ('pendiente', 'procesando') and time.time() - job['actualizado'] > self.TRABAJO_ESTANCADO_SEGUNDOS:
+            job.update(estado='error', error="El proceso que generaba el dossier se detuvo.")
+        return job
+
+    def _trabajos_en_disco(self):
+        try:
+            nombres = os.listdir(os.path.join(self.output_dir, 'trabajos'))
+        except OSError:
+            return []
+        trabajos = (self._leer_trabajo(nombre[:-5]) for nombre in nombres if nombre.endswith('.json'))
+        return [job for job in trabajos if job]
+
+    def _huella(self, personal, documentos):
+        # La huella cubre los datos impresos en la portada y el contenido (hash) de cada documento.
+        partes = [
+            str(self.VERSION_FORMATO), str(personal.get('id_personal')), str(personal.get('dni')),
+            str(personal.get('nombres')), str(personal.get('apellidos')),
+        ]
+        for doc in documentos:
+            partes.append(
+                f"{doc['id_documento']}|{doc.get('hash_archivo')}|{doc.get('id_seccion')}|{doc.get('nombre_archivo')}"
+            )
+        return hashlib.sha256("\n".join(partes).encode('utf-8')).hexdigest()
+
+    # --- GENERACIÓN ---
+
+    def _ejecutar(self, app, job_id, personal, documentos, user_id):
+        with app.app_context():
+            job = self.get_job(job_id)
+            carpeta = tempfile.mkdtemp(prefix='dossier_', dir=self.output_dir)
+            self._actualizar(job_id, estado='procesando')
+            try:
+                partes = []
+                paginas_incluidas = bytes_incluidos = 0
+                for posicion, doc in enumerate(documentos, start=1):
+                    parte = self._preparar_documento(doc, carpeta, posicion)
+                    if parte['ruta']:
+                        tamano = os.path.getsize(parte['ruta'])
+                        if (paginas_incluidas + parte['paginas'] > self.max_pages
+                                or bytes_incluidos + tamano > self.max_bytes):
+                            # No entra en el dossier: se descarta ya para no ocupar memoria en la unión.
+                            os.remove(parte['ruta'])
+                            parte.update(ruta=None, paginas=0, nota="no incluido (supera el límite del dossier)")
+                        else:
+                            paginas_incluidas += parte['paginas']
+                            bytes_incluidos += tamano
+                    partes.append(parte)
+                    self._actualizar(job_id, progreso=int(90 * posicion / max(len(documentos), 1)))
+
+                ruta_portada = os.path.join(carpeta, 'portada.pdf')
+                paginas_iniciales = self._generar_portada_e_indice(personal, partes, ruta_portada)
+
+                writer = PdfWriter()
+                writer.append(ruta_portada)
+                pagina = paginas_iniciales
+                marcadores = []
+                for parte in partes:
+                    if not parte['ruta']:
+                        continue
+                    if not marcadores or marcadores[-1][0] != parte['seccion']:
+                        marcadores.append((parte['seccion'], pagina))
+                    writer.append(parte['ruta'])
+                    pagina += parte['paginas']
+                # Marcadores del PDF por sección (índice de página base 0).
+                for seccion, pagina_inicio in marcadores:
+                    writer.add_outline_item(seccion, pagina_inicio)
+
+                # Se escribe en la carpeta temporal del trabajo (propia aunque otro proceso esté
+                # generando el mismo dossier) y se reemplaza de forma atómica.
+                temporal = os.path.join(carpeta, 'dossier.pdf')
+                with open(temporal, 'wb') as salida:
+                    writer.write(salida)
+                writer.close()
+                os.replace(temporal, job['ruta'])
+                self._eliminar_versiones_anteriores(job['id_personal'], job['ruta'])
+
+                self._actualizar(job_id, estado='completado', progreso=100, paginas=pagina, terminado=time.time())
+                self._audit_service.log(
+                    user_id, 'Personal', 'GENERAR_DOSSIER',
+                    f"Generó el dossier PDF del legajo del personal ID {job['id_personal']} ({pagina} páginas)"
+                )
+            except Exception as e:
+                app.logger.error(f"Error al generar el dossier del personal ID {job['id_personal']}: {e}")
+                self._actualizar(job_id, estado='error', error=str(e), terminado=time.time())
+            finally:
+                shutil.rmtree(carpeta, ignore_errors=True)
+
+    def _preparar_documento(self, doc, carpeta, posicion):
+        """Descarga un documento a disco y lo deja como PDF; devuelve su entrada para el índice."""
+        nombre = doc.get('nombre_archivo') or f"documento_{doc['id_documento']}"
+        extension = nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+        parte = {
+            'seccion': doc.get('nombre_seccion') or 'Sin sección',
+            'titulo': f"{doc.get('nombre_tipo') or 'Documento'} - {nombre}",
+            'ruta': None,
+            'paginas': 0,
+            'nota': None,
+        }
+        if extension not in self.EXTENSIONES_PDF | self.EXTENSIONES_IMAGEN:
+            parte['nota'] = f"no incluido (formato .{extension or '?'})"
+            return parte
+
+        origen = os.path.join(carpeta, f"{posicion}.{extension}")
+        with open(origen, 'wb') as archivo:
+            for bloque in self._personal_repo.iter_document_content(doc['id_documento']):
+                archivo.write(bloque)
+        if os.path.getsize(origen) == 0:
+            parte['nota'] = "no incluido (sin contenido)"
+            return parte
+
+        try:
+            if extension in self.EXTENSIONES_IMAGEN:
+                destino = os.path.join(carpeta, f"{posicion}.pdf")
+                self._imagen_a_pdf(origen, destino)
+                os.remove(origen)
+            else:
+                destino = origen
+            parte['paginas'] = len(PdfReader(destino).pages)
+            parte['ruta'] = destino
+        except Exception as e:
+            current_app.logger.error(f"Dossier: no se pudo procesar el documento {doc['id_documento']}: {e}")
+            parte['nota'] = "no incluido (archivo dañado)"
+        return parte
+
+    def _imagen_a_pdf(self, origen, destino):
+        with Image.open(origen) as imagen:
+            # En JPEG, 'draft' decodifica directamente a menor escala y reduce la memoria usada.
+            imagen.draft('RGB', self.TAMANIO_MAXIMO_IMAGEN)
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.thumbnail(self.TAMANIO_MAXIMO_IMAGEN)
+            if imagen.mode in ('RGBA', 'LA', 'P'):
+                imagen = imagen.convert('RGBA')
+                fondo = Image.new('RGB', imagen.size, 'white')
+                fondo.paste(imagen, mask=imagen.getchannel('A'))
+                imagen = fondo
+            elif imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+            imagen.save(destino, 'PDF', resolution=self.RESOLUCION)
+
+    def _generar_portada_e_indice(self, personal, partes, destino):
+        """Dibuja la portada y las páginas del índice; devuelve cuántas páginas ocupan."""
+        lineas = []
+        seccion_actual = None
+        for parte in partes:
+            if parte['seccion'] != seccion_actual:
+                seccion_actual = parte['seccion']
+                lineas.append(('seccion', seccion_actual, None))
+            lineas.append(('documento', parte['titulo'], parte))
+        paginas_indice = max(1, -(-len(lineas) // self.LINEAS_POR_PAGINA_INDICE))
+
+        # Los documentos comienzan después de la portada y del índice (numeración desde 1).
+        pagina = 1 + paginas_indice + 1
+        for _, _, parte in lineas:
+            if parte and parte['ruta']:
+                parte['pagina_inicio'] = pagina
+                pagina += parte['paginas']
+
+        titulo = ImageFont.load_default(size=56)
+        subtitulo = ImageFont.load_default(size=34)
+        texto = ImageFont.load_default(size=26)
+
+        portada = Image.new('RGB', self.TAMANIO_PAGINA, 'white')
+        dibujo = ImageDraw.Draw(portada)
+        y = 520
+        dibujo.text((self.MARGEN, y), "LEGAJO DE PERSONAL", font=titulo, fill='#0D47A1')
+        y += 120
+        nombre = f"{personal.get('apellidos') or ''}, {personal.get('nombres') or ''}".strip(', ')
+        dibujo.text((self.MARGEN, y), nombre, font=subtitulo, fill='black')
+        y += 70
+        dibujo.text((self.MARGEN, y), f"DNI: {personal.get('dni') or '-'}", font=texto, fill='black')
+        y += 50
+        documentos_incluidos = sum(1 for p in partes if p['ruta'])
+        dibujo.text((self.MARGEN, y), f"Documentos incluidos: {documentos_incluidos} de {len(partes)}", font=texto, fill='black')
+        dibujo.text(
+            (self.MARGEN, self.TAMANIO_PAGINA[1] - self.MARGEN),
+            f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')}", font=texto, fill='#555555'
+        )
+
+        paginas = []
+        ancho_texto = 70
+        for inicio in range(0, max(len(lineas), 1), self.LINEAS_POR_PAGINA_INDICE):
+            pagina_indice = Image.new('RGB', self.TAMANIO_PAGINA, 'white')
+            dibujo = ImageDraw.Draw(pagina_indice)
+            dibujo.text((self.MARGEN, self.MARGEN), "Índice", font=subtitulo, fill='#0D47A1')
+            y = self.MARGEN + 80
+            for tipo, etiqueta, parte in lineas[inicio:inicio + self.LINEAS_POR_PAGINA_INDICE]:
+                if tipo == 'seccion':
+                    dibujo.text((self.MARGEN, y), etiqueta, font=texto, fill='#0D47A1')
+                else:
+                    etiqueta = etiqueta if len(etiqueta) <= ancho_texto else etiqueta[:ancho_texto - 3] + '...'
+                    dibujo.text((self.MARGEN + 30, y), etiqueta, font=texto, fill='black')
+                    referencia = f"pág. {parte['pagina_inicio']}" if parte['ruta'] else parte['nota']
+                    ancho = dibujo.textlength(referencia, font=texto)
+                    dibujo.text((self.TAMANIO_PAGINA[0] - self.MARGEN - ancho, y), referencia, font=texto, fill='#555555')
+                y += 36
+            paginas.append(pagina_indice)
+
+        portada.save(destino, 'PDF', resolution=self.RESOLUCION, save_all=True, append_images=paginas)
+        return 1 + len(paginas)
+
+    def _eliminar_versiones_anteriores(self, personal_id, ruta_vigente):
+        for ruta in glob.glob(os.path.join(self.output_dir, f"dossier_{personal_id}_*.pdf")):
+            if os.path.abspath(ruta) != os.path.abspath(ruta_vigente):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
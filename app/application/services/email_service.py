@@ -1,13 +1,16 @@
 # app/application/services/email_service.py
 # Importa la clase Message para crear correos y Flask's 'current_app' y 'render_template'.
+import time
 from flask_mail import Message
 from flask import current_app, render_template
+from app.infrastructure.mail.mail_dispatcher import ConexionSMTP
 
 # Define el servicio para el envío de correos.
 class EmailService:
-    # El constructor recibe la instancia de Flask-Mail para poder enviar correos.
-    def __init__(self, mail_instance):
+    # El constructor recibe la instancia de Flask-Mail y, opcionalmente, la cola de envío en segundo plano.
+    def __init__(self, mail_instance, dispatcher=None):
         self.mail = mail_instance
+        self.dispatcher = dispatcher
 
     # Método para enviar el correo con el código de verificación 2FA.
     def send_2fa_code(self, recipient_email, user_name, code):
@@ -24,9 +27,44 @@ class EmailService:
                 user_name=user_name,
                 verification_code=code
             )
-            # Envía el correo.
-            self.mail.send(msg)
+            # Se encola para el hilo emisor; solo si la cola no está disponible se envía en línea.
+            if self.dispatcher is None or not self.dispatcher.enqueue(msg):
+                self.mail.send(msg)
         except Exception as e:
             # Si ocurre un error, lo registra en el log y lanza una excepción más genérica.
             current_app.logger.error(f"Error al enviar email de 2FA a {recipient_email}: {e}")
-            raise ConnectionError("No se pudo enviar el correo de verificación.")
\ No newline at end of file
+            raise ConnectionError("No se pudo enviar el correo de verificación.")
+
+    def get_delivery_metrics(self):
+        """Devuelve los contadores de la cola de envío (o None si no hay cola)."""
+        return self.dispatcher.metrics() if self.dispatcher else None
+
+    # Método para enviar muchos correos reutilizando una sola conexión SMTP.
+    def send_bulk(self, messages, max_retries=3, rate_per_minute=30):
+        """
+        Envía una lista de objetos Message por una única conexión SMTP, con los mismos
+        reintentos que la cola de envío (ConexionSMTP). Entre envíos se respeta un máximo de
+        `rate_per_minute` correos por minuto. Devuelve (enviados, fallidos) donde fallidos es
+        una lista de (mensaje, error).
+        """
+        intervalo = 60.0 / rate_per_minute if rate_per_minute else 0
+        enviados = 0
+        fallidos = []
+        smtp = ConexionSMTP(self.mail, max_retries, backoff_seconds=2.0)
+        ultimo_envio = 0.0
+        try:
+            for msg in messages:
+                espera = ultimo_envio + intervalo - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                try:
+                    smtp.send(msg)
+                except Exception as e:
+                    current_app.logger.error(f"Error al enviar correo a {msg.recipients}: {e}")
+                    fallidos.append((msg, str(e)))
+                    continue
+                ultimo_envio = time.monotonic()
+                enviados += 1
+        finally:
+            smtp.close()
+        return enviados, fallidos
@@ -0,0 +1,168 @@
+# RUTA: app/application/services/error_capture_service.py
+
+import hashlib
+import os
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+
+class ErrorCaptureService:
+    """
+    Captura de errores de la aplicación, agrupados por huella.
+
+    La huella de un error es el tipo de excepción más su ubicación (archivo, función y línea
+    del último punto del código de la aplicación en el traceback). Las ocurrencias se cuentan en
+    memoria (cantidad, primera y última vez, último mensaje y usuario) y un hilo las escribe en la
+    bitácora cada `flush_interval` segundos: una fila por huella y período, con el conteo en el
+    detalle. Así, una dependencia caída que falla en cada petición produce una fila por minuto
+    y no una por petición. Si hay más de `max_groups` huellas sin volcar, las nuevas solo se cuentan.
+    """
+
+    ACCION = 'ERROR'
+
+    def __init__(self, audit_service, audit_repository, flush_interval=60, max_groups=500):
+        self._audit_service = audit_service
+        self._audit_repo = audit_repository
+        self.flush_interval = flush_interval
+        self.max_groups = max_groups
+        self._grupos = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self._raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self._metricas = {'capturados': 0, 'filas_escritas': 0, 'descartados': 0, 'ultimo_volcado': None}
+
+    # --- CAPTURA ---
+
+    def capture(self, exc, modulo=None, usuario_id=None, ruta=None):
+        """
+        Registra una ocurrencia de `exc`. Devuelve True si es la primera de su huella en el
+        período actual (quien llama puede usarlo para decidir si además la envía al log).
+        """
+        tipo = type(exc).__name__
+        ubicacion = self._ubicacion(exc)
+        huella = hashlib.sha1(f"{tipo}|{ubicacion}".encode('utf-8')).hexdigest()[:16]
+        mensaje = str(exc)[:500] or tipo
+        ahora = datetime.now()
+        with self._lock:
+            self._metricas['capturados'] += 1
+            grupo = self._grupos.get(huella)
+            if grupo is None:
+                if len(self._grupos) >= self.max_groups:
+                    # Demasiadas huellas distintas sin volcar: se cuentan pero no se guardan.
+                    self._metricas['descartados'] += 1
+                    return False
+                grupo = self._grupos[huella] = {
+                    'huella': huella, 'tipo': tipo, 'ubicacion': ubicacion, 'modulo': modulo or ubicacion,
+                    'conteo': 0, 'primera': ahora, 'ultima': ahora,
+                }
+            grupo['conteo'] += 1
+            grupo['ultima'] = ahora
+            grupo['mensaje'] = mensaje
+            grupo['usuario_id'] = usuario_id
+            grupo['ruta'] = ruta
+            return grupo['conteo'] == 1
+
+    def _ubicacion(self, exc):
+        # El último marco del traceback que pertenece al código de la aplicación (no a librerías).
+        marcos = traceback.extract_tb(exc.__traceback__) if exc.__traceback__ else []
+        propios = [m for m in marcos if os.path.abspath(m.filename).startswith(self._raiz)]
+        marco = (propios or marcos or [None])[-1]
+        if marco is None:
+            return 'desconocida'
+        archivo = os.path.relpath(marco.filename, self._raiz) if propios else os.path.basename(marco.filename)
+        return f"{archivo.replace(os.sep, '/')}:{marco.name}:{marco.lineno}"
+
+    # --- VOLCADO ---
+
+    def start(self, app):
+        """Inicia el hilo que vuelca los errores agrupados (una sola vez por proceso)."""
+        if self._hilo is not None:
+            return
+
+        def _volcador():
+            while not self._detener.wait(self.flush_interval):
+                with app.app_context():
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        app.logger.error(f"No se pudieron volcar los errores agrupados: {e}")
+
+        self._hilo = threading.Thread(target=_volcador, name='volcado-errores', daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        """Detiene el hilo y vuelca lo pendiente (se llama al cerrar la aplicación)."""
+        self._detener.set()
+        self.flush()
+
+    def flush(self):
+        """Escribe en la bitácora una fila por huella con las ocurrencias acumuladas desde el último volcado."""
+        with self._lock:
+            grupos, self._grupos = list(self._grupos.values()), {}
+            self._metricas['ultimo_volcado'] = datetime.now().isoformat(timespec='seconds')
+        for i, grupo in enumerate(grupos):
+            veces = f"[{grupo['conteo']} ocurrencias] " if grupo['conteo'] > 1 else ''
+            try:
+                self._audit_service.log(
+                    grupo['usuario_id'], grupo['modulo'], self.ACCION,
+                    f"{veces}{grupo['tipo']}: {grupo['mensaje']}",
+                    detalle_dict={
+                        'huella': grupo['huella'],
+                        'tipo': grupo['tipo'],
+                        'ubicacion': grupo['ubicacion'],
+                        'ruta': grupo['ruta'],
+                        'conteo': grupo['conteo'],
+                        'primera': grupo['primera'].isoformat(timespec='seconds'),
+                        'ultima': grupo['ultima'].isoformat(timespec='seconds'),
+                    }
+                )
+            except Exception:
+                # Lo no escrito vuelve a memoria y se intenta en el próximo volcado.
+                self._devolver(grupos[i:])
+                raise
+            with self._lock:
+                self._metricas['filas_escritas'] += 1
+        return len(grupos)
+
+    def _devolver(self, grupos):
+        with self._lock:
+            for grupo in grupos:
+                actual = self._grupos.get(grupo['huella'])
+                if actual is None:
+                    self._grupos[grupo['huella']] = grupo
+                else:
+                    actual['conteo'] += grupo['conteo']
+                    actual['primera'] = min(actual['primera'], grupo['primera'])
+
+    # --- CONSULTA ---
+
+    def get_error_groups(self, days=7, limit=100):
+        """
+        Errores agrupados de los últimos `days` días, del más reciente al más antiguo. Suma a lo
+        ya escrito en la bitácora las ocurrencias en memoria que aún no se volcaron.
+        """
+        grupos = {g['huella']: g for g in self._audit_repo.get_error_groups(datetime.now() - timedelta(days=days), limit)}
+        with self._lock:
+            pendientes = [dict(g) for g in self._grupos.values()]
+        for pendiente in pendientes:
+            grupo = grupos.get(pendiente['huella'])
+            if grupo is None:
+                grupos[pendiente['huella']] = {
+                    'huella': pendiente['huella'], 'total': pendiente['conteo'],
+                    'primera': pendiente['primera'], 'ultima': pendiente['ultima'],
+                    'modulo': pendiente['modulo'], 'descripcion': f"{pendiente['tipo']}: {pendiente['mensaje']}",
+                    'tipo': pendiente['tipo'], 'ubicacion': pendiente['ubicacion'], 'usuario': None,
+                }
+            else:
+                grupo['total'] += pendiente['conteo']
+                grupo['ultima'] = max(grupo['ultima'], pendiente['ultima'])
+        return sorted(grupos.values(), key=lambda g: g['ultima'], reverse=True)[:limit]
+
+    def metrics(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['huellas_pendientes'] = len(self._grupos)
+            metricas['ocurrencias_pendientes'] = sum(g['conteo'] for g in self._grupos.values())
+        return metricas
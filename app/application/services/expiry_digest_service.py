@@ -0,0 +1,215 @@
+# RUTA: app/application/services/expiry_digest_service.py
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app, render_template
+from flask_mail import Message
+
+
+class ExpiryDigestService:
+    """
+    Envía una vez al día un resumen por correo de los documentos que cruzan los umbrales de
+    vencimiento (por defecto 30, 15, 7 y 0 días), agrupado por usuario responsable.
+
+    Solo se informa la diferencia respecto de la ejecución anterior: cada documento se notifica
+    una vez por umbral cruzado. El estado (última ejecución y umbral ya notificado por documento)
+    se guarda en un archivo JSON, y un archivo de bloqueo evita que varios procesos del
+    servidor envíen el mismo resumen.
+    """
+
+    # Un bloqueo más antiguo que esto se considera abandonado (proceso caído a mitad del envío).
+    BLOQUEO_MAXIMO_SEGUNDOS = 3600
+    # Cada cuánto revisa el hilo programador si corresponde enviar el resumen del día.
+    INTERVALO_REVISION_SEGUNDOS = 600
+
+    def __init__(self, legajo_service, usuario_repository, email_service, state_file,
+                 thresholds=(30, 15, 7, 0), fallback_roles=('AdministradorLegajos',), send_hour=7,
+                 rate_per_minute=30, max_retries=3):
+        self._legajo_service = legajo_service
+        self._usuario_repo = usuario_repository
+        self._email_service = email_service
+        self.state_file = state_file
+        self.thresholds = sorted(set(thresholds))
+        self.fallback_roles = tuple(fallback_roles)
+        self.send_hour = send_hour
+        self.rate_per_minute = rate_per_minute
+        self.max_retries = max_retries
+        self._scheduler = None
+
+    # --- EJECUCIÓN ---
+
+    def run(self, today=None, force=False):
+        """
+        Calcula y envía el resumen del día. Si ya se envió hoy (y no se fuerza) o si otro proceso
+        lo está enviando, no hace nada. Devuelve un diccionario con el resultado.
+        """
+        today = today or date.today()
+        if not self._tomar_bloqueo():
+            return {'estado': 'en_curso'}
+        try:
+            estado = self._leer_estado()
+            if not force and estado.get('ultima_ejecucion') == today.isoformat():
+                return {'estado': 'omitido'}
+
+            documentos = self._legajo_service.get_expiring_documents_notifications(max(self.thresholds))
+            nuevos, notificados = self.compute_delta(documentos, estado.get('notificados', {}), today)
+            resumenes = self._agrupar_por_responsable(nuevos)
+
+            mensajes = []
+            for destinatario in resumenes.values():
+                mensajes.append(self._crear_mensaje(destinatario, today))
+            enviados, fallidos = self._email_service.send_bulk(
+                mensajes, max_retries=self.max_retries, rate_per_minute=self.rate_per_minute
+            )
+
+            # Los documentos cuyo resumen no llegó a ningún destinatario se vuelven a intentar mañana.
+            correos_fallidos = {m.recipients[0] for m, _ in fallidos}
+            entregados = set()
+            for destinatario in resumenes.values():
+                if destinatario['email'] not in correos_fallidos:
+                    entregados.update(doc['id_documento'] for doc in destinatario['documentos'])
+            for doc in nuevos:
+                if doc['id_documento'] not in entregados:
+                    notificados.pop(str(doc['id_documento']), None)
+                    previo = estado.get('notificados', {}).get(str(doc['id_documento']))
+                    if previo:
+                        notificados[str(doc['id_documento'])] = previo
+
+            self._guardar_estado({'ultima_ejecucion': today.isoformat(), 'notificados': notificados})
+            resultado = {
+                'estado': 'enviado',
+                'documentos': len(nuevos),
+                'destinatarios': len(resumenes),
+                'enviados': enviados,
+                'fallidos': len(fallidos),
+            }
+            current_app.logger.info(f"Resumen de vencimientos del {today.isoformat()}: {resultado}")
+            return resultado
+        finally:
+            self._liberar_bloqueo()
+
+    def compute_delta(self, documentos, notificados, today):
+        """
+        Determina qué documentos cruzaron un umbral nuevo desde la ejecución anterior.
+        Devuelve (nuevos, notificados_actualizados); los documentos que ya no aparecen (renovados
+        o eliminados) salen del estado, y si cambió la fecha de vencimiento se vuelve a empezar.
+        """
+        nuevos = []
+        actualizados = {}
+        for doc in documentos:
+            vencimiento = doc['fecha_vencimiento']
+            if isinstance(vencimiento, datetime):
+                vencimiento = vencimiento.date()
+            dias = (vencimiento - today).days
+            umbral = next((t for t in self.thresholds if dias <= t), None)
+            if umbral is None:
+                continue
+
+            clave = str(doc['id_documento'])
+            previo = notificados.get(clave)
+            if previo and previo['vencimiento'] == vencimiento.isoformat() and previo['umbral'] <= umbral:
+                actualizados[clave] = previo
+                continue
+            actualizados[clave] = {'umbral': umbral, 'vencimiento': vencimiento.isoformat()}
+            nuevos.append(dict(doc, dias_restantes=dias, umbral=umbral))
+        return nuevos, actualizados
+
+    def _agrupar_por_responsable(self, documentos):
+        # Documentos sin responsable con correo en su unidad van a los usuarios de los roles de respaldo.
+        resumenes = {}
+        respaldo = None
+        for doc in documentos:
+            if doc.get('responsable_email'):
+                contactos = [{'email': doc['responsable_email'], 'nombre_completo': doc.get('responsable_nombre')}]
+            else:
+                if respaldo is None:
+                    respaldo = [c for c in self._usuario_repo.find_active_contacts_by_role(self.fallback_roles) if c.get('email')]
+                contactos = respaldo
+            for contacto in contactos:
+                email = contacto['email'].strip().lower()
+                destinatario = resumenes.setdefault(email, {
+                    'email': email,
+                    'nombre': (contacto.get('nombre_completo') or '').strip() or email,
+                    'documentos': [],
+                })
+                destinatario['documentos'].append(doc)
+        return resumenes
+
+    def _crear_mensaje(self, destinatario, today):
+        documentos = sorted(destinatario['documentos'], key=lambda d: (d['dias_restantes'], d.get('apellidos') or ''))
+        vencidos = sum(1 for d in documentos if d['dias_restantes'] <= 0)
+        msg = Message(
+            subject=f"Resumen de vencimientos de documentos ({len(documentos)}) - Legajo Digital DIRESA",
+            sender=current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=[destinatario['email']]
+        )
+        msg.html = render_template(
+            'email/resumen_vencimientos.html',
+            user_name=destinatario['nombre'],
+            documentos=documentos,
+            vencidos=vencidos,
+            fecha=today
+        )
+        return msg
+
+    # --- PROGRAMACIÓN ---
+
+    def start_scheduler(self, app):
+        """Inicia (una sola vez por proceso) el hilo que envía el resumen a partir de la hora configurada."""
+        if self._scheduler is not None:
+            return
+
+        def _programador():
+            while True:
+                try:
+                    if datetime.now().hour >= self.send_hour:
+                        with app.app_context():
+                            self.run()
+                except Exception as e:
+                    app.logger.error(f"Error en el envío programado del resumen de vencimientos: {e}")
+                time.sleep(self.INTERVALO_REVISION_SEGUNDOS)
+
+        self._scheduler = threading.Thread(target=_programador, name='resumen-vencimientos', daemon=True)
+        self._scheduler.start()
+
+    # --- ESTADO Y BLOQUEO ---
+
+    def _leer_estado(self):
+        try:
+            with open(self.state_file, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            current_app.logger.error(f"Estado del resumen de vencimientos ilegible, se reinicia: {e}")
+            return {}
+
+    def _guardar_estado(self, estado):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temporal = f"{self.state_file}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(estado, archivo)
+        os.replace(temporal, self.state_file)
+
+    def _tomar_bloqueo(self):
+        ruta = f"{self.state_file}.lock"
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(ruta) > self.BLOQUEO_MAXIMO_SEGUNDOS:
+                os.remove(ruta)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _liberar_bloqueo(self):
+        try:
+            os.remove(f"{self.state_file}.lock")
+        except OSError:
+            pass
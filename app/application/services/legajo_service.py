@@ -5,16 +5,33 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
 import io
+import threading
+import time
 from flask import current_app
 from datetime import datetime, timedelta
+from app.utils.pagination import SimplePagination
+from app.utils.search_index import PersonalSearchIndex
+from app.utils.dni_bitmap import DniBitmap
+from app.utils.legajo_cache import LegajoCache
+from app.utils.expiry_index import ExpiryIndex
 
 
 # Define el servicio que contiene la lógica de negocio para los legajos.
 class LegajoService:
     # El constructor inyecta las dependencias del repositorio de personal y el servicio de auditoría.
-    def __init__(self, personal_repository, audit_service):
+    def __init__(self, personal_repository, audit_service, search_index=None, dni_bitmap=None, legajo_cache=None,
+                 expiry_index=None):
         self._personal_repo = personal_repository
         self._audit_service = audit_service
+        # Estructuras en memoria (por proceso): índice de búsqueda y mapa de DNIs registrados.
+        self._search_index = search_index or PersonalSearchIndex()
+        self._dni_bitmap = dni_bitmap or DniBitmap()
+        self._in_memory_lock = threading.Lock()
+        # Caché de datos de legajo por id_personal, invalidada en cada escritura sobre el legajo.
+        self._legajo_cache = legajo_cache or LegajoCache()
+        # Índice de vencimientos de documentos ordenado por fecha, con su propio candado de carga.
+        self._expiry_index = expiry_index or ExpiryIndex()
+        self._expiry_lock = threading.Lock()
 
     # --- MÉTODOS DE CONSULTA (GETTERS) ---
 
@@ -31,16 +48,83 @@ class LegajoService:
         return {"filename": document_row[0], "data": document_row[1]}
 
     def check_if_dni_exists(self, dni):
-        """Orquesta la verificación de la existencia de un DNI."""
+        """
+        Orquesta la verificación de la existencia de un DNI. Se responde desde el mapa de
+        bits en memoria; mientras no esté cargado (o el DNI no tenga 8 dígitos) se consulta la BD.
+        """
+        existe = self._dni_bitmap.contains(dni)
+        if existe is not None:
+            self._refresh_in_memory_data_if_stale()
+            return existe
+        if not self._dni_bitmap.is_loaded:
+            self._reload_in_memory_data_in_background()
         return self._personal_repo.check_dni_exists(dni)
 
     def get_all_personal_paginated(self, page, per_page, filters=None):
-        """Obtiene una lista paginada y filtrada de personal."""
+        """
+        Obtiene una lista paginada y filtrada de personal.
+        Si se busca por nombre, el filtrado y el orden por relevancia se resuelven con el
+        índice en memoria y solo se consulta a la BD por las filas de la página pedida.
+        """
+        nombres = filters.get('nombres') if filters else None
+        if nombres:
+            index = self._get_search_index()
+            if index is not None:
+                resultados = index.search(nombres, dni=filters.get('dni'))
+                inicio = (page - 1) * per_page
+                ids_pagina = [id_personal for id_personal, _ in resultados[inicio:inicio + per_page]]
+                filas = {fila['id_personal']: fila for fila in self._personal_repo.find_by_ids_for_listing(ids_pagina)}
+                items = [filas[id_personal] for id_personal in ids_pagina if id_personal in filas]
+                return SimplePagination(items, page, per_page, len(resultados))
         return self._personal_repo.get_all_paginated(page, per_page, filters)
 
-    def get_personal_details(self, personal_id):
-        """Obtiene todos los detalles del legajo de una persona por su ID."""
-        return self._personal_repo.get_full_legajo_by_id(personal_id)
+    def get_all_personal_projected(self, page, per_page, filters=None, fields=None, sort_by='apellidos', sort_desc=False):
+        """
+        Variante de get_all_personal_paginated para la API JSON: permite elegir columnas,
+        columna de orden y filtros adicionales (unidad, activo, sexo, vencimiento), todo
+        resuelto en SQL. Devuelve (columnas, paginación con filas como listas).
+        """
+        return self._personal_repo.get_page_projected(page, per_page, filters, fields, sort_by, sort_desc)
+
+    def search_personal(self, texto, limit=10):
+        """Devuelve sugerencias de personal (activo) ordenadas por relevancia para el autocompletado."""
+        index = self._get_search_index()
+        if index is not None:
+            return index.suggest(texto, limit=limit)
+        # Sin índice disponible se recurre al SP de listado como respaldo.
+        pagination = self._personal_repo.get_all_paginated(1, limit, {'dni': None, 'nombres': texto})
+        return [
+            {'id_personal': p.get('id_personal'), 'dni': p.get('dni'), 'nombres': p.get('nombres'),
+             'apellidos': p.get('apellidos'), 'activo': bool(p.get('activo'))}
+            for p in pagination.items
+        ]
+
+    def get_personal_header(self, personal_id):
+        """
+        Obtiene lo mínimo para pintar la ficha del legajo: datos personales y el número
+        de documentos por sección. El resto se carga bajo demanda por sección.
+        """
+        cabecera = self._legajo_cache.get(personal_id, 'cabecera')
+        if cabecera is not None:
+            return cabecera
+        personal = self._personal_repo.find_personal_info_by_id(personal_id)
+        if not personal:
+            return None
+        cabecera = {
+            'personal': personal,
+            'conteo_documentos': self._personal_repo.count_documents_by_seccion(personal_id),
+        }
+        self._legajo_cache.set(personal_id, 'cabecera', cabecera)
+        return cabecera
+
+    def get_documents_by_seccion(self, personal_id, id_seccion):
+        """Obtiene los documentos de una sección concreta del legajo."""
+        clave = f"documentos:{id_seccion}"
+        documentos = self._legajo_cache.get(personal_id, clave)
+        if documentos is None:
+            documentos = self._personal_repo.find_documents_by_seccion(personal_id, id_seccion)
+            self._legajo_cache.set(personal_id, clave, documentos)
+        return documentos
 
     def get_documents_by_personal_id(self, personal_id):
         """Obtiene los documentos de un empleado."""
@@ -62,9 +146,28 @@ class LegajoService:
     def register_new_personal(self, form_data, creating_user_id):
         """Registra un nuevo empleado y audita la acción."""
         new_personal_id = self._personal_repo.create(form_data)
+        self._index_personal(new_personal_id, form_data, activo=True)
         self._audit_service.log(creating_user_id, 'Personal', 'CREAR', f"Se creó el legajo para el DNI {form_data['dni']}", form_data)
         return new_personal_id
 
+    def update_personal_details(self, personal_id, form_data, updating_user_id):
+        """Actualiza los datos de un empleado y audita solo los campos que cambiaron."""
+        previo = self._personal_repo.find_by_id(personal_id)
+        self._personal_repo.update(personal_id, form_data)
+        self._legajo_cache.invalidate(personal_id)
+        actual = self._search_index.get(personal_id)
+        if actual and actual['dni'] != form_data.get('dni'):
+            self._dni_bitmap.discard(actual['dni'])
+        self._index_personal(personal_id, form_data, activo=actual['activo'] if actual else True)
+        self._audit_service.log(
+            updating_user_id,
+            'Personal',
+            'ACTUALIZAR',
+            f"Se actualizó el legajo del personal ID {personal_id}",
+            form_data,
+            anterior=vars(previo) if previo else None
+        )
+
     def upload_document_to_personal(self, form_data, file_storage, current_user_id):
         """Gestiona la validación y subida de un nuevo documento."""
         if not file_storage or not file_storage.filename:
@@ -90,13 +193,18 @@ class LegajoService:
         doc_data['hash_archivo'] = file_hash
         id_personal = doc_data.get('id_personal')
 
-        self._personal_repo.add_document(doc_data, file_bytes)
+        document_id = self._personal_repo.add_document(doc_data, file_bytes)
+        # El id puede llegar como texto desde el formulario; la caché usa el entero de la ruta.
+        self._legajo_cache.invalidate(int(id_personal))
+        if document_id is not None:
+            self._expiry_index.add(document_id, int(id_personal), doc_data.get('fecha_vencimiento'))
         
         self._audit_service.log(
             current_user_id,
             'Documentos',
             'SUBIR',
-            f"Subió el archivo '{filename}' al legajo del personal ID {id_personal}"
+            f"Subió el archivo '{filename}' al legajo del personal ID {id_personal}",
+            doc_data
         )
 
     def delete_personal_by_id(self, personal_id, deleting_user_id):
@@ -106,16 +214,23 @@ class LegajoService:
             raise ValueError("La persona que intenta eliminar no existe.")
 
         self._personal_repo.delete_by_id(personal_id)
+        self._legajo_cache.invalidate(personal_id)
+        self._expiry_index.remove_personal(personal_id)
+        self._search_index.set_activo(personal_id, False)
         self._audit_service.log(
             deleting_user_id,
             'Personal',
             'ELIMINAR (Desactivar)',
-            f"Se desactivó el legajo del personal con DNI {persona['dni']}"
+            f"Se desactivó el legajo del personal con DNI {persona.dni}"
         )
 
     def delete_document_by_id(self, document_id, deleting_user_id):
         """Orquesta la eliminación lógica de un documento y lo audita."""
+        personal_id = self._personal_repo.find_personal_id_by_document_id(document_id)
         self._personal_repo.delete_document_by_id(document_id)
+        self._expiry_index.remove(document_id)
+        if personal_id is not None:
+            self._legajo_cache.invalidate(personal_id)
         self._audit_service.log(
             deleting_user_id,
             'Documentos',
@@ -123,6 +238,90 @@ class LegajoService:
             f"Se marcó como eliminado el documento con ID {document_id}"
         )
 
+    # --- ESTRUCTURAS EN MEMORIA (ÍNDICE DE BÚSQUEDA Y DNIs) ---
+
+    def refresh_personal(self, personal_ids):
+        """
+        Vuelve a leer de la base de datos a las personas modificadas fuera de este servicio
+        (ej. solicitudes aprobadas) y actualiza la caché del legajo y el índice de búsqueda.
+        """
+        for personal_id in personal_ids:
+            self._legajo_cache.invalidate(personal_id)
+            persona = self._personal_repo.find_by_id(personal_id)
+            if persona is None:
+                continue
+            actual = self._search_index.get(personal_id)
+            if actual and actual['dni'] != persona.dni:
+                self._dni_bitmap.discard(actual['dni'])
+            self._index_personal(personal_id, vars(persona), activo=persona.activo)
+
+    def _index_personal(self, personal_id, form_data, activo):
+        """Refleja en las estructuras en memoria los datos recién guardados de una persona."""
+        self._dni_bitmap.add(form_data.get('dni'))
+        self._search_index.upsert({
+            'id_personal': personal_id,
+            'dni': form_data.get('dni'),
+            'nombres': form_data.get('nombres'),
+            'apellidos': form_data.get('apellidos'),
+            'activo': activo,
+        })
+
+    def _load_in_memory_data(self):
+        # Una sola consulta alimenta el índice de búsqueda y el mapa de DNIs.
+        registros = self._personal_repo.get_all_for_search_index()
+        cargado_en = time.monotonic()
+        self._search_index.build(registros, cargado_en=cargado_en)
+        self._dni_bitmap.build((r.get('dni') for r in registros), cargado_en=cargado_en)
+
+    def _get_search_index(self):
+        """
+        Devuelve el índice de búsqueda, cargándolo en el primer uso.
+        Devuelve None si no se pudo cargar, para que el llamador use la BD.
+        """
+        index = self._search_index
+        if index.cargado_en is None:
+            with self._in_memory_lock:
+                if index.cargado_en is None:
+                    try:
+                        self._load_in_memory_data()
+                    except Exception as e:
+                        current_app.logger.error(f"No se pudo cargar el índice de búsqueda de personal: {e}")
+                        return None
+        else:
+            self._refresh_in_memory_data_if_stale()
+        return index
+
+    def _refresh_in_memory_data_if_stale(self):
+        """
+        Pasado el intervalo SEARCH_INDEX_REFRESH_SECONDS recarga las estructuras en segundo
+        plano para recoger cambios hechos por otros procesos (workers); mientras tanto se
+        siguen sirviendo las actuales.
+        """
+        cargado_en = self._search_index.cargado_en
+        if cargado_en is not None and time.monotonic() - cargado_en > current_app.config.get('SEARCH_INDEX_REFRESH_SECONDS', 300):
+            self._reload_in_memory_data_in_background()
+
+    def warm_up_in_memory_data(self, app):
+        """Lanza la carga inicial de las estructuras en memoria al arrancar la aplicación."""
+        self._reload_in_memory_data_in_background(app)
+
+    def _reload_in_memory_data_in_background(self, app=None):
+        # Si ya hay una carga en curso no se lanza otra.
+        if not self._in_memory_lock.acquire(blocking=False):
+            return
+        app = app or current_app._get_current_object()
+
+        def _recargar():
+            try:
+                with app.app_context():
+                    self._load_in_memory_data()
+            except Exception as e:
+                app.logger.error(f"Error al recargar los datos en memoria de personal: {e}")
+            finally:
+                self._in_memory_lock.release()
+
+        threading.Thread(target=_recargar, name='recarga-datos-personal', daemon=True).start()
+
     # --- MÉTODOS DE REPORTES Y ESTADO ---
     
     def generate_general_report_excel(self):
@@ -167,16 +366,27 @@ class LegajoService:
         
         return excel_stream
 
-    def check_document_status_for_all_personal(self, days_to_expire=30):
-        """Revisa documentos con fecha de vencimiento y resume el estado por persona."""
+    def check_document_status_for_all_personal(self, days_to_expire=30, personal_ids=None):
+        """
+        Resume por persona los documentos vencidos y por vencer en `days_to_expire` días.
+        Con `personal_ids` solo se calcula para esas personas (ej. la página del listado).
+        Se responde desde el índice de vencimientos; si no está disponible, se recorre la consulta completa.
+        """
+        today = datetime.now().date()
+        index = self._get_expiry_index()
+        if index is not None:
+            return index.status_summary(today, days_to_expire, personal_ids)
+
         all_docs = self._personal_repo.get_all_documents_with_expiration()
         status_summary = {}
-        today = datetime.now().date()
         expiration_threshold = today + timedelta(days=days_to_expire)
+        solo = set(personal_ids) if personal_ids is not None else None
 
         for doc in all_docs:
             personal_id = doc['id_personal']
             vencimiento = doc['fecha_vencimiento']
+            if solo is not None and personal_id not in solo:
+                continue
 
             if personal_id not in status_summary:
                 status_summary[personal_id] = {'expired': 0, 'expiring_soon': 0}
@@ -190,10 +400,54 @@ class LegajoService:
 
     def get_expiring_documents_notifications(self, days_threshold=30):
         """
-        Orquesta la obtención de una lista de notificaciones sobre documentos que están por vencer.
+        Orquesta la obtención de una lista de notificaciones sobre documentos que están por vencer
+        (incluye los vencidos). El índice en memoria acota la consulta a los documentos candidatos.
         """
+        index = self._get_expiry_index()
+        if index is not None:
+            document_ids = index.expiring_ids(datetime.now().date(), days_threshold, include_expired=True)
+            if not document_ids:
+                return []
+            return self._personal_repo.find_expiring_documents(days_threshold, document_ids)
         return self._personal_repo.find_expiring_documents(days_threshold)
 
+    def _get_expiry_index(self):
+        """
+        Devuelve el índice de vencimientos, construyéndolo en el primer uso. Pasado el intervalo
+        EXPIRY_INDEX_REFRESH_SECONDS se reconstruye en segundo plano para recoger los cambios de
+        otros procesos. Devuelve None si no se pudo cargar, para que el llamador use la BD.
+        """
+        index = self._expiry_index
+        if index.cargado_en is None:
+            with self._expiry_lock:
+                if index.cargado_en is None:
+                    try:
+                        index.build(self._personal_repo.get_all_documents_with_expiration(), cargado_en=time.monotonic())
+                    except Exception as e:
+                        current_app.logger.error(f"No se pudo cargar el índice de vencimientos: {e}")
+                        return None
+        elif time.monotonic() - index.cargado_en > current_app.config.get('EXPIRY_INDEX_REFRESH_SECONDS', 300):
+            self._reload_expiry_index_in_background()
+        return index
+
+    def _reload_expiry_index_in_background(self):
+        if not self._expiry_lock.acquire(blocking=False):
+            return
+        app = current_app._get_current_object()
+
+        def _recargar():
+            try:
+                with app.app_context():
+                    self._expiry_index.build(
+                        self._personal_repo.get_all_documents_with_expiration(), cargado_en=time.monotonic()
+                    )
+            except Exception as e:
+                app.logger.error(f"Error al recargar el índice de vencimientos: {e}")
+            finally:
+                self._expiry_lock.release()
+
+        threading.Thread(target=_recargar, name='recarga-vencimientos', daemon=True).start()
+
     def get_empleados_por_unidad(self):
         """
         Orquesta la obtención del conteo de empleados por cada unidad administrativa.
@@ -0,0 +1,186 @@
+# RUTA: app/application/services/notification_service.py
+
+import hashlib
+import json
+import threading
+import time
+from datetime import date, datetime
+
+
+class NotificationBroadcaster:
+    """
+    Notificaciones del tablero (solicitudes pendientes y documentos por vencer).
+
+    Un solo hilo por proceso consulta la base de datos cada `poll_seconds` segundos, y solo
+    mientras los navegadores sigan preguntando, y guarda el resultado (la "foto"). Cada tablero
+    pide la foto cada `poll_seconds` con una petición corta que se responde desde memoria, ya
+    serializada para su rol: no toca la base de datos ni retiene un hilo del servidor, así que
+    cien tableros abiertos cuestan una consulta por intervalo y no una por usuario. Cada foto
+    lleva una huella de su contenido (ETag): si nada cambió, la respuesta es un 304 sin cuerpo.
+    """
+
+    # Roles que ven cada tipo de notificación (las solicitudes las atiende Sistemas).
+    ROLES_SOLICITUDES = ('Sistemas',)
+    ROLES_VENCIMIENTOS = ('AdministradorLegajos', 'RRHH', 'Sistemas')
+    # Sin pedidos durante este número de intervalos, el hilo deja de consultar.
+    INTERVALOS_SIN_PEDIDOS = 3
+    # Tope de espera de un pedido cuando no hay foto reciente (primer pedido o hilo inactivo).
+    ESPERA_MAXIMA_SEGUNDOS = 5
+
+    def __init__(self, solicitud_service, legajo_service, poll_seconds=15, expiry_days=30, max_items=10):
+        self._solicitud_service = solicitud_service
+        self._legajo_service = legajo_service
+        self.poll_seconds = poll_seconds
+        self.expiry_days = expiry_days
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._nueva_foto = threading.Condition(self._lock)
+        self._hilo = None
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        # Última foto consultada, su firma (para detectar cambios) y su versión serializada por rol.
+        self._foto = None
+        self._foto_monotonic = 0
+        self._firma = None
+        self._serializados = {}
+        self._ultimo_pedido = None
+        self._metricas = {'consultas': 0, 'errores': 0, 'cambios': 0, 'pedidos': 0, 'ultima_consulta': None}
+
+    # --- PEDIDOS ---
+
+    def snapshot(self, rol):
+        """
+        Devuelve (huella, JSON) con la última foto para el rol, o None si todavía no hay ninguna.
+        Mientras lleguen pedidos el hilo sigue consultando; si la foto es más vieja que el
+        intervalo se adelanta la consulta y, si el hilo estaba inactivo, se espera su resultado.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            self._metricas['pedidos'] += 1
+            self._ultimo_pedido = ahora
+            antiguedad = ahora - self._foto_monotonic if self._foto is not None else None
+        if antiguedad is None or antiguedad >= self.poll_seconds:
+            self._despertar.set()
+        with self._lock:
+            if antiguedad is None or antiguedad > self._inactividad():
+                self._nueva_foto.wait_for(lambda: self._foto_monotonic >= ahora, timeout=self.ESPERA_MAXIMA_SEGUNDOS)
+            if self._foto is None:
+                return None
+            if rol not in self._serializados:
+                datos = self._evento_para(rol, self._foto)
+                self._serializados[rol] = (hashlib.sha256(datos.encode('utf-8')).hexdigest()[:32], datos)
+            return self._serializados[rol]
+
+    def _inactividad(self):
+        return self.poll_seconds * self.INTERVALOS_SIN_PEDIDOS
+
+    # --- CONSULTA PERIÓDICA ---
+
+    def start(self, app):
+        """Inicia el hilo consultor (una sola vez por proceso); espera sin consultar mientras no haya pedidos."""
+        if self._hilo is not None:
+            return
+
+        def _consultor():
+            while not self._detener.is_set():
+                with self._lock:
+                    activo = self._ultimo_pedido is not None and time.monotonic() - self._ultimo_pedido < self._inactividad()
+                if not activo:
+                    self._despertar.wait()
+                    self._despertar.clear()
+                    continue
+                with app.app_context():
+                    try:
+                        self.poll()
+                    except Exception as e:
+                        self._metricas['errores'] += 1
+                        app.logger.error(f"No se pudieron consultar las notificaciones: {e}")
+                self._despertar.wait(self.poll_seconds)
+                self._despertar.clear()
+
+        self._hilo = threading.Thread(target=_consultor, name='notificaciones', daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        """Detiene el hilo consultor (se llama al cerrar la aplicación)."""
+        self._detener.set()
+        self._despertar.set()
+
+    def poll(self):
+        """Consulta solicitudes y vencimientos y actualiza la foto; devuelve True si algo cambió."""
+        solicitudes = self._solicitud_service.get_all_pending()
+        documentos = self._legajo_service.get_expiring_documents_notifications(self.expiry_days)
+        foto = self._foto_de(solicitudes, documentos)
+        firma = (
+            tuple(s['id_solicitud'] for s in foto['solicitudes']['items']), foto['solicitudes']['total'],
+            tuple((d['id_documento'], d['vencido']) for d in foto['vencimientos']['items']),
+            foto['vencimientos']['total'], foto['vencimientos']['vencidos'],
+        )
+        with self._lock:
+            self._metricas['consultas'] += 1
+            self._metricas['ultima_consulta'] = datetime.now().isoformat(timespec='seconds')
+            cambio = firma != self._firma
+            if cambio:
+                # Las versiones serializadas por rol se vuelven a armar en el siguiente pedido de cada rol.
+                self._foto, self._firma, self._serializados = foto, firma, {}
+                self._metricas['cambios'] += 1
+            self._foto_monotonic = time.monotonic()
+            self._nueva_foto.notify_all()
+        return cambio
+
+    def _foto_de(self, solicitudes, documentos):
+        hoy = date.today()
+        recientes = sorted(solicitudes, key=lambda s: s.get('id_solicitud') or 0, reverse=True)
+        items_documentos = []
+        vencidos = 0
+        for doc in documentos:
+            vence = self._fecha(doc.get('fecha_vencimiento'))
+            vencido = vence is not None and vence < hoy
+            vencidos += vencido
+            if len(items_documentos) < self.max_items:
+                items_documentos.append({
+                    'id_documento': doc.get('id_documento'),
+                    'id_personal': doc.get('id_personal'),
+                    'nombre_archivo': doc.get('nombre_archivo'),
+                    'personal': f"{doc.get('apellidos') or ''}, {doc.get('nombres') or ''}".strip(', '),
+                    'fecha_vencimiento': vence.isoformat() if vence else None,
+                    'vencido': vencido,
+                })
+        return {
+            'solicitudes': {
+                'total': len(solicitudes),
+                'items': [{
+                    'id_solicitud': s.get('id_solicitud'),
+                    'personal': s.get('nombre_completo_personal'),
+                    'campo': s.get('campo_modificado'),
+                    'solicitante': s.get('usuario_solicitante'),
+                    'fecha': str(s.get('fecha_solicitud') or ''),
+                } for s in recientes[:self.max_items]],
+            },
+            'vencimientos': {'total': len(documentos), 'vencidos': vencidos, 'items': items_documentos},
+        }
+
+    @staticmethod
+    def _fecha(valor):
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        try:
+            return date.fromisoformat(str(valor)[:10])
+        except ValueError:
+            return None
+
+    def _evento_para(self, rol, foto):
+        evento = {}
+        if rol in self.ROLES_SOLICITUDES:
+            evento['solicitudes'] = foto['solicitudes']
+        if rol in self.ROLES_VENCIMIENTOS:
+            evento['vencimientos'] = foto['vencimientos']
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+    def metrics(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['activo'] = self._ultimo_pedido is not None and time.monotonic() - self._ultimo_pedido < self._inactividad()
+        return metricas
@@ -5,9 +5,14 @@ class SolicitudService:
     Servicio de aplicación para gestionar las solicitudes de modificación.
     Se conecta al repositorio de solicitudes.
     """
-    def __init__(self, solicitud_repository):
+    # Cantidad máxima de decisiones que se aplican en una sola transacción.
+    MAXIMO_LOTE = 200
+
+    def __init__(self, solicitud_repository, audit_service=None, legajo_service=None):
         # El repositorio ya se crea y se pasa desde app/__init__.py
         self.solicitud_repo = solicitud_repository
+        self.audit_service = audit_service
+        self.legajo_service = legajo_service
 
     def get_all_pending(self):
         """Obtiene todas las solicitudes que están en estado pendiente."""
@@ -23,4 +28,54 @@ class SolicitudService:
     def process_request(self, request_id, action):
         """Procesa la aprobación o rechazo de una solicitud."""
         # Llama a la lógica de persistencia.
-        return self.solicitud_repo.process_request(request_id, action)
\ No newline at end of file
+        resultado = self.solicitud_repo.process_request(request_id, action)
+        # Una aprobación cambia los datos del personal: se actualizan la caché del legajo y el índice de búsqueda.
+        if action == 'aprobar' and self.legajo_service is not None:
+            id_personal = self.solicitud_repo.find_personal_id_by_request(request_id)
+            if id_personal is not None:
+                self.legajo_service.refresh_personal({id_personal})
+        return resultado
+
+    def process_bulk(self, decisiones, id_revisor, observaciones=None):
+        """
+        Aprueba o rechaza varias solicitudes en una sola transacción. `decisiones` es una lista
+        de (id_solicitud, 'aprobar'|'rechazar'). Devuelve el resultado por solicitud
+        ({id: {'estado', 'id_personal', 'motivo'}}) y registra una única entrada en la bitácora.
+        """
+        acciones = {}
+        for id_solicitud, accion in decisiones:
+            accion = (accion or '').lower()
+            if accion not in ('aprobar', 'rechazar'):
+                raise ValueError(f"Acción no válida para la solicitud {id_solicitud}: {accion}")
+            if acciones.get(int(id_solicitud), accion) != accion:
+                raise ValueError(f"La solicitud {id_solicitud} figura como aprobada y rechazada a la vez.")
+            acciones[int(id_solicitud)] = accion
+        if not acciones:
+            raise ValueError("No se seleccionó ninguna solicitud.")
+        if len(acciones) > self.MAXIMO_LOTE:
+            raise ValueError(f"Se pueden procesar hasta {self.MAXIMO_LOTE} solicitudes a la vez.")
+
+        resultados = self.solicitud_repo.process_requests_bulk(list(acciones.items()), id_revisor, observaciones)
+
+        # Los datos del personal cambiaron: se actualizan la caché del legajo y el índice de búsqueda.
+        if self.legajo_service is not None:
+            self.legajo_service.refresh_personal(
+                {r['id_personal'] for r in resultados.values() if r['estado'] == 'aprobada'}
+            )
+
+        if self.audit_service is not None:
+            por_estado = {'aprobada': [], 'rechazada': [], 'error': []}
+            for id_solicitud, resultado in resultados.items():
+                por_estado[resultado['estado']].append(id_solicitud)
+            self.audit_service.log(
+                id_revisor, 'Solicitudes', 'PROCESAR_LOTE',
+                f"Solicitudes procesadas en lote: {len(por_estado['aprobada'])} aprobadas, "
+                f"{len(por_estado['rechazada'])} rechazadas, {len(por_estado['error'])} con error",
+                {
+                    'aprobadas': por_estado['aprobada'],
+                    'rechazadas': por_estado['rechazada'],
+                    'errores': {str(i): resultados[i]['motivo'] for i in por_estado['error']},
+                    'observaciones': observaciones,
+                }
+            )
+        return resultados
@@ -1,6 +1,6 @@
 # app/application/services/user_management_service.py
 
-from werkzeug.security import generate_password_hash
+from app.core.security import generate_password_hash
 
 class UserManagementService:
     def __init__(self, user_repository):
@@ -1,52 +1,121 @@
 # RUTA: app/application/services/usuario_service.py
 
-import random
+import secrets
 import string
 from datetime import datetime, timedelta
-from app.core.security import generate_password_hash
+from flask import current_app
+from app.core.security import (
+    generate_password_hash, check_password_hash, get_password_hash_method, password_needs_rehash,
+    hash_2fa_code, get_2fa_attempts, with_2fa_attempts
+)
 import logging 
 
 # Configura un logger para este módulo
 logger = logging.getLogger(__name__)
 
 class UsuarioService:
-    def __init__(self, usuario_repository, email_service):
+    # Veces que se relee la fila si otra verificación concurrente cambió antes el contador de intentos.
+    REINTENTOS_CONTADOR_2FA = 10
+
+    def __init__(self, usuario_repository, email_service, password_pool=None):
         self._usuario_repo = usuario_repository
         self._email_service = email_service
+        # Grupo acotado de hilos para scrypt; sin él, el cálculo se hace en el hilo de la petición.
+        self._password_pool = password_pool
 
     def attempt_login(self, username, password):
-        """Verifica las credenciales. Si son válidas, genera y muestra el código 2FA para desarrollo."""
+        """
+        Verifica las credenciales. Si son válidas, genera y muestra el código 2FA para desarrollo.
+        Lanza PasswordPoolBusyError si la cola de verificación de contraseñas está llena.
+        """
         user = self._usuario_repo.find_by_username_with_email(username)
 
-        if user and user.activo and user.check_password(password):
-            code = ''.join(random.choices(string.digits, k=6))
-            hashed_code = generate_password_hash(code)
+        if user and user.activo and self._verify_password(user, password):
+            self._rehash_password_if_outdated(user, password)
+            code = ''.join(secrets.choice(string.digits) for _ in range(6))
+            hashed_code = hash_2fa_code(user.id, code)
             expiry_date = datetime.utcnow() + timedelta(minutes=10)
 
             self._usuario_repo.set_2fa_code(user.id, hashed_code, expiry_date)
 
-            print("---------------------------------------------------------")
-            print(f"--- CÓDIGO 2FA (PARA DESARROLLO): {code} ---")
-            print("---------------------------------------------------------")
-            """
-            # --- Lógica de envío de correo 2FA (comentada) ---
-            # ... (código para enviar el email) ...
-            """
+            # Solo visible con LOG_LEVEL=DEBUG (desarrollo).
+            logger.debug("Código 2FA (para desarrollo) de %s: %s", user.username, code)
+
+            # El correo solo se encola: el envío SMTP ocurre en segundo plano y no retrasa el login.
+            if user.email:
+                try:
+                    self._email_service.send_2fa_code(user.email, user.nombre_completo or user.username, code)
+                except ConnectionError as e:
+                    logger.error(f"No se pudo enviar el código 2FA al usuario {user.id}: {e}")
             return user.id
         
         return None
 
+    def _verify_password(self, user, password):
+        if not user.password_hash:
+            return False
+        if self._password_pool is None:
+            return user.check_password(password)
+        return self._password_pool.run(check_password_hash, user.password_hash, password)
+
+    def _rehash_password_if_outdated(self, user, password):
+        """
+        Si el hash guardado usa parámetros distintos de PASSWORD_HASH_METHOD (ej. creado con otro
+        coste o con los valores por defecto de Werkzeug), se regenera con la contraseña recién
+        verificada. Un fallo aquí no impide el inicio de sesión.
+        """
+        if not password_needs_rehash(user.password_hash):
+            return
+        try:
+            if self._password_pool is None:
+                nuevo_hash = generate_password_hash(password)
+            else:
+                nuevo_hash = self._password_pool.run(generate_password_hash, password, get_password_hash_method())
+            self._usuario_repo.update_password_hash(user.username, nuevo_hash)
+            logger.info(f"Hash de contraseña actualizado a los parámetros vigentes para el usuario {user.id}.")
+        except Exception as e:
+            logger.error(f"No se pudo actualizar el hash de contraseña del usuario {user.id}: {e}")
+
     def verify_2fa_code(self, user_id, code):
-        """Verifica el código 2FA proporcionado por el usuario."""
+        """
+        Verifica el código 2FA proporcionado por el usuario. Cada verificación consume un intento
+        antes de comparar el código; al llegar a TWO_FACTOR_MAX_ATTEMPTS el código se invalida.
+        """
         user = self._usuario_repo.find_by_id(user_id)
-        
         if not user or not user.two_factor_code or user.two_factor_expiry < datetime.utcnow():
             return None
 
+        # Los códigos antiguos (scrypt) no llevan contador; caducan solos a los 10 minutos.
+        if get_2fa_attempts(user.two_factor_code) is None:
+            if user.check_2fa_code(code):
+                self._usuario_repo.clear_2fa_code(user.id)
+                return user
+            return None
+
+        max_intentos = current_app.config.get('TWO_FACTOR_MAX_ATTEMPTS', 5)
+        for _ in range(self.REINTENTOS_CONTADOR_2FA):
+            intentos = get_2fa_attempts(user.two_factor_code)
+            if intentos is None or intentos >= max_intentos:
+                self._usuario_repo.clear_2fa_code(user.id)
+                return None
+            # Compare-and-swap del contador: con intentos concurrentes solo uno gana cada valor y
+            # los demás releen la fila y vuelven a intentarlo, de modo que cada uno gasta el suyo.
+            if self._usuario_repo.replace_2fa_code(
+                user.id, user.two_factor_code, with_2fa_attempts(user.two_factor_code, intentos + 1)
+            ):
+                break
+            user = self._usuario_repo.find_by_id(user_id)
+            if not user or not user.two_factor_code or user.two_factor_expiry < datetime.utcnow():
+                return None
+        else:
+            # No se pudo registrar el intento: el código no se comprueba.
+            return None
+
         if user.check_2fa_code(code):
             self._usuario_repo.clear_2fa_code(user.id)
             return user
-        
+        if intentos + 1 >= max_intentos:
+            self._usuario_repo.clear_2fa_code(user.id)
         return None
 
     def update_last_login(self, user_id):
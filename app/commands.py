@@ -0,0 +1,58 @@
+# RUTA: app/commands.py
+
+import click
+from flask import current_app
+from app.core.security import calibrate_scrypt
+
+
+def register_commands(app):
+    """Registra los comandos de consola de la aplicación (se ejecutan con `flask <comando>`)."""
+
+    @app.cli.command('enviar-resumen-vencimientos')
+    @click.option('--forzar', is_flag=True, help='Envía el resumen aunque ya se haya enviado hoy.')
+    def enviar_resumen_vencimientos(forzar):
+        """Calcula y envía el resumen diario de documentos por vencer."""
+        resultado = current_app.config['EXPIRY_DIGEST_SERVICE'].run(force=forzar)
+        click.echo(f"Resumen de vencimientos: {resultado}")
+
+    @app.cli.command('calibrar-hash')
+    @click.option('--objetivo-ms', default=250, show_default=True, help='Tiempo objetivo por hash de contraseña.')
+    def calibrar_hash(objetivo_ms):
+        """Mide scrypt en este servidor y sugiere PASSWORD_HASH_METHOD para el tiempo objetivo."""
+        metodo, ms, mediciones = calibrate_scrypt(objetivo_ms)
+        for n, tiempo in mediciones:
+            click.echo(f"  N={n:<8} {tiempo:>8.1f} ms")
+        click.echo(f"Método actual:   {current_app.config['PASSWORD_HASH_METHOD']}")
+        click.echo(f"Método sugerido: {metodo} (~{ms} ms por hash)")
+        click.echo(f"Agregue al archivo .env: PASSWORD_HASH_METHOD={metodo}")
+
+    @app.cli.command('ejecutar-backup')
+    @click.option('--tipo', type=click.Choice(['FULL', 'DIFERENCIAL', 'LOG']), default='FULL', show_default=True)
+    def ejecutar_backup(tipo):
+        """Ejecuta una copia de seguridad y espera a que termine (para programarla desde el sistema operativo)."""
+        trabajo = current_app.config['BACKUP_SERVICE'].start_backup(None, tipo, wait=True)
+        click.echo(f"Backup {trabajo['tipo']}: {trabajo['estado']} ({', '.join(trabajo['archivos'])})")
+        if trabajo.get('verificacion'):
+            click.echo(f"Verificación: {trabajo['verificacion']}")
+        if trabajo['error']:
+            click.echo(f"Error: {trabajo['error']}")
+
+    @app.cli.command('depurar-backups')
+    @click.option('--dias', type=int, default=None, help='Días de retención (por defecto BACKUP_RETENTION_DAYS).')
+    def depurar_backups(dias):
+        """Elimina los archivos de backup que ya no hacen falta para restaurar dentro de la retención."""
+        resultado = current_app.config['BACKUP_SERVICE'].prune_backups(dias)
+        click.echo(f"Backups eliminados: {resultado['archivos']} archivos, {resultado['bytes'] / (1024 * 1024):.1f} MB liberados.")
+
+    @app.cli.command('archivar-bitacora')
+    @click.option('--dias', type=int, default=None, help='Días que se conservan en la tabla (por defecto AUDIT_RETENTION_DAYS).')
+    def archivar_bitacora(dias):
+        """Mueve los registros antiguos de la bitácora a segmentos comprimidos en disco."""
+        dias = current_app.config['AUDIT_RETENTION_DAYS'] if dias is None else dias
+        resultado = current_app.config['AUDIT_SERVICE'].archive_old_logs(
+            dias, current_app.config['AUDIT_ARCHIVE_BATCH_SIZE']
+        )
+        click.echo(
+            f"Bitácora anterior al {resultado['hasta']:%d/%m/%Y}: {resultado['archivados']} registros archivados "
+            f"en {resultado['segmentos']} segmentos, {resultado['eliminados']} eliminados de la tabla."
+        )
@@ -14,6 +14,24 @@ class Config:
     """
     # --- CONFIGURACIÓN DE SEGURIDAD DE FLASK ---
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'una-clave-insegura-solo-para-desarrollo'
+    # Método de hash de contraseñas. Se calibra por servidor con `flask calibrar-hash`; los hashes
+    # con otros parámetros se regeneran automáticamente en el siguiente inicio de sesión correcto.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Clave del HMAC de los códigos 2FA (si no se define, se deriva de SECRET_KEY).
+    TWO_FACTOR_HMAC_KEY = os.environ.get('TWO_FACTOR_HMAC_KEY')
+    # Intentos fallidos permitidos por código 2FA antes de invalidarlo.
+    TWO_FACTOR_MAX_ATTEMPTS = int(os.environ.get('TWO_FACTOR_MAX_ATTEMPTS', 5))
+    # Verificación de contraseñas fuera del hilo de la petición: hilos dedicados a scrypt,
+    # intentos que pueden esperar en cola y tiempo máximo de espera por intento.
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', min(4, os.cpu_count() or 2)))
+    PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', 32))
+    PASSWORD_POOL_TIMEOUT_SECONDS = int(os.environ.get('PASSWORD_POOL_TIMEOUT_SECONDS', 10))
+    # Límite de intentos de login (cubetas de fichas): ráfaga permitida y fichas repuestas por minuto,
+    # por IP y por nombre de usuario.
+    LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', 20))
+    LOGIN_RATE_IP_PER_MINUTE = float(os.environ.get('LOGIN_RATE_IP_PER_MINUTE', 10))
+    LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', 5))
+    LOGIN_RATE_USER_PER_MINUTE = float(os.environ.get('LOGIN_RATE_USER_PER_MINUTE', 2))
 
     # --- CONFIGURACIÓN DE LA BASE DE DATOS (LECTURA/ESCRITURA) ---
     # Carga todas las credenciales desde tu archivo .env
@@ -40,9 +58,116 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') 
+    # Envíos masivos (resúmenes): máximo de correos por minuto y reintentos ante cortes de conexión.
+    MAIL_RATE_LIMIT_PER_MINUTE = int(os.environ.get('MAIL_RATE_LIMIT_PER_MINUTE', 30))
+    MAIL_SEND_MAX_RETRIES = int(os.environ.get('MAIL_SEND_MAX_RETRIES', 3))
+    # Cola de envío en segundo plano (correos 2FA): tamaño máximo, mensajes por lote y segundos
+    # sin tráfico tras los que se cierra la conexión SMTP. Para pruebas locales basta un servidor
+    # SMTP de prueba (ej. `python -m aiosmtpd -n -l localhost:1025`) con MAIL_SERVER=localhost,
+    # MAIL_PORT=1025 y MAIL_USE_TLS=false.
+    MAIL_QUEUE_MAX_SIZE = int(os.environ.get('MAIL_QUEUE_MAX_SIZE', 1000))
+    MAIL_QUEUE_BATCH_SIZE = int(os.environ.get('MAIL_QUEUE_BATCH_SIZE', 20))
+    MAIL_SMTP_IDLE_SECONDS = int(os.environ.get('MAIL_SMTP_IDLE_SECONDS', 60))
+
+    # --- CONFIGURACIÓN DEL RESUMEN DIARIO DE VENCIMIENTOS ---
+    EXPIRY_DIGEST_ENABLED = os.environ.get('EXPIRY_DIGEST_ENABLED', 'true').lower() in ['true', 'on', '1']
+    # Hora (0-23) a partir de la cual se envía el resumen del día.
+    EXPIRY_DIGEST_HOUR = int(os.environ.get('EXPIRY_DIGEST_HOUR', 7))
+    # Umbrales en días antes del vencimiento que generan una notificación.
+    EXPIRY_DIGEST_THRESHOLDS = [int(d) for d in os.environ.get('EXPIRY_DIGEST_THRESHOLDS', '30,15,7,0').split(',')]
+    # Roles que reciben los documentos de unidades sin responsable con correo.
+    EXPIRY_DIGEST_FALLBACK_ROLES = [r.strip() for r in os.environ.get('EXPIRY_DIGEST_FALLBACK_ROLES', 'AdministradorLegajos').split(',')]
+    EXPIRY_DIGEST_STATE_FILE = os.environ.get('EXPIRY_DIGEST_STATE_FILE') or os.path.join(basedir, '..', 'instance', 'resumen_vencimientos.json')
 
     # --- CONFIGURACIÓN PARA LA SUBIDA DE ARCHIVOS ---
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'docx', 'xlsx'}
     
     # Define el tamaño máximo del archivo en bytes (ej. 5MB)
     MAX_CONTENT_LENGTH = 6 * 1024 * 1024
+
+    # --- CONFIGURACIÓN DE ESTRUCTURAS EN MEMORIA ---
+    # Segundos tras los cuales el índice de búsqueda de personal se recarga desde la BD.
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 300))
+    # Segundos tras los cuales el índice de vencimientos se recarga (recoge altas y bajas de otros procesos).
+    EXPIRY_INDEX_REFRESH_SECONDS = int(os.environ.get('EXPIRY_INDEX_REFRESH_SECONDS', 300))
+    # Límite de memoria (bytes) y vigencia (segundos) de la caché de legajos por proceso.
+    LEGAJO_CACHE_MAX_BYTES = int(os.environ.get('LEGAJO_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    LEGAJO_CACHE_TTL_SECONDS = int(os.environ.get('LEGAJO_CACHE_TTL_SECONDS', 120))
+
+    # --- CONFIGURACIÓN DE LA BITÁCORA (ESCRITURA EN LOTE) ---
+    # Eventos en memoria antes de derivarlos a disco, tamaño de lote y segundos máximos de espera.
+    AUDIT_QUEUE_MAX_SIZE = int(os.environ.get('AUDIT_QUEUE_MAX_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', 2))
+    # Archivo donde se guardan los eventos si la base de datos no está disponible.
+    AUDIT_SPILL_FILE = os.environ.get('AUDIT_SPILL_FILE') or os.path.join(basedir, '..', 'instance', 'bitacora_pendiente.jsonl')
+    # Acciones de solo lectura que se agrupan por usuario/módulo en ventanas de N segundos (0 = sin agrupar).
+    # Las acciones de escritura se registran siempre una por una.
+    AUDIT_READ_ACTIONS = [a.strip() for a in os.environ.get('AUDIT_READ_ACTIONS', 'CONSULTA').split(',') if a.strip()]
+    AUDIT_READ_COALESCE_SECONDS = int(os.environ.get('AUDIT_READ_COALESCE_SECONDS', 900))
+    # Tamaño máximo del detalle JSON de cada evento y de cada texto dentro de él.
+    AUDIT_DETAIL_MAX_BYTES = int(os.environ.get('AUDIT_DETAIL_MAX_BYTES', 4000))
+    AUDIT_DETAIL_MAX_VALUE_CHARS = int(os.environ.get('AUDIT_DETAIL_MAX_VALUE_CHARS', 500))
+    # Archivo histórico: los registros con más de AUDIT_RETENTION_DAYS días se mueven con
+    # `flask archivar-bitacora` a segmentos comprimidos en AUDIT_ARCHIVE_DIR.
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or os.path.join(basedir, '..', 'instance', 'bitacora_archivo')
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 180))
+    AUDIT_ARCHIVE_BATCH_SIZE = int(os.environ.get('AUDIT_ARCHIVE_BATCH_SIZE', 5000))
+
+    # --- CONFIGURACIÓN DEL REGISTRO (LOGGING) ---
+    # Nivel mínimo (DEBUG muestra además los mensajes de depuración, como el código 2FA en desarrollo).
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # 'texto' (una línea legible) o 'json' (una línea JSON por registro).
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'texto').lower()
+    # Archivo rotativo opcional además de la consola.
+    LOG_FILE = os.environ.get('LOG_FILE')
+    LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+    # Registros pendientes de escribir; si la cola se llena se descartan (nunca se bloquea una petición).
+    LOG_QUEUE_MAX_SIZE = int(os.environ.get('LOG_QUEUE_MAX_SIZE', 10000))
+
+    # --- CONFIGURACIÓN DE LA CAPTURA DE ERRORES ---
+    # Los errores se agrupan en memoria por huella y se escriben en la bitácora cada N segundos.
+    ERROR_FLUSH_INTERVAL_SECONDS = int(os.environ.get('ERROR_FLUSH_INTERVAL_SECONDS', 60))
+    # Máximo de huellas distintas acumuladas entre volcados (las demás solo se cuentan).
+    ERROR_MAX_GROUPS = int(os.environ.get('ERROR_MAX_GROUPS', 500))
+    # Días que muestra la vista de errores.
+    ERROR_VIEW_DAYS = int(os.environ.get('ERROR_VIEW_DAYS', 7))
+
+    # --- CONFIGURACIÓN DE LAS NOTIFICACIONES DEL TABLERO ---
+    # Un solo hilo por proceso consulta solicitudes y vencimientos cada N segundos mientras los
+    # tableros abiertos pregunten; cada tablero pregunta con la misma frecuencia.
+    NOTIFY_POLL_SECONDS = int(os.environ.get('NOTIFY_POLL_SECONDS', 15))
+    # Días hacia adelante para avisar de documentos por vencer (los vencidos siempre se incluyen).
+    NOTIFY_EXPIRY_DAYS = int(os.environ.get('NOTIFY_EXPIRY_DAYS', 30))
+
+    # --- CONFIGURACIÓN DE COPIAS DE SEGURIDAD ---
+    BACKUP_DIR = os.environ.get('BACKUP_DIR') or 'C:\\LEGAJO_BACKUPS_FINAL'
+    # Compresión nativa de SQL Server y cantidad de archivos (bandas) que se escriben en paralelo.
+    BACKUP_COMPRESSION = os.environ.get('BACKUP_COMPRESSION', 'true').lower() in ['true', 'on', '1']
+    BACKUP_STRIPES = int(os.environ.get('BACKUP_STRIPES', 1))
+    # Plan programado: FULL los días indicados (0 = lunes ... 6 = domingo) desde la hora indicada,
+    # DIFERENCIAL los demás días a la misma hora y LOG cada N minutos (0 = sin backups de LOG;
+    # requiere el modelo de recuperación FULL en la base de datos).
+    BACKUP_SCHEDULE_ENABLED = os.environ.get('BACKUP_SCHEDULE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    BACKUP_FULL_WEEKDAYS = [int(d) for d in os.environ.get('BACKUP_FULL_WEEKDAYS', '6').split(',')]
+    BACKUP_FULL_HOUR = int(os.environ.get('BACKUP_FULL_HOUR', 2))
+    BACKUP_DIFFERENTIAL_ENABLED = os.environ.get('BACKUP_DIFFERENTIAL_ENABLED', 'true').lower() in ['true', 'on', '1']
+    BACKUP_LOG_INTERVAL_MINUTES = int(os.environ.get('BACKUP_LOG_INTERVAL_MINUTES', 0))
+    # Días que se puede restaurar hacia atrás; los archivos anteriores se eliminan tras cada backup.
+    BACKUP_RETENTION_DAYS = int(os.environ.get('BACKUP_RETENTION_DAYS', 14))
+    # Catálogo con los datos reales de cada backup (por defecto, dentro de la carpeta de backups).
+    BACKUP_CATALOG_FILE = os.environ.get('BACKUP_CATALOG_FILE')
+    # Verificar cada backup con RESTORE VERIFYONLY al terminar.
+    BACKUP_VERIFY = os.environ.get('BACKUP_VERIFY', 'true').lower() in ['true', 'on', '1']
+    # Ventana de mantenimiento disponible para un backup completo (para la alerta de tendencia).
+    BACKUP_WINDOW_MINUTES = int(os.environ.get('BACKUP_WINDOW_MINUTES', 60))
+
+    # --- CONFIGURACIÓN DEL DOSSIER PDF DEL LEGAJO ---
+    # Carpeta donde se guardan los dossiers generados (se reutilizan mientras no cambien los documentos).
+    DOSSIER_OUTPUT_DIR = os.environ.get('DOSSIER_OUTPUT_DIR') or os.path.join(basedir, '..', 'instance', 'dossiers')
+    # Cantidad de dossiers que se generan en paralelo por proceso.
+    DOSSIER_MAX_WORKERS = int(os.environ.get('DOSSIER_MAX_WORKERS', 1))
+    # Límites de un dossier: las páginas de todos los documentos se mantienen en memoria hasta
+    # escribir el PDF final, así que los documentos que superen estos topes quedan fuera (se indica en el índice).
+    DOSSIER_MAX_PAGES = int(os.environ.get('DOSSIER_MAX_PAGES', 1500))
+    DOSSIER_MAX_BYTES = int(os.environ.get('DOSSIER_MAX_BYTES', 300 * 1024 * 1024))
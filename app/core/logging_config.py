@@ -0,0 +1,140 @@
+# RUTA: app/core/logging_config.py
+
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import uuid
+from flask import g, has_app_context, request
+from flask.logging import default_handler
+
+# Un id de petición recibido en X-Request-ID solo se acepta si es corto y sin caracteres raros.
+_PATRON_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Una sola cola y un solo hilo escritor por proceso (create_app puede llamarse más de una vez).
+_listener = None
+_queue_handler = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Agrega a cada registro el id de correlación de la petición en curso ('-' fuera de una petición)."""
+
+    def filter(self, record):
+        record.request_id = (g.get('request_id') if has_app_context() else None) or '-'
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que nunca bloquea al hilo que registra: si la cola está llena, el registro se
+    descarta y se cuenta. El mensaje se interpola aquí (los argumentos pueden cambiar después),
+    pero el formato completo y el traceback se generan en el hilo escritor.
+    """
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    # Al detener, la marca de fin espera lugar en la cola en vez de fallar si está llena.
+    def enqueue_sentinel(self):
+        try:
+            self.queue.put(self._sentinel, timeout=5)
+        except queue.Full:
+            pass
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, para enviar el log a herramientas de búsqueda."""
+
+    def format(self, record):
+        datos = {
+            'fecha': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'hilo': record.threadName,
+            'mensaje': record.getMessage(),
+        }
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def init_logging(app):
+    """
+    Configura el registro de la aplicación: todos los loggers escriben en una cola en memoria
+    y un hilo (QueueListener) la vuelca a la consola y, si se configura LOG_FILE, a un archivo
+    rotativo. Cada petición recibe un id de correlación (X-Request-ID) que aparece en sus
+    registros y se devuelve en la respuesta.
+    """
+    global _listener, _queue_handler
+    nivel = logging.getLevelName(app.config['LOG_LEVEL'].upper())
+    raiz = logging.getLogger()
+
+    if _listener is None:
+        if app.config['LOG_FORMAT'] == 'json':
+            formato = JsonFormatter()
+        else:
+            formato = logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s')
+        destinos = [logging.StreamHandler(sys.stderr)]
+        if app.config.get('LOG_FILE'):
+            destinos.append(logging.handlers.RotatingFileHandler(
+                app.config['LOG_FILE'], maxBytes=app.config['LOG_FILE_MAX_BYTES'], backupCount=5, encoding='utf-8'
+            ))
+        for destino in destinos:
+            destino.setFormatter(formato)
+
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=app.config['LOG_QUEUE_MAX_SIZE']))
+        _queue_handler.addFilter(RequestIdFilter())
+        _listener = _QueueListener(_queue_handler.queue, *destinos, respect_handler_level=True)
+        _listener.start()
+
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        raiz.addHandler(_queue_handler)
+
+    raiz.setLevel(nivel)
+    # El logger de la app propaga a la raíz: se quita el handler propio de Flask para no duplicar.
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(nivel)
+
+    @app.before_request
+    def _asignar_request_id():
+        recibido = request.headers.get('X-Request-ID', '')
+        g.request_id = recibido if _PATRON_REQUEST_ID.match(recibido) else uuid.uuid4().hex[:12]
+
+    @app.after_request
+    def _devolver_request_id(response):
+        if g.get('request_id'):
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+
+def stop_logging():
+    """Vacía la cola y detiene el hilo escritor (se registra con atexit antes que los demás)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_metrics():
+    if _queue_handler is None:
+        return {}
+    return {'en_cola': _queue_handler.queue.qsize(), 'descartados': _queue_handler.descartados}
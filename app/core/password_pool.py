@@ -0,0 +1,75 @@
+# RUTA: app/core/password_pool.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordPoolBusyError(RuntimeError):
+    """Se lanza cuando la cola de verificación de contraseñas está llena."""
+
+
+class PasswordVerificationPool:
+    """
+    Ejecuta el hash/verificación de contraseñas (scrypt) en un grupo acotado de hilos.
+
+    scrypt libera el GIL mientras calcula, así que limitar cuántos se ejecutan a la vez evita
+    que una ráfaga de inicios de sesión acapare la CPU y bloquee al resto de páginas. Si ya hay
+    `max_queue` tareas esperando, se rechaza de inmediato en lugar de acumular peticiones.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32, timeout_seconds=10):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='verificacion-password')
+        # Cupos = hilos trabajando + tareas en espera.
+        self._cupos = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self._metricas = {
+            'completadas': 0,
+            'rechazadas_cola_llena': 0,
+            'espera_total_ms': 0.0,
+            'calculo_total_ms': 0.0,
+        }
+
+    def run(self, fn, *args):
+        """Ejecuta `fn(*args)` en el grupo y espera su resultado."""
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self._metricas['rechazadas_cola_llena'] += 1
+            raise PasswordPoolBusyError("Hay demasiadas verificaciones de contraseña en curso.")
+        encolado_en = time.monotonic()
+        with self._lock:
+            self._en_curso += 1
+
+        def _tarea():
+            inicio = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                fin = time.monotonic()
+                with self._lock:
+                    self._metricas['espera_total_ms'] += (inicio - encolado_en) * 1000
+                    self._metricas['calculo_total_ms'] += (fin - inicio) * 1000
+                    self._metricas['completadas'] += 1
+                    self._en_curso -= 1
+                self._cupos.release()
+
+        return self._executor.submit(_tarea).result(timeout=self.timeout_seconds)
+
+    def metrics(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            en_curso = self._en_curso
+        completadas = metricas['completadas']
+        return {
+            'hilos': self.max_workers,
+            'en_cola': max(0, en_curso - self.max_workers),
+            'en_ejecucion': min(en_curso, self.max_workers),
+            'completadas': completadas,
+            'rechazadas_cola_llena': metricas['rechazadas_cola_llena'],
+            'espera_media_ms': round(metricas['espera_total_ms'] / completadas, 1) if completadas else None,
+            'calculo_medio_ms': round(metricas['calculo_total_ms'] / completadas, 1) if completadas else None,
+        }
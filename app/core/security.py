@@ -1,4 +1,8 @@
 # app/core/security.py
+import hashlib
+import hmac
+import time
+from flask import current_app, has_app_context
 # Importa las funciones de hashing y verificación de contraseñas de Werkzeug.
 from werkzeug.security import generate_password_hash as werkzeug_generate_hash
 from werkzeug.security import check_password_hash as werkzeug_check_hash
@@ -7,12 +11,89 @@ from werkzeug.security import check_password_hash as werkzeug_check_hash
 # Esto hace que el hashing sea computacionalmente costoso y más seguro contra ataques de fuerza bruta.
 SCRYPT_METHOD = "scrypt:32768:8:1"
 
+def get_password_hash_method():
+    """Método vigente: PASSWORD_HASH_METHOD de la configuración (calibrado por servidor) o SCRYPT_METHOD."""
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD') or SCRYPT_METHOD
+    return SCRYPT_METHOD
+
 # Define una función para generar un hash de una contraseña.
-def generate_password_hash(password):
-    # Llama a la función de Werkzeug especificando el método scrypt.
-    return werkzeug_generate_hash(password, method=SCRYPT_METHOD)
+def generate_password_hash(password, method=None):
+    # Llama a la función de Werkzeug especificando el método scrypt. Se puede indicar el método
+    # explícitamente para calcular el hash fuera del contexto de la aplicación (ej. en un hilo).
+    return werkzeug_generate_hash(password, method=method or get_password_hash_method())
+
+def password_needs_rehash(pwhash):
+    """Indica si un hash guardado usa un método o parámetros distintos de los vigentes."""
+    if not pwhash or '$' not in pwhash:
+        return False
+    return pwhash.split('$', 1)[0] != get_password_hash_method()
 
 # Define una función para verificar si una contraseña coincide con un hash existente.
 def check_password_hash(pwhash, password):
     # Llama a la función de Werkzeug para realizar la comparación de forma segura.
-    return werkzeug_check_hash(pwhash, password) 
\ No newline at end of file
+    return werkzeug_check_hash(pwhash, password)
+
+def calibrate_scrypt(target_ms, r=8, p=1, min_log_n=14, max_log_n=20, samples=3):
+    """
+    Mide en este equipo el tiempo de scrypt para N = 2^min_log_n .. 2^max_log_n y devuelve
+    (método, ms, mediciones) con el mayor N cuyo tiempo medio no supera `target_ms`
+    (o el mínimo si ninguno lo cumple). `mediciones` es una lista de (N, ms).
+    """
+    mediciones = []
+    elegido = None
+    for log_n in range(min_log_n, max_log_n + 1):
+        n = 2 ** log_n
+        inicio = time.perf_counter()
+        for _ in range(samples):
+            hashlib.scrypt(b'calibracion', salt=b'0123456789abcdef', n=n, r=r, p=p, maxmem=132 * n * r * p, dklen=64)
+        ms = (time.perf_counter() - inicio) * 1000 / samples
+        mediciones.append((n, round(ms, 1)))
+        if ms <= target_ms or elegido is None:
+            elegido = (f"scrypt:{n}:{r}:{p}", round(ms, 1))
+        if ms > target_ms:
+            break
+    return elegido[0], elegido[1], mediciones
+
+
+# --- CÓDIGOS DE DOBLE FACTOR (2FA) ---
+# Un código de 6 dígitos vive 10 minutos y admite pocos intentos, así que no necesita un hash
+# lento: se guarda un HMAC-SHA256 con clave del servidor, que se verifica en microsegundos.
+# Formato almacenado: "hmac$<intentos_fallidos>$<hmac_hex>".
+TWO_FACTOR_PREFIX = "hmac"
+
+def _two_factor_key():
+    # Clave propia si está configurada; si no, se deriva de SECRET_KEY para no reutilizarla tal cual.
+    clave = current_app.config.get('TWO_FACTOR_HMAC_KEY') or current_app.config['SECRET_KEY']
+    return hmac.new(clave.encode('utf-8'), b'legajo-digital-2fa', hashlib.sha256).digest()
+
+def _two_factor_digest(user_id, code):
+    return hmac.new(_two_factor_key(), f"{user_id}:{code}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def hash_2fa_code(user_id, code, attempts=0):
+    """Genera el valor a guardar para un código 2FA, ligado al usuario."""
+    return f"{TWO_FACTOR_PREFIX}${attempts}${_two_factor_digest(user_id, code)}"
+
+def get_2fa_attempts(stored):
+    """Devuelve los intentos fallidos registrados, o None si el valor es de formato antiguo (scrypt)."""
+    partes = (stored or '').split('$')
+    if len(partes) != 3 or partes[0] != TWO_FACTOR_PREFIX or not partes[1].isdigit():
+        return None
+    return int(partes[1])
+
+def with_2fa_attempts(stored, attempts):
+    """Devuelve el mismo código almacenado con otro contador de intentos fallidos."""
+    _, _, digest = stored.split('$')
+    return f"{TWO_FACTOR_PREFIX}${attempts}${digest}"
+
+def check_2fa_code_hash(stored, user_id, code):
+    """
+    Verifica un código 2FA en tiempo constante. Los códigos emitidos antes del cambio
+    (hash scrypt) se siguen aceptando por la vía antigua hasta que expiren.
+    """
+    if not stored or not code:
+        return False
+    if get_2fa_attempts(stored) is None:
+        return check_password_hash(stored, code)
+    return hmac.compare_digest(stored.split('$')[2], _two_factor_digest(user_id, code))
+
@@ -1,7 +1,7 @@
 # RUTA: app/domain/models/usuario.py
 
 from flask_login import UserMixin
-from app.core.security import check_password_hash, generate_password_hash
+from app.core.security import check_password_hash, generate_password_hash, check_2fa_code_hash
 
 # 🚨 IMPORTANTE: Define aquí los IDs de rol de tu BD para claridad
 ROL_ID_SISTEMAS = 3 # ID para el Encargado de Sistemas/Admin Técnico
@@ -57,7 +57,7 @@ class Usuario(UserMixin):
     def check_2fa_code(self, code):
         """Verifica el código de doble factor de autenticación."""
         if self.two_factor_code:
-            return check_password_hash(self.two_factor_code, code)
+            return check_2fa_code_hash(self.two_factor_code, self.id, code)
         return False
 
     @staticmethod
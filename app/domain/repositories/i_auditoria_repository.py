@@ -7,7 +7,32 @@ class IAuditoriaRepository(ABC):
     def log_event(self, id_usuario, modulo, accion, descripcion, detalle_json=None):
         pass
 
+    # Contrato para insertar varios eventos (id_usuario, fecha_hora, modulo, accion, descripcion, detalle_json) de una vez.
+    @abstractmethod
+    def log_events_batch(self, eventos):
+        pass
+
     # Contrato para un método que obtendrá una lista paginada de todos los registros de la bitácora.
     @abstractmethod
     def get_all_logs_paginated(self, page, per_page):
-        pass 
\ No newline at end of file
+        pass
+
+    # Contrato para listar la bitácora con filtros y paginación por cursor (fecha_hora, id_bitacora).
+    @abstractmethod
+    def get_logs_keyset(self, filters=None, per_page=20, cursor=None, direction='next', count_cap=10000):
+        pass
+
+    # Contrato para leer registros anteriores a una fecha (en orden de id) para archivarlos.
+    @abstractmethod
+    def find_logs_older_than(self, cutoff, after_id=0, limit=5000):
+        pass
+
+    # Contrato para eliminar de la tabla registros ya archivados.
+    @abstractmethod
+    def delete_logs(self, ids):
+        pass
+
+    # Contrato para listar los errores registrados desde una fecha, agrupados por huella.
+    @abstractmethod
+    def get_error_groups(self, desde, limit=100):
+        pass
@@ -40,4 +40,54 @@ class IPersonalRepository(ABC):
     @abstractmethod
     def delete_document_by_id(self, document_id):
         """Define el contrato para la eliminación lógica de un documento."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def get_all_for_search_index(self):
+        """Define el contrato para obtener los datos mínimos del personal para el índice de búsqueda."""
+        pass
+
+    @abstractmethod
+    def find_by_ids_for_listing(self, personal_ids):
+        """Define el contrato para obtener las filas del listado de un conjunto de IDs."""
+        pass
+
+    @abstractmethod
+    def get_page_projected(self, page, per_page, filters=None, fields=None, sort_by='apellidos', sort_desc=False):
+        """Define el contrato para el listado paginado con proyección, orden y filtros en SQL."""
+        pass
+
+    @abstractmethod
+    def find_personal_info_by_id(self, personal_id):
+        """Define el contrato para obtener solo la cabecera (datos personales) del legajo."""
+        pass
+
+    @abstractmethod
+    def count_documents_by_seccion(self, personal_id):
+        """Define el contrato para contar los documentos de un empleado por sección."""
+        pass
+
+    @abstractmethod
+    def get_legajo_section(self, personal_id, seccion):
+        """Define el contrato para obtener una sola sección del legajo."""
+        pass
+
+    @abstractmethod
+    def find_documents_by_seccion(self, personal_id, id_seccion):
+        """Define el contrato para obtener los documentos de una sección del legajo."""
+        pass
+
+    @abstractmethod
+    def find_personal_id_by_document_id(self, document_id):
+        """Define el contrato para obtener el empleado al que pertenece un documento."""
+        pass
+
+    @abstractmethod
+    def iter_document_content(self, document_id, chunk_size=1024 * 1024):
+        """Define el contrato para leer el contenido de un documento por bloques."""
+        pass
+
+    @abstractmethod
+    def find_expiring_documents(self, days_threshold, document_ids=None):
+        """Define el contrato para obtener los documentos vencidos o por vencer con su responsable."""
+        pass
@@ -19,6 +19,11 @@ class IUsuarioRepository(ABC):
     def set_2fa_code(self, user_id, hashed_code, expiry_date):
         pass
 
+    # Método abstracto para reemplazar el código 2FA guardado solo si no cambió (contador de intentos).
+    @abstractmethod
+    def replace_2fa_code(self, user_id, expected_code, new_code):
+        pass
+
     # Método abstracto para limpiar los datos del código 2FA de un usuario.
     @abstractmethod
     def clear_2fa_code(self, user_id):
@@ -32,4 +37,9 @@ class IUsuarioRepository(ABC):
     @abstractmethod
     def update_last_login(self, user_id):
         """Define el contrato para actualizar la fecha del último login."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def find_active_contacts_by_role(self, role_names):
+        """Define el contrato para obtener los contactos (email) de los usuarios activos de ciertos roles."""
+        pass
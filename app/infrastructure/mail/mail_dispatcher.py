@@ -0,0 +1,192 @@
+# RUTA: app/infrastructure/mail/mail_dispatcher.py
+
+import queue
+import smtplib
+import threading
+import time
+
+
+class ConexionSMTP:
+    """
+    Conexión SMTP reutilizable con reintentos. La abre al primer envío y la mantiene para los
+    siguientes; ante un corte la cierra, espera (crecimiento exponencial) y reintenta el mismo
+    mensaje. Un rechazo propio del mensaje (ej. destinatario inválido) no se reintenta. La usan
+    el hilo emisor de MailDispatcher y los envíos masivos de EmailService.
+    """
+
+    def __init__(self, mail, max_retries=3, backoff_seconds=1.0):
+        self.mail = mail
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._conexion = None
+
+    @property
+    def abierta(self):
+        return self._conexion is not None
+
+    def send(self, msg, al_conectar=None, al_fallar=None):
+        """
+        Envía un mensaje; si no se pudo tras los reintentos, lanza el último error. `al_conectar()`
+        se llama al abrir una conexión y `al_fallar(error, reintenta)` tras cada intento fallido.
+        """
+        for intento in range(1, self.max_retries + 1):
+            try:
+                if self._conexion is None:
+                    conexion = self.mail.connect()
+                    conexion.__enter__()
+                    self._conexion = conexion
+                    if al_conectar:
+                        al_conectar()
+                self._conexion.send(msg)
+                return
+            except Exception as e:
+                rechazo = isinstance(e, smtplib.SMTPException) and not isinstance(
+                    e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError))
+                self.close()
+                reintenta = not rechazo and intento < self.max_retries
+                if al_fallar:
+                    al_fallar(e, reintenta)
+                if not reintenta:
+                    raise
+                time.sleep(self.backoff_seconds * 2 ** (intento - 1))
+
+    def close(self):
+        conexion, self._conexion = self._conexion, None
+        if conexion is None:
+            return
+        try:
+            conexion.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+class MailDispatcher:
+    """
+    Cola de envío de correos con un hilo emisor en segundo plano.
+
+    Las peticiones solo encolan el mensaje (ya renderizado) y continúan. El hilo emisor
+    mantiene abierta una conexión SMTP mientras haya tráfico, envía los mensajes en lotes
+    por esa misma conexión, reintenta con espera exponencial ante cortes y cierra la conexión
+    tras `idle_seconds` sin mensajes. Expone contadores de entrega con `metrics()`.
+    """
+
+    _DETENER = object()
+
+    def __init__(self, mail, max_queue=1000, batch_size=20, max_retries=3, idle_seconds=60, backoff_seconds=1.0):
+        self.mail = mail
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self._cola = queue.Queue(maxsize=max_queue)
+        self._hilo = None
+        self._smtp = ConexionSMTP(mail, max_retries, backoff_seconds)
+        self._lock = threading.Lock()
+        self._metricas = {
+            'encolados': 0,
+            'enviados': 0,
+            'fallidos': 0,
+            'reintentos': 0,
+            'rechazados_cola_llena': 0,
+            'lotes': 0,
+            'conexiones_abiertas': 0,
+            'latencia_total_ms': 0.0,
+            'ultimo_error': None,
+        }
+
+    # --- API PÚBLICA ---
+
+    def start(self, app):
+        """Inicia el hilo emisor (una sola vez por proceso)."""
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._ejecutar, args=(app,), name='envio-correos', daemon=True)
+        self._hilo.start()
+
+    def enqueue(self, msg):
+        """Encola un mensaje. Devuelve False si la cola está llena o el emisor no está activo."""
+        if self._hilo is None:
+            return False
+        try:
+            self._cola.put_nowait((msg, time.monotonic()))
+        except queue.Full:
+            self._sumar('rechazados_cola_llena')
+            return False
+        self._sumar('encolados')
+        return True
+
+    def stop(self, timeout=10):
+        """Envía lo pendiente y detiene el hilo emisor (se llama al cerrar la aplicación)."""
+        if self._hilo is None:
+            return
+        try:
+            self._cola.put(self._DETENER, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    def metrics(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+        latencia_total = metricas.pop('latencia_total_ms')
+        metricas['latencia_media_ms'] = round(latencia_total / metricas['enviados'], 1) if metricas['enviados'] else None
+        metricas['en_cola'] = self._cola.qsize()
+        metricas['conexion_activa'] = self._smtp.abierta
+        return metricas
+
+    # --- HILO EMISOR ---
+
+    def _ejecutar(self, app):
+        with app.app_context():
+            while True:
+                try:
+                    elemento = self._cola.get(timeout=self.idle_seconds)
+                except queue.Empty:
+                    # Sin tráfico: se libera la conexión SMTP hasta el próximo mensaje.
+                    self._cerrar_conexion()
+                    continue
+                if elemento is self._DETENER:
+                    self._cerrar_conexion()
+                    return
+
+                # Se arma un lote con lo que ya está en cola para enviarlo por la misma conexión.
+                lote = [elemento]
+                detener = False
+                while len(lote) < self.batch_size:
+                    try:
+                        siguiente = self._cola.get_nowait()
+                    except queue.Empty:
+                        break
+                    if siguiente is self._DETENER:
+                        detener = True
+                        break
+                    lote.append(siguiente)
+
+                self._sumar('lotes')
+                for msg, encolado_en in lote:
+                    self._enviar(app, msg, encolado_en)
+                if detener:
+                    self._cerrar_conexion()
+                    return
+
+    def _enviar(self, app, msg, encolado_en):
+        try:
+            self._smtp.send(msg, al_conectar=lambda: self._sumar('conexiones_abiertas'), al_fallar=self._registrar_fallo)
+        except Exception as e:
+            self._sumar('fallidos')
+            app.logger.error(f"No se pudo enviar el correo a {msg.recipients}: {e}")
+            return
+        with self._lock:
+            self._metricas['enviados'] += 1
+            self._metricas['latencia_total_ms'] += (time.monotonic() - encolado_en) * 1000
+
+    def _registrar_fallo(self, error, reintenta):
+        with self._lock:
+            self._metricas['ultimo_error'] = f"{type(error).__name__}: {error}"
+            if reintenta:
+                self._metricas['reintentos'] += 1
+
+    def _cerrar_conexion(self):
+        self._smtp.close()
+
+    def _sumar(self, clave):
+        with self._lock:
+            self._metricas[clave] += 1
@@ -0,0 +1,269 @@
+# RUTA: app/infrastructure/persistence/audit_writer.py
+
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from app.database.connector import close_db
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Cola de escritura de la bitácora con un hilo en segundo plano.
+
+    Las peticiones solo encolan el evento (con su fecha y hora) y continúan. El hilo escritor
+    inserta los eventos en lotes con `fast_executemany`, cuando se juntan `batch_size` eventos
+    o pasan `flush_interval` segundos desde el primero pendiente. Si la base de datos no está
+    disponible, el lote se guarda en un archivo de derrame (JSON por línea) que se reinserta
+    cuando la escritura vuelve a funcionar. Al cerrar el proceso se vacía la cola.
+    """
+
+    _DETENER = object()
+    # Un archivo en reinserción (`<spill_file>.<pid>`) sin tocar durante este tiempo se da por
+    # abandonado por un proceso que se detuvo, y lo recupera el próximo escritor que arranque.
+    REINSERCION_MAXIMA_SEGUNDOS = 600
+
+    def __init__(self, audit_repository, spill_file, max_queue=10000, batch_size=200, flush_interval=2.0,
+                 max_retries=3, backoff_seconds=0.5, idle_seconds=60):
+        self._audit_repo = audit_repository
+        self.spill_file = spill_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.idle_seconds = idle_seconds
+        self._cola = queue.Queue(maxsize=max_queue)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._metricas = {
+            'encolados': 0,
+            'registrados': 0,
+            'lotes': 0,
+            'reintentos': 0,
+            'derivados_a_disco': 0,
+            'recuperados_de_disco': 0,
+            'latencia_total_ms': 0.0,
+            'escritura_total_ms': 0.0,
+            'escritura_max_ms': 0.0,
+            'ultimo_error': None,
+        }
+
+    # --- API PÚBLICA ---
+
+    def start(self, app):
+        """Inicia el hilo escritor (una sola vez por proceso)."""
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._ejecutar, args=(app,), name='escritura-bitacora', daemon=True)
+        self._hilo.start()
+
+    @property
+    def is_running(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def enqueue(self, id_usuario, modulo, accion, descripcion, detalle_json=None):
+        """
+        Encola un evento con la hora actual. Si la cola está llena, el evento se guarda en el
+        archivo de derrame en lugar de perderse. Devuelve False si el escritor no está activo.
+        """
+        if not self.is_running:
+            return False
+        evento = (id_usuario, datetime.now(), modulo, accion, descripcion, detalle_json)
+        try:
+            self._cola.put_nowait((evento, time.monotonic()))
+        except queue.Full:
+            self._derramar([evento])
+            return True
+        self._sumar('encolados')
+        return True
+
+    def stop(self, timeout=10):
+        """Escribe lo pendiente y detiene el hilo (se llama al cerrar la aplicación)."""
+        if self._hilo is None:
+            return
+        try:
+            self._cola.put(self._DETENER, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    def metrics(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+        latencia_total = metricas.pop('latencia_total_ms')
+        escritura_total = metricas.pop('escritura_total_ms')
+        metricas['latencia_media_ms'] = round(latencia_total / metricas['registrados'], 1) if metricas['registrados'] else None
+        metricas['escritura_media_ms'] = round(escritura_total / metricas['lotes'], 1) if metricas['lotes'] else None
+        metricas['escritura_max_ms'] = round(metricas['escritura_max_ms'], 1)
+        metricas['en_cola'] = self._cola.qsize()
+        metricas['pendientes_en_disco'] = os.path.exists(self.spill_file)
+        return metricas
+
+    # --- HILO ESCRITOR ---
+
+    def _ejecutar(self, app):
+        with app.app_context():
+            self._recuperar_abandonados(app)
+            self._recuperar_derrame(app)
+            while True:
+                try:
+                    elemento = self._cola.get(timeout=self.idle_seconds)
+                except queue.Empty:
+                    # Sin actividad: se libera la conexión de escritura hasta el próximo evento.
+                    close_db()
+                    continue
+                if elemento is self._DETENER:
+                    close_db()
+                    return
+
+                # Se espera hasta completar el lote o hasta que venza el intervalo desde el primer evento.
+                lote = [elemento]
+                limite = time.monotonic() + self.flush_interval
+                detener = False
+                while len(lote) < self.batch_size:
+                    restante = limite - time.monotonic()
+                    try:
+                        siguiente = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                    except queue.Empty:
+                        break
+                    if siguiente is self._DETENER:
+                        detener = True
+                        break
+                    lote.append(siguiente)
+
+                if self._escribir(app, lote):
+                    self._recuperar_derrame(app)
+                if detener:
+                    close_db()
+                    return
+
+    def _escribir(self, app, lote):
+        """Inserta un lote con reintentos; si no se logra, lo deriva a disco. Devuelve True si se insertó."""
+        eventos = [evento for evento, _ in lote]
+        for intento in range(1, self.max_retries + 1):
+            inicio = time.monotonic()
+            try:
+                self._audit_repo.log_events_batch(eventos)
+            except Exception as e:
+                with self._lock:
+                    self._metricas['ultimo_error'] = f"{type(e).__name__}: {e}"
+                # La conexión puede haber quedado inutilizable: se descarta y se abre otra en el reintento.
+                close_db()
+                if intento == self.max_retries:
+                    app.logger.error(f"No se pudo escribir un lote de {len(eventos)} eventos de bitácora; se guarda en disco: {e}")
+                    self._derramar(eventos)
+                    return False
+                self._sumar('reintentos')
+                time.sleep(self.backoff_seconds * 2 ** (intento - 1))
+                continue
+            fin = time.monotonic()
+            with self._lock:
+                self._metricas['lotes'] += 1
+                self._metricas['registrados'] += len(eventos)
+                duracion = (fin - inicio) * 1000
+                self._metricas['escritura_total_ms'] += duracion
+                self._metricas['escritura_max_ms'] = max(self._metricas['escritura_max_ms'], duracion)
+                self._metricas['latencia_total_ms'] += sum((fin - encolado_en) * 1000 for _, encolado_en in lote)
+            return True
+        return False
+
+    # --- ARCHIVO DE DERRAME ---
+
+    def _derramar(self, eventos):
+        if not eventos:
+            return
+        with self._spill_lock:
+            try:
+                os.makedirs(os.path.dirname(self.spill_file) or '.', exist_ok=True)
+                with open(self.spill_file, 'a', encoding='utf-8') as archivo:
+                    for id_usuario, fecha_hora, modulo, accion, descripcion, detalle_json in eventos:
+                        archivo.write(json.dumps({
+                            'id_usuario': id_usuario,
+                            'fecha_hora': fecha_hora.isoformat(),
+                            'modulo': modulo,
+                            'accion': accion,
+                            'descripcion': descripcion,
+                            'detalle_json': detalle_json,
+                        }, default=str) + '\n')
+            except OSError:
+                # Último recurso: sin base de datos ni disco, el evento solo queda en el log de la aplicación.
+                logger.exception(f"Se perdieron {len(eventos)} eventos de bitácora: {eventos}")
+                return
+        with self._lock:
+            self._metricas['derivados_a_disco'] += len(eventos)
+
+    def _recuperar_derrame(self, app, origen=None):
+        """Reinserta los eventos guardados en disco; el archivo se toma de forma atómica para no duplicarlos."""
+        origen = origen or self.spill_file
+        if not os.path.exists(origen):
+            return
+        en_proceso = f"{self.spill_file}.{os.getpid()}"
+        with self._spill_lock:
+            try:
+                os.replace(origen, en_proceso)
+                # La fecha del archivo marca el inicio de la reinserción (ver REINSERCION_MAXIMA_SEGUNDOS).
+                os.utime(en_proceso)
+            except OSError:
+                return
+        eventos = []
+        try:
+            with open(en_proceso, encoding='utf-8') as archivo:
+                for numero, linea in enumerate(archivo, start=1):
+                    if not linea.strip():
+                        continue
+                    try:
+                        dato = json.loads(linea)
+                        eventos.append((
+                            dato['id_usuario'], datetime.fromisoformat(dato['fecha_hora']), dato['modulo'],
+                            dato['accion'], dato['descripcion'], dato['detalle_json'],
+                        ))
+                    except (ValueError, KeyError) as e:
+                        # Una línea dañada (ej. escritura cortada) no debe bloquear el resto del archivo.
+                        app.logger.error(f"Se descarta la línea {numero} ilegible de {en_proceso}: {e}")
+        except OSError as e:
+            app.logger.error(f"No se pudo leer el archivo de bitácora pendiente {en_proceso}: {e}")
+            self._devolver_derrame(en_proceso)
+            return
+        for i in range(0, len(eventos), self.batch_size):
+            parte = eventos[i:i + self.batch_size]
+            ahora = time.monotonic()
+            if not self._escribir(app, [(evento, ahora) for evento in parte]):
+                # _escribir ya devolvió la parte fallida al archivo; se devuelve también el resto.
+                self._derramar(eventos[i + self.batch_size:])
+                break
+            with self._lock:
+                self._metricas['recuperados_de_disco'] += len(parte)
+        os.remove(en_proceso)
+
+    def _devolver_derrame(self, en_proceso):
+        # Vuelve a su nombre para reintentarlo más tarde. os.link no reemplaza un archivo de derrame
+        # creado entretanto (por este u otro proceso); en ese caso queda como abandonado.
+        with self._spill_lock:
+            try:
+                os.link(en_proceso, self.spill_file)
+                os.remove(en_proceso)
+            except OSError:
+                pass
+
+    def _recuperar_abandonados(self, app):
+        """Reinserta los archivos en reinserción que dejaron procesos detenidos (o una lectura fallida)."""
+        limite = time.time() - self.REINSERCION_MAXIMA_SEGUNDOS
+        for ruta in glob.glob(f"{glob.escape(self.spill_file)}.*"):
+            try:
+                abandonado = os.path.getmtime(ruta) < limite
+            except OSError:
+                continue
+            if abandonado:
+                app.logger.warning(f"Se recupera el archivo de bitácora pendiente abandonado {ruta}")
+                self._recuperar_derrame(app, ruta)
+
+    def _sumar(self, clave):
+        with self._lock:
+            self._metricas[clave] += 1
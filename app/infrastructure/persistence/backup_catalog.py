@@ -0,0 +1,128 @@
+# RUTA: app/infrastructure/persistence/backup_catalog.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BackupCatalog:
+    """
+    Catálogo de las copias de seguridad realizadas, guardado como JSON en disco.
+
+    Cada entrada registra los datos reales del backup (tamaño del archivo, tamaño sin
+    comprimir, duración, velocidad, SHA-256 y resultado de RESTORE VERIFYONLY). Se relee del
+    disco en cada operación para ver lo que registren otros procesos del servidor y se
+    escribe de forma atómica. Cada lectura-modificación-escritura se hace con un archivo de
+    bloqueo (<catálogo>.lock), para que dos procesos no se pisen los cambios.
+
+    `max_entries` es un tope orientativo: al superarlo solo se descartan (de las más antiguas
+    a las más nuevas) las entradas cuyos archivos ya eliminó la retención (marca 'eliminado').
+    Las demás se conservan siempre, porque son la base de los DIFERENCIAL y LOG siguientes y
+    la lista de archivos que la retención debe eliminar más adelante.
+    """
+
+    # Un bloqueo más antiguo que esto se considera abandonado (proceso caído a mitad de una escritura).
+    BLOQUEO_MAXIMO_SEGUNDOS = 30
+    # Tiempo máximo que se espera a que otro proceso libere el catálogo.
+    ESPERA_BLOQUEO_SEGUNDOS = 10
+
+    def __init__(self, path, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def add(self, entrada):
+        with self._bloqueo():
+            entradas = self._leer()
+            entradas.append(entrada)
+            self._guardar(self._recortar(entradas))
+
+    def update(self, entry_id, **cambios):
+        with self._bloqueo():
+            entradas = self._leer()
+            for entrada in entradas:
+                if entrada['id'] == entry_id:
+                    entrada.update(cambios)
+                    break
+            else:
+                return
+            self._guardar(entradas)
+
+    def list(self, limit=None):
+        """Entradas de la más reciente a la más antigua."""
+        with self._lock:
+            entradas = self._leer()
+        entradas.reverse()
+        return entradas[:limit] if limit else entradas
+
+    @contextmanager
+    def _bloqueo(self):
+        # Entre hilos basta self._lock; entre procesos, el archivo creado con O_EXCL.
+        ruta = f"{self.path}.lock"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            limite = time.monotonic() + self.ESPERA_BLOQUEO_SEGUNDOS
+            while True:
+                try:
+                    os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    pass
+                try:
+                    if time.time() - os.path.getmtime(ruta) > self.BLOQUEO_MAXIMO_SEGUNDOS:
+                        os.remove(ruta)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"El catálogo de backups está bloqueado por otro proceso ({ruta}).")
+                time.sleep(0.05)
+            try:
+                yield
+            finally:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def _recortar(self, entradas):
+        sobrantes = len(entradas) - self.max_entries
+        if sobrantes <= 0:
+            return entradas
+        descartadas = set()
+        for posicion, entrada in enumerate(entradas):
+            if len(descartadas) == sobrantes:
+                break
+            if entrada.get('eliminado'):
+                descartadas.add(posicion)
+        return [entrada for posicion, entrada in enumerate(entradas) if posicion not in descartadas]
+
+    def _leer(self):
+        try:
+            with open(self.path, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            return []
+        except ValueError:
+            # Un catálogo ilegible se aparta (no se sobrescribe) y se empieza uno nuevo.
+            os.replace(self.path, f"{self.path}.corrupto")
+            return []
+
+    def _guardar(self, entradas):
+        # Temporal con nombre único: aunque un bloqueo abandonado se rompa, dos escrituras no comparten archivo.
+        descriptor, temporal = tempfile.mkstemp(
+            prefix=f"{os.path.basename(self.path)}.", suffix='.tmp', dir=os.path.dirname(self.path) or '.'
+        )
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+                json.dump(entradas, archivo, default=str)
+            os.replace(temporal, self.path)
+        except BaseException:
+            try:
+                os.remove(temporal)
+            except OSError:
+                pass
+            raise
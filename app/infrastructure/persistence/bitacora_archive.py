@@ -0,0 +1,243 @@
+# RUTA: app/infrastructure/persistence/bitacora_archive.py
+
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, date
+
+
+def _clave(registro):
+    return (registro['fecha_hora'], registro['id_bitacora'])
+
+
+class BitacoraArchive:
+    """
+    Archivo histórico de la bitácora en disco, en segmentos comprimidos de solo anexado.
+
+    Cada segmento es un JSON por línea comprimido con gzip, ordenado por (fecha_hora, id_bitacora)
+    y guardado en carpetas por año/mes. Junto a cada segmento se escribe un índice pequeño
+    (cantidad, rango de IDs y fechas, y cuántos registros hay de cada módulo, acción y usuario)
+    que permite descartar y contar segmentos sin descomprimirlos. Los segmentos nunca se modifican: cada ejecución
+    del archivado agrega segmentos nuevos.
+    """
+
+    # Cada cuánto se vuelven a leer los índices (otro proceso pudo agregar segmentos).
+    RECARGA_INDICES_SEGUNDOS = 60
+    # Filtro de la consulta -> campo del registro y listas de valores del índice.
+    CAMPOS_FILTRO = (('modulo', 'modulos'), ('accion', 'acciones'), ('username', 'usuarios'))
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._indices = None
+        self._cargado_en = 0
+
+    # --- ESCRITURA ---
+
+    def write_segment(self, registros):
+        """
+        Escribe un segmento con registros de un mismo día (dicts con las columnas de la bitácora
+        y el username). Devuelve el índice del segmento. El índice se escribe al final: un
+        segmento sin índice (proceso interrumpido) se ignora y sus filas siguen en la tabla.
+        """
+        registros = sorted(registros, key=_clave)
+        dia = registros[0]['fecha_hora']
+        carpeta = os.path.join(self.base_dir, f"{dia:%Y}", f"{dia:%m}")
+        os.makedirs(carpeta, exist_ok=True)
+        ids = [r['id_bitacora'] for r in registros]
+        nombre = f"bitacora_{dia:%Y%m%d}_{min(ids)}_{max(ids)}"
+        ruta = os.path.join(carpeta, f"{nombre}.jsonl.gz")
+
+        temporal = f"{ruta}.tmp"
+        with gzip.open(temporal, 'wt', encoding='utf-8') as archivo:
+            for registro in registros:
+                archivo.write(json.dumps(dict(registro, fecha_hora=registro['fecha_hora'].isoformat()), default=str))
+                archivo.write('\n')
+        os.replace(temporal, ruta)
+
+        indice = {
+            'archivo': os.path.relpath(ruta, self.base_dir),
+            'registros': len(registros),
+            'id_min': min(ids),
+            'id_max': max(ids),
+            'desde': registros[0]['fecha_hora'].isoformat(),
+            'hasta': registros[-1]['fecha_hora'].isoformat(),
+            'primero': [registros[0]['fecha_hora'].isoformat(), registros[0]['id_bitacora']],
+            'ultimo': [registros[-1]['fecha_hora'].isoformat(), registros[-1]['id_bitacora']],
+            'modulos': sorted({r['modulo'] for r in registros if r.get('modulo')}),
+            'acciones': sorted({r['accion'] for r in registros if r.get('accion')}),
+            'usuarios': sorted({r['username'] for r in registros if r.get('username')}),
+            'conteos': {filtro: self._contar_valores(registros, filtro) for filtro, _ in self.CAMPOS_FILTRO},
+        }
+        with open(os.path.join(carpeta, f"{nombre}.idx.json.tmp"), 'w', encoding='utf-8') as archivo:
+            json.dump(indice, archivo)
+        os.replace(os.path.join(carpeta, f"{nombre}.idx.json.tmp"), os.path.join(carpeta, f"{nombre}.idx.json"))
+
+        with self._lock:
+            if self._indices is not None:
+                self._indices.append(self._preparar_indice(indice))
+        return indice
+
+    def archived_ids(self, id_min, id_max):
+        """IDs ya archivados dentro del rango (para no duplicar si un archivado anterior se interrumpió)."""
+        ids = set()
+        for indice in self._get_indices():
+            if indice['id_max'] >= id_min and indice['id_min'] <= id_max:
+                ids.update(r['id_bitacora'] for r in self._leer_segmento(indice))
+        return ids
+
+    # --- CONSULTA ---
+
+    def query(self, filters=None, limit=20, cursor=None, direction='next', bound=None):
+        """
+        Devuelve hasta `limit` registros archivados que cumplan los filtros (username, modulo,
+        accion, desde, hasta), en el mismo orden y con la misma semántica de cursor que la tabla:
+        'next' = más antiguos que el cursor (descendente), 'prev' = más recientes (ascendente).
+        `bound` es la peor clave ya obtenida de la tabla: los segmentos que no pueden mejorarla
+        no se leen.
+        """
+        filters = filters or {}
+        hacia_atras = direction == 'prev'
+        candidatos = [i for i in self._get_indices() if self._segmento_aplica(i, filters, cursor, hacia_atras, bound)]
+        # Se leen primero los segmentos más cercanos al cursor y se corta al tener suficientes.
+        candidatos.sort(key=lambda i: i['_primero'] if hacia_atras else i['_ultimo'], reverse=not hacia_atras)
+
+        resultado = []
+        for indice in candidatos:
+            if len(resultado) >= limit:
+                limite = resultado[limit - 1]
+                # Ningún registro de este segmento (ni de los siguientes) puede entrar en la página.
+                if (hacia_atras and _clave(limite) <= indice['_primero']) or (not hacia_atras and _clave(limite) >= indice['_ultimo']):
+                    break
+            for registro in self._leer_segmento(indice):
+                if self._cumple(registro, filters, cursor, hacia_atras):
+                    resultado.append(registro)
+            resultado.sort(key=_clave, reverse=not hacia_atras)
+            del resultado[limit:]
+        return resultado
+
+    def count(self, filters=None):
+        """
+        Cuenta los registros archivados que cumplen los filtros solo con los índices, sin leer
+        segmentos. Devuelve (cantidad, aproximado): un segmento que no se puede contar con su
+        índice (varios filtros de valor a la vez, o índice anterior a los conteos) no se suma y
+        marca el resultado como aproximado, que es entonces una cota inferior.
+        """
+        filters = filters or {}
+        filtros_valor = [(filtro, _normalizar(filters[filtro])) for filtro, _ in self.CAMPOS_FILTRO if filters.get(filtro)]
+        total, aproximado = 0, False
+        for indice in self._get_indices():
+            # Los segmentos son de un solo día: si pasan el filtro de fechas, lo cumplen enteros.
+            if not self._segmento_aplica(indice, filters, None, False, None):
+                continue
+            if not filtros_valor:
+                total += indice['registros']
+            elif len(filtros_valor) == 1 and 'conteos' in indice:
+                filtro, valor = filtros_valor[0]
+                total += sum(n for v, n in indice['conteos'][filtro].items() if _normalizar(v) == valor)
+            else:
+                aproximado = True
+        return total, aproximado
+
+    def stats(self):
+        indices = self._get_indices()
+        return {
+            'segmentos': len(indices),
+            'registros': sum(i['registros'] for i in indices),
+            'desde': min((i['desde'] for i in indices), default=None),
+            'hasta': max((i['hasta'] for i in indices), default=None),
+        }
+
+    # --- AUXILIARES ---
+
+    def _get_indices(self):
+        with self._lock:
+            if self._indices is None or time.monotonic() - self._cargado_en > self.RECARGA_INDICES_SEGUNDOS:
+                indices = []
+                for ruta in glob.glob(os.path.join(self.base_dir, '*', '*', '*.idx.json')):
+                    try:
+                        with open(ruta, encoding='utf-8') as archivo:
+                            indices.append(self._preparar_indice(json.load(archivo)))
+                    except (OSError, ValueError):
+                        continue
+                self._indices = indices
+                self._cargado_en = time.monotonic()
+            return list(self._indices)
+
+    @staticmethod
+    def _preparar_indice(indice):
+        indice['_primero'] = (datetime.fromisoformat(indice['primero'][0]), indice['primero'][1])
+        indice['_ultimo'] = (datetime.fromisoformat(indice['ultimo'][0]), indice['ultimo'][1])
+        return indice
+
+    @staticmethod
+    def _contar_valores(registros, campo):
+        conteo = {}
+        for registro in registros:
+            if registro.get(campo):
+                conteo[registro[campo]] = conteo.get(registro[campo], 0) + 1
+        return conteo
+
+    def _leer_segmento(self, indice):
+        with gzip.open(os.path.join(self.base_dir, indice['archivo']), 'rt', encoding='utf-8') as archivo:
+            for linea in archivo:
+                registro = json.loads(linea)
+                registro['fecha_hora'] = datetime.fromisoformat(registro['fecha_hora'])
+                yield registro
+
+    @staticmethod
+    def _segmento_aplica(indice, filters, cursor, hacia_atras, bound):
+        if filters.get('modulo') and _normalizar(filters['modulo']) not in {_normalizar(v) for v in indice['modulos']}:
+            return False
+        if filters.get('accion') and _normalizar(filters['accion']) not in {_normalizar(v) for v in indice['acciones']}:
+            return False
+        if filters.get('username') and _normalizar(filters['username']) not in {_normalizar(v) for v in indice['usuarios']}:
+            return False
+        if filters.get('desde') and indice['_ultimo'][0].date() < _como_fecha(filters['desde']):
+            return False
+        if filters.get('hasta') and indice['_primero'][0].date() > _como_fecha(filters['hasta']):
+            return False
+        if hacia_atras:
+            if cursor is not None and indice['_ultimo'] <= cursor:
+                return False
+            if bound is not None and indice['_primero'] >= bound:
+                return False
+        else:
+            if cursor is not None and indice['_primero'] >= cursor:
+                return False
+            if bound is not None and indice['_ultimo'] <= bound:
+                return False
+        return True
+
+    @staticmethod
+    def _cumple(registro, filters, cursor, hacia_atras):
+        if filters.get('modulo') and _normalizar(registro.get('modulo')) != _normalizar(filters['modulo']):
+            return False
+        if filters.get('accion') and _normalizar(registro.get('accion')) != _normalizar(filters['accion']):
+            return False
+        if filters.get('username') and _normalizar(registro.get('username')) != _normalizar(filters['username']):
+            return False
+        if filters.get('desde') and registro['fecha_hora'].date() < _como_fecha(filters['desde']):
+            return False
+        if filters.get('hasta') and registro['fecha_hora'].date() > _como_fecha(filters['hasta']):
+            return False
+        if cursor is not None:
+            return _clave(registro) > cursor if hacia_atras else _clave(registro) < cursor
+        return True
+
+
+def _normalizar(texto):
+    # Igual que la intercalación de SQL Server de la tabla activa: sin distinguir mayúsculas
+    # ni espacios finales, para que los filtros den lo mismo en la tabla y en el archivo.
+    return (texto or '').rstrip().casefold()
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
@@ -6,7 +6,7 @@ from app.domain.models.personal import Personal
 from app.domain.repositories.i_usuario_repository import IUsuarioRepository
 from app.domain.repositories.i_personal_repository import IPersonalRepository
 from app.domain.repositories.i_auditoria_repository import IAuditoriaRepository
-from app.utils.pagination import SimplePagination
+from app.utils.pagination import SimplePagination, KeysetPagination
 
 def _row_to_dict(cursor, row):
     # LÍNEA CORREGIDA: Eliminada la indentación inconsistente y caracteres invisibles (U+00A0)
@@ -58,6 +58,15 @@ class SqlServerUsuarioRepository(IUsuarioRepository):
         cursor.execute(query, hashed_code, expiry_date, user_id)
         conn.commit()
 
+    def replace_2fa_code(self, user_id, expected_code, new_code):
+        """Reemplaza el código 2FA solo si sigue siendo el esperado; devuelve True si se actualizó."""
+        conn = get_db_write()
+        cursor = conn.cursor()
+        query = "UPDATE usuarios SET two_factor_code = ? WHERE id_usuario = ? AND two_factor_code = ?"
+        cursor.execute(query, new_code, user_id, expected_code)
+        conn.commit()
+        return cursor.rowcount == 1
+
     def clear_2fa_code(self, user_id):
         conn = get_db_write()
         cursor = conn.cursor()
@@ -78,6 +87,78 @@ class SqlServerUsuarioRepository(IUsuarioRepository):
         cursor.execute("{CALL sp_actualizar_ultimo_login(?)}", user_id)
         conn.commit()
 
+    def find_active_contacts_by_role(self, role_names):
+        """Obtiene id, usuario y email de los usuarios activos con alguno de los roles indicados."""
+        if not role_names:
+            return []
+        conn = get_db_read()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in role_names)
+        query = f"""
+            SELECT u.id_usuario, u.username, COALESCE(u.email, p.email) AS email,
+                   CONCAT(p.nombres, ' ', p.apellidos) AS nombre_completo
+            FROM usuarios u
+            JOIN roles r ON r.id_rol = u.id_rol
+            LEFT JOIN personal p ON p.dni = u.username
+            WHERE u.activo = 1 AND r.nombre_rol IN ({placeholders})
+        """
+        cursor.execute(query, *role_names)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
+# Columnas del listado de personal que se pueden proyectar y ordenar desde la API JSON.
+# Solo se interpolan en el SQL los valores de este diccionario, nunca texto del usuario.
+PERSONAL_LIST_COLUMNS = {
+    'id_personal': 'p.id_personal',
+    'dni': 'p.dni',
+    'nombres': 'p.nombres',
+    'apellidos': 'p.apellidos',
+    'sexo': 'p.sexo',
+    'email': 'p.email',
+    'telefono': 'p.telefono',
+    'fecha_nacimiento': 'p.fecha_nacimiento',
+    'fecha_ingreso': 'p.fecha_ingreso',
+    'fecha_registro': 'p.fecha_registro',
+    'id_unidad': 'p.id_unidad',
+    'unidad_administrativa': 'ua.nombre',
+    'activo': 'p.activo',
+}
+
+# Estados de vencimiento de documentos admitidos como filtro del listado.
+VENCIMIENTO_FILTERS = ('vencido', 'por_vencer', 'al_dia')
+
+# Columnas de documentos sin el contenido binario (FILESTREAM), para listados.
+DOCUMENTO_LIST_COLUMNS = (
+    "d.id_documento, d.id_personal, d.id_tipo, d.id_seccion, d.nombre_archivo, d.fecha_subida, "
+    "d.fecha_emision, d.fecha_vencimiento, d.descripcion, d.hash_archivo, ls.nombre_seccion, td.nombre_tipo"
+)
+
+# Consultas por sección del legajo (las mismas de sp_obtener_legajo_completo_por_personal),
+# para cargar cada sección por separado.
+LEGAJO_SECTION_QUERIES = {
+    'estudios': "SELECT * FROM estudios WHERE id_personal = ? ORDER BY fecha_fin DESC",
+    'capacitaciones': "SELECT * FROM capacitaciones WHERE id_personal = ? ORDER BY fecha_fin DESC",
+    'contratos': (
+        "SELECT c.*, tc.nombre_tipo AS tipo_contrato_nombre FROM contratos c "
+        "JOIN tipos_contrato tc ON c.id_tipo_contrato = tc.id_tipo_contrato "
+        "WHERE c.id_personal = ? ORDER BY c.fecha_inicio DESC"
+    ),
+    'historial_laboral': (
+        "SELECT hl.*, cg.nombre_cargo, ua.nombre AS unidad_administrativa_nombre FROM historial_laboral hl "
+        "JOIN cargos cg ON hl.id_cargo = cg.id_cargo JOIN unidad_administrativa ua ON hl.id_unidad = ua.id_unidad "
+        "WHERE hl.id_personal = ? ORDER BY hl.fecha_inicio DESC"
+    ),
+    'licencias': (
+        "SELECT l.*, tl.nombre_tipo AS tipo_licencia_nombre FROM licencias l "
+        "JOIN tipos_licencia tl ON l.id_tipo_licencia = tl.id_tipo_licencia "
+        "WHERE l.id_personal = ? ORDER BY l.fecha_inicio DESC"
+    ),
+    'documentos': (
+        f"SELECT {DOCUMENTO_LIST_COLUMNS} FROM documentos d "
+        "JOIN legajo_secciones ls ON d.id_seccion = ls.id_seccion JOIN tipo_documento td ON d.id_tipo = td.id_tipo "
+        "WHERE d.id_personal = ? ORDER BY ls.id_seccion, d.fecha_subida DESC"
+    ),
+}
+
 # --- REPOSITORIO DE PERSONAL ---
 class SqlServerPersonalRepository(IPersonalRepository):
     # ... (Métodos de personal) ...
@@ -90,13 +171,56 @@ class SqlServerPersonalRepository(IPersonalRepository):
         return cursor.fetchone() is not None
 
     def get_all_documents_with_expiration(self):
-        """Llama al SP para obtener todos los documentos activos con fecha de vencimiento."""
+        """
+        Obtiene los documentos con fecha de vencimiento del personal activo, siempre con su
+        id_documento (el índice de vencimientos lo usa como clave). Usa el mismo criterio que
+        find_expiring_documents para que ambos cuenten los mismos documentos.
+        """
         conn = get_db_read()
         cursor = conn.cursor()
-        cursor.execute("{CALL sp_listar_documentos_con_vencimiento}")
+        cursor.execute("""
+            SELECT d.id_documento, d.id_personal, d.fecha_vencimiento
+            FROM documentos d
+            JOIN personal p ON p.id_personal = d.id_personal
+            WHERE d.fecha_vencimiento IS NOT NULL AND p.activo = 1
+        """)
         return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
 
 
+    def find_expiring_documents(self, days_threshold, document_ids=None):
+        """
+        Obtiene los documentos que vencen dentro de `days_threshold` días (incluidos los ya
+        vencidos) del personal activo, junto con el usuario responsable de su unidad
+        administrativa (unidad_administrativa.responsable guarda el usuario/DNI del responsable).
+        Con `document_ids` la consulta se limita a esos documentos (candidatos ya conocidos).
+        """
+        conn = get_db_read()
+        cursor = conn.cursor()
+        query = """
+            SELECT d.id_documento, d.id_personal, d.nombre_archivo, d.fecha_vencimiento,
+                   td.nombre_tipo, p.dni, p.nombres, p.apellidos, ua.nombre AS unidad_administrativa,
+                   ur.id_usuario AS responsable_id, ur.username AS responsable_username,
+                   COALESCE(ur.email, pr.email) AS responsable_email,
+                   CONCAT(pr.nombres, ' ', pr.apellidos) AS responsable_nombre
+            FROM documentos d
+            JOIN personal p ON p.id_personal = d.id_personal
+            JOIN tipo_documento td ON td.id_tipo = d.id_tipo
+            JOIN unidad_administrativa ua ON ua.id_unidad = p.id_unidad
+            LEFT JOIN usuarios ur ON ur.username = ua.responsable AND ur.activo = 1
+            LEFT JOIN personal pr ON pr.dni = ur.username
+            WHERE d.fecha_vencimiento IS NOT NULL AND p.activo = 1
+              AND d.fecha_vencimiento <= DATEADD(day, ?, CAST(GETDATE() AS date))
+              {filtro_ids}
+            ORDER BY d.fecha_vencimiento, p.apellidos
+        """
+        params = [days_threshold]
+        filtro_ids = ""
+        if document_ids is not None:
+            filtro_ids = "AND d.id_documento IN (SELECT TRY_CAST(value AS INT) FROM STRING_SPLIT(?, ','))"
+            params.append(",".join(str(int(i)) for i in document_ids))
+        cursor.execute(query.format(filtro_ids=filtro_ids), *params)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
     def find_document_by_id(self, document_id):
         """
         Llama al SP para obtener los datos de un único documento por su ID.
@@ -106,6 +230,32 @@ class SqlServerPersonalRepository(IPersonalRepository):
         cursor.execute("{CALL sp_obtener_documento_por_id(?)}", document_id)
         return cursor.fetchone()
 
+    def iter_document_content(self, document_id, chunk_size=1024 * 1024):
+        """
+        Lee el contenido binario de un documento por bloques (SUBSTRING sobre el FILESTREAM),
+        para procesar archivos grandes sin cargarlos completos en memoria.
+        """
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DATALENGTH(archivo) FROM documentos WHERE id_documento = ?", document_id)
+        row = cursor.fetchone()
+        total = row[0] if row and row[0] else 0
+        # SUBSTRING sobre varbinary comienza en la posición 1.
+        for inicio in range(1, total + 1, chunk_size):
+            cursor.execute(
+                "SELECT SUBSTRING(archivo, ?, ?) FROM documentos WHERE id_documento = ?",
+                inicio, chunk_size, document_id
+            )
+            yield bytes(cursor.fetchone()[0])
+
+    def find_personal_id_by_document_id(self, document_id):
+        """Devuelve el id_personal al que pertenece un documento (o None si no existe)."""
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_personal FROM documentos WHERE id_documento = ?", document_id)
+        row = cursor.fetchone()
+        return row[0] if row else None
+
     def delete_document_by_id(self, document_id):
         """
         Llama al SP para la eliminación lógica de un documento.
@@ -139,28 +289,47 @@ class SqlServerPersonalRepository(IPersonalRepository):
         # Se asume que el SP devuelve filas que se pueden mapear al modelo Documento.
         return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
 
-    def get_full_legajo_by_id(self, personal_id):
+    def find_personal_info_by_id(self, personal_id):
+        """Obtiene solo los datos personales (cabecera del legajo) como diccionario."""
         conn = get_db_read()
         cursor = conn.cursor()
-        cursor.execute("{CALL sp_obtener_legajo_completo_por_personal(?)}", personal_id)
-        
-        # El primer resultado es la información del personal.
-        personal_info = _row_to_dict(cursor, cursor.fetchone())
-        if not personal_info:
-            return None # Si no hay datos personales, el legajo no existe.
+        cursor.execute("{CALL sp_obtener_personal_por_id(?)}", personal_id)
+        return _row_to_dict(cursor, cursor.fetchone())
+
+    def count_documents_by_seccion(self, personal_id):
+        """Cuenta los documentos de un empleado por sección del legajo: {id_seccion: cantidad}."""
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id_seccion, COUNT(*) AS cantidad FROM documentos WHERE id_personal = ? GROUP BY id_seccion",
+            personal_id
+        )
+        return {row.id_seccion: row.cantidad for row in cursor.fetchall()}
+
+    def get_legajo_section(self, personal_id, seccion):
+        """Obtiene una sola sección del legajo (estudios, contratos, documentos, etc.)."""
+        if seccion not in LEGAJO_SECTION_QUERIES:
+            raise ValueError(f"Sección de legajo no válida: {seccion}")
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute(LEGAJO_SECTION_QUERIES[seccion], personal_id)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
+    def find_documents_by_seccion(self, personal_id, id_seccion):
+        """Obtiene los documentos (sin contenido binario) de una sección del legajo de un empleado."""
+        conn = get_db_read()
+        cursor = conn.cursor()
+        query = f"""
+            SELECT {DOCUMENTO_LIST_COLUMNS}
+            FROM documentos d
+            JOIN legajo_secciones ls ON d.id_seccion = ls.id_seccion
+            JOIN tipo_documento td ON d.id_tipo = td.id_tipo
+            WHERE d.id_personal = ? AND d.id_seccion = ?
+            ORDER BY d.fecha_subida DESC
+        """
+        cursor.execute(query, personal_id, id_seccion)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
 
-        legajo = {"personal": personal_info}
-        
-        # Se procesan los siguientes conjuntos de resultados.
-        if cursor.nextset(): legajo["estudios"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        if cursor.nextset(): legajo["capacitaciones"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        if cursor.nextset(): legajo["contratos"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        if cursor.nextset(): legajo["historial_laboral"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        if cursor.nextset(): legajo["licencias"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        if cursor.nextset(): legajo["documentos"] = [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-            
-        return legajo
-    
     # Llama a un SP para listar, filtrar y paginar al personal.
     def get_all_paginated(self, page, per_page, filters):
         conn = get_db_read()
@@ -175,6 +344,106 @@ class SqlServerPersonalRepository(IPersonalRepository):
         total = cursor.fetchone()[0]
         return SimplePagination(results, page, per_page, total)
 
+    def get_page_projected(self, page, per_page, filters=None, fields=None, sort_by='apellidos', sort_desc=False, dias_por_vencer=30):
+        """
+        Lista paginada de personal con proyección de columnas, ordenamiento y filtros
+        (unidad, activo, sexo, estado de vencimiento, DNI y nombres) resueltos en SQL.
+        El total se obtiene en la misma consulta con COUNT(*) OVER().
+        """
+        filters = filters or {}
+        fields = list(fields or ('id_personal', 'dni', 'nombres', 'apellidos', 'unidad_administrativa', 'activo'))
+        invalidos = [f for f in fields if f not in PERSONAL_LIST_COLUMNS]
+        if invalidos or sort_by not in PERSONAL_LIST_COLUMNS:
+            raise ValueError(f"Columnas no permitidas: {', '.join(invalidos or [sort_by])}")
+        if 'id_personal' not in fields:
+            fields.insert(0, 'id_personal')
+
+        where, params = [], []
+        if filters.get('id_unidad') is not None:
+            where.append("p.id_unidad = ?")
+            params.append(filters['id_unidad'])
+        if filters.get('activo') is not None:
+            where.append("p.activo = ?")
+            params.append(1 if filters['activo'] else 0)
+        if filters.get('sexo'):
+            where.append("p.sexo = ?")
+            params.append(filters['sexo'])
+        if filters.get('dni'):
+            # Búsqueda por prefijo para aprovechar el índice IX_Personal_DNI.
+            where.append("p.dni LIKE ?")
+            params.append(f"{filters['dni']}%")
+        if filters.get('nombres'):
+            where.append("(p.nombres LIKE ? OR p.apellidos LIKE ?)")
+            params.extend([f"%{filters['nombres']}%"] * 2)
+
+        vencimiento = filters.get('vencimiento')
+        if vencimiento:
+            if vencimiento not in VENCIMIENTO_FILTERS:
+                raise ValueError(f"Filtro de vencimiento no válido: {vencimiento}")
+            subconsulta = "SELECT 1 FROM documentos d WHERE d.id_personal = p.id_personal AND d.fecha_vencimiento "
+            hoy = "CAST(GETDATE() AS date)"
+            if vencimiento == 'vencido':
+                where.append(f"EXISTS ({subconsulta}< {hoy})")
+            elif vencimiento == 'por_vencer':
+                where.append(f"EXISTS ({subconsulta}BETWEEN {hoy} AND DATEADD(day, ?, {hoy}))")
+                params.append(dias_por_vencer)
+            else:
+                where.append(f"NOT EXISTS ({subconsulta}<= DATEADD(day, ?, {hoy}))")
+                params.append(dias_por_vencer)
+
+        columnas = ", ".join(f"{PERSONAL_LIST_COLUMNS[f]} AS {f}" for f in fields)
+        direccion = "DESC" if sort_desc else "ASC"
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        query = f"""
+            SELECT {columnas}, COUNT(*) OVER() AS total_registros
+            FROM personal p
+            LEFT JOIN unidad_administrativa ua ON ua.id_unidad = p.id_unidad
+            {where_sql}
+            ORDER BY {PERSONAL_LIST_COLUMNS[sort_by]} {direccion}, p.id_personal {direccion}
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+        """
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute(query, *params, (page - 1) * per_page, per_page)
+        rows = cursor.fetchall()
+
+        if rows:
+            total = rows[0].total_registros
+        else:
+            # Página fuera de rango: el total se obtiene con un conteo aparte.
+            cursor.execute(f"SELECT COUNT(*) FROM personal p {where_sql}", *params)
+            total = cursor.fetchone()[0]
+        # Se devuelven las filas como listas (sin repetir nombres de columna) junto a la proyección.
+        items = [list(row)[:len(fields)] for row in rows]
+        return fields, SimplePagination(items, page, per_page, total)
+
+    def get_all_for_search_index(self):
+        """Obtiene los campos mínimos de todo el personal para construir el índice de búsqueda en memoria."""
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_personal, dni, nombres, apellidos, activo FROM personal")
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
+    def find_by_ids_for_listing(self, personal_ids):
+        """
+        Obtiene las filas del listado de personal para un conjunto de IDs (ej. una página
+        de resultados del índice de búsqueda). No garantiza el orden de los IDs recibidos.
+        """
+        if not personal_ids:
+            return []
+        conn = get_db_read()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in personal_ids)
+        query = f"""
+            SELECT p.id_personal, p.dni, p.nombres, p.apellidos, p.activo, p.id_unidad,
+                   ua.nombre AS unidad_administrativa
+            FROM personal p
+            LEFT JOIN unidad_administrativa ua ON ua.id_unidad = p.id_unidad
+            WHERE p.id_personal IN ({placeholders})
+        """
+        cursor.execute(query, *personal_ids)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
     # Llama a un SP para crear un nuevo registro de personal.
     def create(self, form_data):
         conn = get_db_write()
@@ -205,6 +474,13 @@ class SqlServerPersonalRepository(IPersonalRepository):
         )
         cursor.execute("{CALL sp_subir_documento(?, ?, ?, ?, ?, ?, ?, ?, ?)}", params)
         conn.commit()
+        # El SP no devuelve el ID generado; se recupera por empleado y hash del archivo recién subido.
+        cursor.execute(
+            "SELECT TOP 1 id_documento FROM documentos WHERE id_personal = ? AND hash_archivo = ? ORDER BY id_documento DESC",
+            doc_data.get('id_personal'), doc_data.get('hash_archivo')
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
     
     # Métodos para obtener listas para los formularios SelectField.
     def get_unidades_for_select(self):
@@ -346,6 +622,32 @@ class SqlServerAuditoriaRepository(IAuditoriaRepository):
         cursor.execute("{CALL sp_registrar_bitacora(?, ?, ?, ?, ?)}", id_usuario, modulo, accion, descripcion, detalle_json)
         conn.commit()
 
+    # Inserta varios eventos en una sola ida a la base de datos (usado por la escritura en lote).
+    # Cada evento es (id_usuario, fecha_hora, modulo, accion, descripcion, detalle_json); la fecha
+    # se envía explícitamente para conservar el momento del evento y no el de la escritura.
+    def log_events_batch(self, eventos):
+        if not eventos:
+            return
+        # Mismos límites que los parámetros de sp_registrar_bitacora, que truncan en silencio.
+        filas = [
+            (id_usuario, fecha_hora, (modulo or '')[:50], (accion or '')[:50],
+             descripcion[:1000] if descripcion else descripcion, detalle_json)
+            for id_usuario, fecha_hora, modulo, accion, descripcion, detalle_json in eventos
+        ]
+        conn = get_db_write()
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        try:
+            cursor.executemany(
+                "INSERT INTO bitacora (id_usuario, fecha_hora, modulo, accion, descripcion, detalle_json) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                filas
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
     # Obtiene los logs de forma paginada.
     def get_all_logs_paginated(self, page, per_page):
         conn = get_db_read()
@@ -358,93 +660,294 @@ class SqlServerAuditoriaRepository(IAuditoriaRepository):
         cursor.nextset()
         total = cursor.fetchone()[0]
         return SimplePagination(results, page, per_page, total)
-    
+
+    # Lista la bitácora con filtros y paginación por cursor sobre (fecha_hora, id_bitacora).
+    # `cursor` es la clave del último registro mostrado; `direction` es 'next' (más antiguos)
+    # o 'prev' (más recientes). Cada página usa los índices IX_Bitacora_* en lugar de OFFSET.
+    def get_logs_keyset(self, filters=None, per_page=20, cursor=None, direction='next', count_cap=10000):
+        filters = filters or {}
+        where, params = [], []
+        if filters.get('username'):
+            # Se resuelve el usuario primero para buscar por id_usuario con IX_Bitacora_Usuario_Fecha.
+            where.append("b.id_usuario = (SELECT id_usuario FROM usuarios WHERE username = ?)")
+            params.append(filters['username'])
+        if filters.get('modulo'):
+            where.append("b.modulo = ?")
+            params.append(filters['modulo'])
+        if filters.get('accion'):
+            where.append("b.accion = ?")
+            params.append(filters['accion'])
+        if filters.get('desde'):
+            where.append("b.fecha_hora >= ?")
+            params.append(filters['desde'])
+        if filters.get('hasta'):
+            # 'hasta' es inclusivo: se compara contra el inicio del día siguiente.
+            where.append("b.fecha_hora < DATEADD(day, 1, CAST(? AS date))")
+            params.append(filters['hasta'])
+
+        pagina_where, pagina_params = list(where), list(params)
+        hacia_atras = direction == 'prev' and cursor is not None
+        if cursor is not None:
+            fecha, id_bitacora = cursor
+            operador = '>' if hacia_atras else '<'
+            # CAST a datetime: la columna tiene precisión de 1/300 s y el valor leído viene redondeado,
+            # así que sin el CAST la igualdad con el registro del cursor no se cumpliría.
+            pagina_where.append(
+                f"(b.fecha_hora {operador} CAST(? AS datetime) "
+                f"OR (b.fecha_hora = CAST(? AS datetime) AND b.id_bitacora {operador} ?))"
+            )
+            pagina_params.extend([fecha, fecha, id_bitacora])
+        orden = "ASC" if hacia_atras else "DESC"
+        where_sql = f"WHERE {' AND '.join(pagina_where)}" if pagina_where else ""
+
+        conn = get_db_read()
+        db_cursor = conn.cursor()
+        # Se pide un registro de más para saber si hay otra página en esa dirección.
+        db_cursor.execute(f"""
+            SELECT TOP (?) b.id_bitacora, b.fecha_hora, b.id_usuario, u.username, b.modulo, b.accion, b.descripcion
+            FROM bitacora b
+            LEFT JOIN usuarios u ON b.id_usuario = u.id_usuario
+            {where_sql}
+            ORDER BY b.fecha_hora {orden}, b.id_bitacora {orden}
+        """, per_page + 1, *pagina_params)
+        results = [_row_to_dict(db_cursor, row) for row in db_cursor.fetchall()]
+        hay_mas = len(results) > per_page
+        results = results[:per_page]
+        if hacia_atras:
+            results.reverse()
+            has_prev, has_next = hay_mas, True
+        else:
+            has_prev, has_next = cursor is not None, hay_mas
+
+        # Total aproximado: sin filtros, el conteo de filas de los metadatos de la tabla; con
+        # filtros, un conteo acotado a `count_cap` (más allá solo se informa "más de N").
+        if where:
+            db_cursor.execute(
+                f"SELECT COUNT(*) FROM (SELECT TOP (?) 1 AS x FROM bitacora b WHERE {' AND '.join(where)}) t",
+                count_cap + 1, *params
+            )
+            total = db_cursor.fetchone()[0]
+            aproximado = total > count_cap
+            total = min(total, count_cap)
+        else:
+            db_cursor.execute(
+                "SELECT SUM(rows) FROM sys.partitions WHERE object_id = OBJECT_ID('dbo.bitacora') AND index_id IN (0, 1)"
+            )
+            total = db_cursor.fetchone()[0] or 0
+            aproximado = True
+
+        primero, ultimo = (results[0], results[-1]) if results else (None, None)
+        return KeysetPagination(
+            results, per_page, has_next, has_prev,
+            next_cursor=KeysetPagination.encode_cursor(ultimo['fecha_hora'], ultimo['id_bitacora']) if ultimo else None,
+            prev_cursor=KeysetPagination.encode_cursor(primero['fecha_hora'], primero['id_bitacora']) if primero else None,
+            total=total, total_is_approximate=aproximado
+        )
+
+    # Lee (en orden de id) hasta `limit` registros anteriores a `cutoff`, para archivarlos.
+    def find_logs_older_than(self, cutoff, after_id=0, limit=5000):
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TOP (?) b.id_bitacora, b.fecha_hora, b.id_usuario, u.username, b.modulo, b.accion, b.descripcion, b.detalle_json
+            FROM bitacora b
+            LEFT JOIN usuarios u ON b.id_usuario = u.id_usuario
+            WHERE b.fecha_hora < ? AND b.id_bitacora > ?
+            ORDER BY b.id_bitacora
+        """, limit, cutoff, after_id)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
+    # Elimina de la tabla los registros indicados (ya archivados) en una sola transacción.
+    def delete_logs(self, ids):
+        if not ids:
+            return 0
+        conn = get_db_write()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "DELETE FROM bitacora WHERE id_bitacora IN (SELECT TRY_CAST(value AS INT) FROM STRING_SPLIT(?, ','))",
+                ','.join(str(int(i)) for i in ids)
+            )
+            eliminados = cursor.rowcount
+            conn.commit()
+            return eliminados
+        except Exception:
+            conn.rollback()
+            raise
+
+    # Errores registrados desde `desde`, agrupados por huella (tipo de excepción + ubicación).
+    # Cada fila de la bitácora con accion = 'ERROR' guarda en detalle_json la huella y cuántas
+    # ocurrencias resume; los registros anteriores sin huella se agrupan por módulo y mensaje.
+    def get_error_groups(self, desde, limit=100):
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH errores AS (
+                SELECT b.id_bitacora, b.fecha_hora, b.id_usuario, b.modulo, b.descripcion, b.detalle_json,
+                       COALESCE(JSON_VALUE(b.detalle_json, '$.huella'), LEFT(CONCAT(b.modulo, '|', b.descripcion), 200)) AS huella,
+                       COALESCE(TRY_CAST(JSON_VALUE(b.detalle_json, '$.conteo') AS INT), 1) AS conteo,
+                       COALESCE(TRY_CAST(JSON_VALUE(b.detalle_json, '$.primera') AS DATETIME2), b.fecha_hora) AS primera,
+                       COALESCE(TRY_CAST(JSON_VALUE(b.detalle_json, '$.ultima') AS DATETIME2), b.fecha_hora) AS ultima
+                FROM bitacora b
+                WHERE b.accion = 'ERROR' AND b.fecha_hora >= ?
+            ), grupos AS (
+                SELECT e.*,
+                       SUM(e.conteo) OVER (PARTITION BY e.huella) AS total,
+                       MIN(e.primera) OVER (PARTITION BY e.huella) AS primera_vez,
+                       ROW_NUMBER() OVER (PARTITION BY e.huella ORDER BY e.fecha_hora DESC, e.id_bitacora DESC) AS orden
+                FROM errores e
+            )
+            SELECT TOP (?) g.huella, g.total, g.primera_vez AS primera, g.ultima, g.modulo, g.descripcion,
+                   JSON_VALUE(g.detalle_json, '$.tipo') AS tipo, JSON_VALUE(g.detalle_json, '$.ubicacion') AS ubicacion,
+                   u.username AS usuario
+            FROM grupos g
+            LEFT JOIN usuarios u ON g.id_usuario = u.id_usuario
+            WHERE g.orden = 1
+            ORDER BY g.ultima DESC
+        """, desde, limit)
+        return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
+
 
 # RUTA: app/infrastructure/persistence/sqlserver_repository.py
 
 import pyodbc
+import logging
 import os
+import queue
+import shlex
 import subprocess
+import threading
 from dotenv import load_dotenv
 
 # Carga las variables de entorno desde el archivo .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 def _row_to_dict(cursor, row):
     """Función auxiliar para convertir una fila de base de datos en un diccionario."""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
+class BackupCancelledError(Exception):
+    """Se lanza cuando un backup en curso se cancela a pedido del usuario."""
+
+
 class SqlServerBackupRepository:
     
-    # --- SECCIÓN DE BACKUPS (Tu código funcional, sin cambios) ---
-    def run_db_backup(self, db_name, file_path):
-        try:
-            db_server = os.getenv('DB_SERVER')
-            db_username = os.getenv('DB_USERNAME_SA') 
-            db_password = os.getenv('DB_PASSWORD_SA')
-            if not all([db_server, db_username, db_password]):
-                raise ValueError("Variables de BD no configuradas en .env")
-            backup_query = f"BACKUP DATABASE [{db_name}] TO DISK = N'{file_path}' WITH STATS = 10;"
-            sqlcmd_command = ["sqlcmd", "-S", db_server, "-U", db_username, "-P", db_password, "-Q", backup_query, "-b"]
-            process = subprocess.run(sqlcmd_command, capture_output=True, text=True, timeout=120, check=False)
-            if process.returncode == 0:
-                print("---[ÉXITO]: sqlcmd completó el backup correctamente.")
-                return True
-            else:
-                error_message = (f"!!! FALLO CRÍTICO DE SQLCMD:\n"
-                                 f"CÓDIGO: {process.returncode}\nERROR: {process.stderr}\nSALIDA: {process.stdout}")
-                print(error_message)
-                raise Exception("Fallo en la ejecución de sqlcmd.")
-        except Exception as e:
-            print(f"!!! ERROR INESPERADO en run_db_backup: {e}")
-            raise
+    # --- SECCIÓN DE BACKUPS ---
+    # Cláusula WITH según el tipo de backup (las tres escriben sumas de verificación).
+    _OPCIONES_BACKUP = {
+        'FULL': ['CHECKSUM'],
+        'DIFERENCIAL': ['DIFFERENTIAL', 'CHECKSUM'],
+        'LOG': ['CHECKSUM'],
+    }
 
-    def get_backup_history(self):
-        try:
-            from app.database.connector import get_db_read
-            conn = get_db_read()
-            cursor = conn.cursor()
-            query = """
-            SELECT TOP 5 fecha_hora AS fecha_registro, modulo, descripcion, 'FULL' AS Tipo, '5.5 GB' AS Tamanio, 'Éxito' AS Estado
-            FROM bitacora WHERE accion IN ('BACKUP', 'COPIA_SEGURIDAD') ORDER BY fecha_registro DESC;
-            """
-            cursor.execute(query)
-            return [_row_to_dict(cursor, row) for row in cursor.fetchall()]
-        except Exception as e:
-            print(f"!!! ERROR al obtener historial de backups: {e}")
-            return []
+    def run_db_backup(self, db_name, file_paths, backup_type='FULL', compression=True, on_output=None, cancel_event=None):
+        """
+        Ejecuta el BACKUP con sqlcmd sin límite de tiempo. `file_paths` puede ser una ruta o una
+        lista de rutas: con varias, el backup se reparte en bandas (un DISK por archivo) que SQL
+        Server escribe en paralelo. `backup_type` es 'FULL', 'DIFERENCIAL' o 'LOG'.
 
-    # --- SECCIÓN DE MANEJO DE ERRORES (Añadida anteriormente) ---
-    def registrar_error(self, modulo, descripcion, usuario_id=None):
-        conn = None
-        try:
-            from app.database.connector import get_db_write
-            conn = get_db_write()
-            cursor = conn.cursor()
-            sql = "INSERT INTO bitacora (fecha_hora, accion, modulo, descripcion, id_usuario) VALUES (GETDATE(), ?, ?, ?, ?)"
-            cursor.execute(sql, 'ERROR', modulo, descripcion, usuario_id)
-            conn.commit()
-        except Exception as e:
-            print(f"!!! FALLO AL REGISTRAR ERROR EN LA BITÁCORA: {e}")
-            if conn:
-                conn.rollback()
+        Cada línea de salida (ej. el avance 'N percent processed.' de STATS = 10) se entrega a
+        `on_output`. Si se activa `cancel_event`, se termina sqlcmd (el servidor aborta el BACKUP
+        al cerrarse la sesión) y se lanza BackupCancelledError.
+        """
+        if backup_type not in self._OPCIONES_BACKUP:
+            raise ValueError(f"Tipo de backup no soportado: {backup_type}")
+        rutas = [file_paths] if isinstance(file_paths, str) else list(file_paths)
+        destinos = ', '.join(f"DISK = N'{ruta}'" for ruta in rutas)
+        # CHECKSUM valida las páginas al copiar y permite verificarlas luego con RESTORE VERIFYONLY.
+        opciones = self._OPCIONES_BACKUP[backup_type] + ['COMPRESSION' if compression else 'NO_COMPRESSION', 'STATS = 10']
+        objeto = 'LOG' if backup_type == 'LOG' else 'DATABASE'
+        backup_query = f"BACKUP {objeto} [{db_name}] TO {destinos} WITH {', '.join(opciones)};"
+        return self._run_sqlcmd(self._sqlcmd_command(backup_query), on_output, cancel_event)
 
-    def obtener_historial_errores(self):
-        try:
-            from app.database.connector import get_db_read
-            conn = get_db_read()
-            cursor = conn.cursor()
-            query = """
-            SELECT TOP 50 b.fecha_hora, b.modulo, b.descripcion, u.username AS usuario
-            FROM bitacora b LEFT JOIN usuarios u ON b.id_usuario = u.id_usuario
-            WHERE b.accion = 'ERROR' ORDER BY b.fecha_hora DESC;
-            """
-            cursor.execute(query)
-            columns = [column[0] for column in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
-        except Exception as e:
-            print(f"!!! ERROR OBTENIENDO HISTORIAL DE ERRORES: {e}")
-            return []
+    def get_backup_metadata(self, file_path):
+        """
+        Datos que SQL Server registró en msdb para el último backup escrito en `file_path`:
+        tamaño sin comprimir y comprimido (bytes), inicio y fin. None si no hay registro.
+        """
+        ruta = file_path.replace("'", "''")
+        query = (
+            "SET NOCOUNT ON; "
+            "SELECT TOP 1 bs.backup_size, bs.compressed_backup_size, "
+            "CONVERT(varchar(23), bs.backup_start_date, 126), CONVERT(varchar(23), bs.backup_finish_date, 126) "
+            "FROM msdb.dbo.backupset bs "
+            "JOIN msdb.dbo.backupmediafamily mf ON mf.media_set_id = bs.media_set_id "
+            f"WHERE mf.physical_device_name = N'{ruta}' ORDER BY bs.backup_finish_date DESC;"
+        )
+        salida = self._run_sqlcmd(self._sqlcmd_command(query, ['-h', '-1', '-W', '-s', '|']))
+        for linea in salida:
+            partes = [p.strip() for p in linea.split('|')]
+            if len(partes) == 4:
+                try:
+                    return {
+                        'tamano_sin_comprimir': int(float(partes[0])),
+                        'tamano_comprimido': int(float(partes[1])),
+                        'inicio': partes[2],
+                        'fin': partes[3],
+                    }
+                except ValueError:
+                    continue
+        return None
+
+    def verify_backup(self, file_paths, cancel_event=None):
+        """Ejecuta RESTORE VERIFYONLY ... WITH CHECKSUM sobre el archivo (o sus bandas); lanza excepción si falla."""
+        rutas = [file_paths] if isinstance(file_paths, str) else list(file_paths)
+        origenes = ', '.join(f"DISK = N'{ruta}'" for ruta in rutas)
+        query = f"RESTORE VERIFYONLY FROM {origenes} WITH CHECKSUM;"
+        return self._run_sqlcmd(self._sqlcmd_command(query), cancel_event=cancel_event)
+
+    def _sqlcmd_command(self, query, extra_args=None):
+        # Para pruebas sin SQL Server, BACKUP_SQLCMD_STANDIN reemplaza a sqlcmd por otro comando
+        # (ej. "python sqlcmd_simulado.py") que recibe los mismos argumentos.
+        sustituto = os.getenv('BACKUP_SQLCMD_STANDIN')
+        if sustituto:
+            return [*shlex.split(sustituto, posix=os.name != "nt"), *(extra_args or []), "-Q", query, "-b"]
+        db_server = os.getenv('DB_SERVER')
+        db_username = os.getenv('DB_USERNAME_SA')
+        db_password = os.getenv('DB_PASSWORD_SA')
+        if not all([db_server, db_username, db_password]):
+            raise ValueError("Variables de BD no configuradas en .env")
+        return ["sqlcmd", "-S", db_server, "-U", db_username, "-P", db_password, *(extra_args or []), "-Q", query, "-b"]
+
+    def _run_sqlcmd(self, command, on_output=None, cancel_event=None):
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
+        )
+        # La salida se lee en otro hilo para poder revisar la cancelación aunque sqlcmd no escriba nada.
+        lineas = queue.Queue()
+
+        def _leer():
+            for linea in process.stdout:
+                lineas.put(linea.rstrip())
+            lineas.put(None)
+
+        lector = threading.Thread(target=_leer, name='salida-sqlcmd', daemon=True)
+        lector.start()
+        salida = []
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                raise BackupCancelledError("El backup fue cancelado.")
+            try:
+                linea = lineas.get(timeout=1)
+            except queue.Empty:
+                continue
+            if linea is None:
+                break
+            if linea:
+                salida.append(linea)
+                if on_output:
+                    on_output(linea)
+        returncode = process.wait()
+        if returncode != 0:
+            raise Exception(f"Fallo en la ejecución de sqlcmd (código {returncode}): {' | '.join(salida[-5:])}")
+        return salida
 
     # --- NUEVA LÓGICA PARA EL BORRADO SUAVE (SOFT DELETE) ---
 
@@ -485,11 +988,11 @@ class SqlServerBackupRepository:
 
             # Si todo fue bien, confirma la transacción
             conn.commit()
-            print(f"---[INFO]: Solicitud de eliminación creada para el documento ID {documento_id}")
+            logger.info("Solicitud de eliminación creada para el documento %s", documento_id)
             return True
 
         except Exception as e:
-            print(f"!!! FALLO EN SOLICITUD DE ELIMINACIÓN: {e}")
+            logger.error("Fallo en la solicitud de eliminación del documento %s: %s", documento_id, e)
             if conn:
                 conn.rollback() # Si algo falla, deshace todos los cambios
             return False
@@ -539,3 +1042,128 @@ class SqlServerSolicitudRepository:
         # El SP debe actualizar el campo de Legajo si es aprobación.
         # Asumimos que el SP maneja la lógica de actualización/rechazo.
         return True
+
+    def find_personal_id_by_request(self, request_id):
+        """Devuelve el id_personal al que se refiere una solicitud, o None si no existe."""
+        conn = get_db_read()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_personal FROM solicitudes_modificacion WHERE id_solicitud = ?", request_id)
+        fila = cursor.fetchone()
+        return fila.id_personal if fila else None
+
+    # Estados que guarda sp_gestionar_solicitud_modificacion para cada acción.
+    _ESTADOS_DECISION = {'aprobar': 'aprobada', 'rechazar': 'rechazada'}
+
+    def process_requests_bulk(self, decisiones, id_revisor, observaciones=None):
+        """
+        Aplica varias decisiones [(id_solicitud, 'aprobar'|'rechazar'), ...] en una sola
+        transacción, con el mismo efecto que sp_gestionar_solicitud_modificacion por cada una:
+        marca la solicitud y, si se aprueba, copia el valor nuevo al campo del personal.
+
+        Las solicitudes se leen y bloquean con una sola consulta y se actualizan con sentencias
+        por lote (executemany). Devuelve {id_solicitud: {'estado': 'aprobada'|'rechazada'|'error',
+        'id_personal', 'motivo'}}; una solicitud inexistente, ya procesada o que no se puede
+        aplicar queda como 'error' sin afectar a las demás.
+        """
+        resultados = {}
+        if not decisiones:
+            return resultados
+        conn = get_db_write()
+        cursor = conn.cursor()
+        autocommit_previo = conn.autocommit
+        conn.autocommit = False
+        try:
+            pendientes = self._bloquear_pendientes(cursor, decisiones)
+            cursor.execute("SELECT name FROM sys.columns WHERE object_id = OBJECT_ID('dbo.personal')")
+            # Las columnas que no se pueden modificar por solicitud (la clave) se excluyen.
+            columnas = {fila.name for fila in cursor.fetchall()} - {'id_personal'}
+
+            aplicables = []
+            for id_solicitud, accion in decisiones:
+                fila = pendientes.get(id_solicitud)
+                if fila is None:
+                    resultados[id_solicitud] = {'estado': 'error', 'id_personal': None, 'motivo': 'Solicitud no encontrada o ya procesada.'}
+                elif accion == 'aprobar' and fila.campo_modificado not in columnas:
+                    resultados[id_solicitud] = {'estado': 'error', 'id_personal': fila.id_personal, 'motivo': f"Campo no válido: {fila.campo_modificado}"}
+                else:
+                    aplicables.append((fila, accion))
+
+            try:
+                self._aplicar_decisiones(cursor, aplicables, id_revisor, observaciones)
+            except pyodbc.Error:
+                # Algún valor no se pudo aplicar (ej. conversión de tipo): se deshace el lote y se
+                # repite una por una con puntos de guardado para identificar cuáles fallan.
+                conn.rollback()
+                return self._process_requests_one_by_one(decisiones, id_revisor, observaciones, resultados)
+
+            conn.commit()
+            for fila, accion in aplicables:
+                resultados[fila.id_solicitud] = {'estado': self._ESTADOS_DECISION[accion], 'id_personal': fila.id_personal, 'motivo': None}
+            return resultados
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = autocommit_previo
+
+    def _bloquear_pendientes(self, cursor, decisiones):
+        # Lee y bloquea (hasta el fin de la transacción) las solicitudes aún pendientes del lote.
+        cursor.execute("""
+            SELECT id_solicitud, id_personal, campo_modificado, valor_nuevo
+            FROM solicitudes_modificacion WITH (UPDLOCK, ROWLOCK)
+            WHERE estado = 'pendiente'
+              AND id_solicitud IN (SELECT TRY_CAST(value AS INT) FROM STRING_SPLIT(?, ','))
+        """, ','.join(str(int(id_solicitud)) for id_solicitud, _ in decisiones))
+        return {fila.id_solicitud: fila for fila in cursor.fetchall()}
+
+    def _aplicar_decisiones(self, cursor, aplicables, id_revisor, observaciones):
+        cursor.fast_executemany = True
+        if not aplicables:
+            return
+        cursor.executemany(
+            "UPDATE solicitudes_modificacion SET estado = ?, observaciones = ?, id_usuario_revisor = ?, fecha_revision = GETDATE() "
+            "WHERE id_solicitud = ? AND estado = 'pendiente'",
+            [(self._ESTADOS_DECISION[accion], observaciones, id_revisor, fila.id_solicitud) for fila, accion in aplicables]
+        )
+        # Un UPDATE por lote para cada campo; en orden de id, así la solicitud más reciente prevalece.
+        por_campo = {}
+        for fila, accion in sorted(aplicables, key=lambda par: par[0].id_solicitud):
+            if accion == 'aprobar':
+                por_campo.setdefault(fila.campo_modificado, []).append((fila.valor_nuevo, fila.id_personal))
+        for campo, valores in por_campo.items():
+            # El nombre del campo ya se validó contra sys.columns; se escapa como identificador igual que QUOTENAME.
+            cursor.executemany(f"UPDATE personal SET [{campo.replace(']', ']]')}] = ? WHERE id_personal = ?", valores)
+
+    def _process_requests_one_by_one(self, decisiones, id_revisor, observaciones, resultados):
+        conn = get_db_write()
+        cursor = conn.cursor()
+        autocommit_previo = conn.autocommit
+        conn.autocommit = False
+        try:
+            pendientes = self._bloquear_pendientes(cursor, decisiones)
+            aplicadas = []
+            for id_solicitud, accion in decisiones:
+                fila = pendientes.get(id_solicitud)
+                if fila is None or id_solicitud in resultados:
+                    continue
+                cursor.execute("SAVE TRANSACTION decision")
+                try:
+                    self._aplicar_decisiones(cursor, [(fila, accion)], id_revisor, observaciones)
+                except pyodbc.Error as e:
+                    cursor.execute("SELECT XACT_STATE()")
+                    if cursor.fetchone()[0] == -1:
+                        # La transacción quedó inutilizable: no se puede aislar el error.
+                        raise
+                    cursor.execute("ROLLBACK TRANSACTION decision")
+                    resultados[id_solicitud] = {'estado': 'error', 'id_personal': fila.id_personal, 'motivo': str(e)}
+                    continue
+                aplicadas.append((fila, accion))
+            conn.commit()
+            for fila, accion in aplicadas:
+                resultados[fila.id_solicitud] = {'estado': self._ESTADOS_DECISION[accion], 'id_personal': fila.id_personal, 'motivo': None}
+            return resultados
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = autocommit_previo
@@ -3,6 +3,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
 from flask_login import login_user, logout_user, current_user
 from app.application.forms import LoginForm, TwoFactorForm
+from app.core.password_pool import PasswordPoolBusyError
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,6 +14,13 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        # Límite por IP y por usuario antes de calcular ningún hash.
+        permitido, espera = current_app.config['LOGIN_RATE_LIMITER'].check(request.remote_addr, form.username.data)
+        if not permitido:
+            segundos = int(espera) + 1 if espera else 60
+            current_app.logger.warning(f"Intento de login limitado para '{form.username.data}' desde {request.remote_addr}.")
+            flash(f'Demasiados intentos de inicio de sesión. Intente de nuevo en {segundos} segundos.', 'warning')
+            return render_template('auth/login.html', form=form), 429, {'Retry-After': str(segundos)}
         try:
             usuario_service = current_app.config['USUARIO_SERVICE']
             user_id = usuario_service.attempt_login(form.username.data, form.password.data)
@@ -24,6 +32,10 @@ def login():
             else:
                 flash('Usuario o contraseña incorrectos.', 'danger')
                 return redirect(url_for('auth.login'))
+        except PasswordPoolBusyError:
+            current_app.logger.warning("Cola de verificación de contraseñas llena; se rechazó un intento de login.")
+            flash('El servidor está atendiendo muchos inicios de sesión. Intente de nuevo en unos segundos.', 'warning')
+            return render_template('auth/login.html', form=form), 503, {'Retry-After': '5'}
         except Exception as e:
             current_app.logger.error(f"Error inesperado en login: {e}")
             flash("Ocurrió un error inesperado. Por favor, intente de nuevo.", 'danger')
@@ -38,6 +50,17 @@ def verify_2fa():
 
     form = TwoFactorForm()
     if form.validate_on_submit():
+        # Mismo límite por IP que el login; el cupo por usuario del código es aparte del de la contraseña.
+        permitido, espera = current_app.config['LOGIN_RATE_LIMITER'].check(
+            request.remote_addr, f"2fa:{session.get('2fa_username') or session['2fa_user_id']}"
+        )
+        if not permitido:
+            segundos = int(espera) + 1 if espera else 60
+            current_app.logger.warning(f"Verificación 2FA limitada para el usuario ID {session['2fa_user_id']} desde {request.remote_addr}.")
+            flash(f'Demasiados intentos de verificación. Intente de nuevo en {segundos} segundos.', 'warning')
+            return render_template(
+                'auth/verify_2fa.html', form=form, username=session.get('2fa_username')
+            ), 429, {'Retry-After': str(segundos)}
         user_id = session['2fa_user_id']
         usuario_service = current_app.config['USUARIO_SERVICE']
         user = usuario_service.verify_2fa_code(user_id, form.code.data)
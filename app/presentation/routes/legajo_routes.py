@@ -2,13 +2,13 @@
 # RUTA: app/presentation/routes/legajo_routes.py
 
 import io
+import json
 import mimetypes
 import pyodbc
 from flask import Blueprint, jsonify, render_template, redirect, send_file, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from app.decorators import role_required
 from app.application.forms import PersonalForm, DocumentoForm, FiltroPersonalForm
-from app.domain.models.personal import Personal
 from datetime import datetime
 legajo_bp = Blueprint('legajo', __name__)
 
@@ -49,33 +49,10 @@ def dashboard():
 @role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
 def ver_legajo(personal_id):
     legajo_service = current_app.config['LEGAJO_SERVICE']
-    legajo_completo = legajo_service.get_personal_details(personal_id)
-    
-    # ===============================================================
-    # INICIO DE LA CORRECCIÓN: MANEJO DEL TIPO DE DATO INCORRECTO
-    # ===============================================================
-    # Esta sección verifica si recibimos un objeto 'Personal' en lugar del
-    # diccionario esperado. Si es así, lo transforma para evitar el crash.
-    if isinstance(legajo_completo, Personal):
-        # Advertencia: Esto soluciona el error, pero la página podría mostrar
-        # datos incompletos (sin documentos, contratos, etc.) porque la
-        # capa de servicio no los proporcionó.
-        legajo_data = vars(legajo_completo) # Convierte el objeto a un diccionario
-        legajo_completo = {
-            'personal': legajo_data,
-            'documentos': [],
-            'contratos': [],
-            'estudios': [],
-            'capacitaciones': [],
-            'historial_laboral': [],
-            'licencias': []
-        }
-    # ===============================================================
-    # FIN DE LA CORRECCIÓN
-    # ===============================================================
-
-    # Esta línea ahora funcionará correctamente con ambas estructuras de datos
-    if not legajo_completo or not legajo_completo.get('personal'):
+    # Solo se obtiene la cabecera (datos personales y conteos); cada sección se carga al desplegarla.
+    legajo = legajo_service.get_personal_header(personal_id)
+
+    if not legajo:
         flash('El legajo solicitado no existe.', 'danger')
         return redirect(url_for('legajo.listar_personal'))
         
@@ -91,11 +68,79 @@ def ver_legajo(personal_id):
     
     return render_template(
         'admin/ver_legajo_completo.html', 
-        legajo=legajo_completo, 
-        form_documento=form_documento,
-        legajo_service=legajo_service,
+        legajo=legajo, 
+        secciones=secciones,
+        form_documento=form_documento
+    )
+
+@legajo_bp.route('/personal/<int:personal_id>/seccion/<int:id_seccion>')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
+def seccion_documentos(personal_id, id_seccion):
+    """
+    Devuelve el fragmento HTML con los documentos de una sección del legajo.
+    Responde con ETag para que el navegador no vuelva a descargar una sección sin cambios.
+    """
+    legajo_service = current_app.config['LEGAJO_SERVICE']
+    documentos = legajo_service.get_documents_by_seccion(personal_id, id_seccion)
+    html = render_template(
+        'components/_seccion_documentos.html',
+        documentos=documentos,
+        puede_eliminar=current_user.rol == 'AdministradorLegajos',
         today=datetime.now().date()
     )
+    response = current_app.make_response(html)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@legajo_bp.route('/personal/<int:personal_id>/dossier', methods=['POST'])
+@login_required
+@role_required('AdministradorLegajos', 'RRHH')
+def generar_dossier(personal_id):
+    """Encola la generación del PDF consolidado del legajo y devuelve el estado del trabajo."""
+    dossier_service = current_app.config['DOSSIER_SERVICE']
+    try:
+        trabajo = dossier_service.request_dossier(personal_id, current_user.id)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 404
+    except Exception as e:
+        current_app.logger.error(f"Error al solicitar el dossier del legajo {personal_id}: {e}")
+        return jsonify({"error": "No se pudo iniciar la generación del dossier"}), 500
+    return jsonify(_estado_dossier(trabajo)), 202
+
+@legajo_bp.route('/dossier/<string:job_id>')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH')
+def estado_dossier(job_id):
+    """Devuelve el estado de un trabajo de generación de dossier (para sondeo desde la vista)."""
+    trabajo = current_app.config['DOSSIER_SERVICE'].get_job(job_id)
+    if not trabajo:
+        return jsonify({"error": "El trabajo no existe o ya expiró"}), 404
+    return jsonify(_estado_dossier(trabajo))
+
+@legajo_bp.route('/dossier/<string:job_id>/descargar')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH')
+def descargar_dossier(job_id):
+    """Descarga el dossier PDF de un trabajo completado."""
+    trabajo = current_app.config['DOSSIER_SERVICE'].get_job(job_id)
+    if not trabajo or trabajo['estado'] != 'completado':
+        flash('El dossier solicitado no está disponible. Vuelva a generarlo.', 'warning')
+        return redirect(request.referrer or url_for('legajo.listar_personal'))
+    return send_file(
+        trabajo['ruta'],
+        as_attachment=True,
+        download_name=trabajo['nombre_descarga'],
+        mimetype='application/pdf'
+    )
+
+def _estado_dossier(trabajo):
+    # Expone el estado del trabajo sin la ruta interna del archivo.
+    estado = {clave: trabajo[clave] for clave in ('id', 'estado', 'progreso', 'total_documentos', 'paginas', 'desde_cache', 'error')}
+    if trabajo['estado'] == 'completado':
+        estado['url_descarga'] = url_for('legajo.descargar_dossier', job_id=trabajo['id'])
+    return estado
 
 @legajo_bp.route('/personal')
 @login_required
@@ -109,7 +154,9 @@ def listar_personal():
     pagination = legajo_service.get_all_personal_paginated(page, 15, filters)
     
     # Nueva lógica para obtener el estado de los documentos
-    document_status = legajo_service.check_document_status_for_all_personal()
+    document_status = legajo_service.check_document_status_for_all_personal(
+        personal_ids=[persona['id_personal'] for persona in pagination.items]
+    )
     
     return render_template('admin/listar_personal.html', 
                            form=form, 
@@ -204,12 +251,13 @@ def eliminar_personal(personal_id):
 def editar_personal(personal_id):
     legajo_service = current_app.config['LEGAJO_SERVICE']
     
-    legajo_data = legajo_service.get_personal_details(personal_id)
-    if not legajo_data or not legajo_data.get('personal'):
+    # Solo se necesitan los datos personales: no se carga el legajo completo.
+    cabecera = legajo_service.get_personal_header(personal_id)
+    if not cabecera or not cabecera.get('personal'):
         flash('El legajo que intenta editar no existe.', 'danger')
         return redirect(url_for('legajo.listar_personal'))
 
-    persona_data = legajo_data['personal']
+    persona_data = cabecera['personal']
     
     form = PersonalForm(data=persona_data)
     form.id_unidad.choices = [('0', '-- Seleccione Unidad --')] + legajo_service.get_unidades_for_select()
@@ -219,7 +267,7 @@ def editar_personal(personal_id):
 
     if form.validate_on_submit():
         try:
-            # legajo_service.update_personal_details(personal_id, form.data, current_user.id)
+            legajo_service.update_personal_details(personal_id, form.data, current_user.id)
             flash('Legajo actualizado exitosamente.', 'success')
             return redirect(url_for('legajo.ver_legajo', personal_id=personal_id))
         except Exception as e:
@@ -265,9 +313,7 @@ def eliminar_documento(documento_id):
     """
     Gestiona la solicitud de eliminación (lógica) de un documento.
     """
-    # --- INICIO DEL CÓDIGO DE SEGUIMIENTO ---
-    print(f"DEBUG: Iniciando eliminación para el documento ID: {documento_id}")
-    # --- FIN DEL CÓDIGO DE SEGUIMIENTO ---
+    current_app.logger.debug("Iniciando eliminación del documento %s", documento_id)
     
     legajo_service = current_app.config['LEGAJO_SERVICE']
     try:
@@ -279,7 +325,6 @@ def eliminar_documento(documento_id):
         current_app.logger.error(f"Error al eliminar documento {documento_id}: {e}")
     
     # Redirige al usuario a la página anterior
-    print("DEBUG: Redirigiendo al usuario.")
     return redirect(request.referrer or url_for('main_dashboard'))
 
 
@@ -339,6 +384,73 @@ def check_dni(dni):
     return jsonify({'exists': exists})
 
 
+@legajo_bp.route('/api/personal')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
+def api_listar_personal():
+    """
+    API JSON del listado de personal para tablas virtualizadas.
+    Parámetros: page, per_page (máx. 500), fields=dni,nombres,...; sort=apellidos o -apellidos;
+    filtros id_unidad, activo (1/0), sexo (M/F), vencimiento (vencido/por_vencer/al_dia), dni, nombres.
+    La respuesta es columnar: 'fields' con los nombres y 'rows' con una lista de valores por fila.
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 100, type=int), 1), 500)
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    sort = request.args.get('sort', 'apellidos')
+    activo = request.args.get('activo')
+    filters = {
+        'id_unidad': request.args.get('id_unidad', type=int),
+        'activo': None if activo in (None, '') else activo.lower() in ('1', 'true', 'si'),
+        'sexo': (request.args.get('sexo') or '').upper() or None,
+        'vencimiento': request.args.get('vencimiento') or None,
+        'dni': request.args.get('dni') or None,
+        'nombres': request.args.get('nombres') or None,
+    }
+    try:
+        legajo_service = current_app.config['LEGAJO_SERVICE']
+        columnas, pagination = legajo_service.get_all_personal_projected(
+            page, per_page, filters, fields, sort_by=sort.lstrip('-'), sort_desc=sort.startswith('-')
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error en API de listado de personal: {e}")
+        return jsonify({"error": "No se pudo obtener el listado"}), 500
+
+    payload = {
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'fields': columnas,
+        'rows': pagination.items,
+    }
+    # Serialización compacta (sin espacios); las fechas se envían en formato ISO.
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=lambda v: v.isoformat() if hasattr(v, 'isoformat') else str(v))
+    return current_app.response_class(body, mimetype='application/json')
+
+
+@legajo_bp.route('/api/personal/buscar')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
+def api_buscar_personal():
+    """
+    API endpoint de autocompletado: busca personal por nombre, apellidos o DNI
+    (sin distinguir tildes y tolerando errores de tipeo).
+    """
+    texto = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int) or 10, 50))
+    if len(texto) < 2:
+        return jsonify([])
+    try:
+        legajo_service = current_app.config['LEGAJO_SERVICE']
+        return jsonify(legajo_service.search_personal(texto, limit=limit))
+    except Exception as e:
+        current_app.logger.error(f"Error en API de búsqueda de personal: {e}")
+        return jsonify({"error": "No se pudo realizar la búsqueda"}), 500
+
+
 @legajo_bp.route('/personal/exportar/general')
 @login_required
 @role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
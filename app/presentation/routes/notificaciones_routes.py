@@ -0,0 +1,29 @@
+# RUTA: app/presentation/routes/notificaciones_routes.py
+
+from flask import Blueprint, Response, current_app, request
+from flask_login import login_required, current_user
+from app.decorators import role_required
+
+# Blueprint de las notificaciones del tablero (la campana de la barra superior).
+notificaciones_bp = Blueprint('notificaciones', __name__)
+
+
+@notificaciones_bp.route('/estado')
+@login_required
+@role_required('AdministradorLegajos', 'RRHH', 'Sistemas')
+def estado():
+    """
+    Totales y primeros elementos de las solicitudes pendientes y los documentos por vencer.
+    El navegador la consulta cada NOTIFY_POLL_SECONDS; se responde con la foto que mantiene el
+    consultor compartido (NotificationBroadcaster), sin tocar la base de datos, y con ETag para
+    que una foto sin cambios se responda con 304.
+    """
+    foto = current_app.config['NOTIFICATION_SERVICE'].snapshot(current_user.rol)
+    if foto is None:
+        reintento = str(current_app.config['NOTIFY_POLL_SECONDS'])
+        return Response("Las notificaciones todavía no están disponibles.", status=503, headers={'Retry-After': reintento})
+    huella, datos = foto
+    response = Response(datos, mimetype='application/json')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(huella)
+    return response.make_conditional(request)
@@ -25,7 +25,6 @@ def inicio_rrhh():
 # Acontinución se tiene la funcionalidad de listar y ver legajos, solo lectura para RRHH
 
 from flask import render_template, request, current_app, flash, redirect, url_for
-from datetime import datetime
 from app.application.forms import FiltroPersonalForm, DocumentoForm
 
 @rrhh_bp.route('/personal')
@@ -41,7 +40,9 @@ def listar_personal():
 
     legajo_service = current_app.config['LEGAJO_SERVICE']
     pagination = legajo_service.get_all_personal_paginated(page, 15, filters)
-    document_status = legajo_service.check_document_status_for_all_personal()
+    document_status = legajo_service.check_document_status_for_all_personal(
+        personal_ids=[persona['id_personal'] for persona in pagination.items]
+    )
 
     return render_template(
         'rrhh/listar_personal.html',
@@ -58,9 +59,10 @@ def ver_legajo(personal_id):
     Vista de detalle de legajo para RRHH.
     """
     legajo_service = current_app.config['LEGAJO_SERVICE']
-    legajo_completo = legajo_service.get_personal_details(personal_id)
+    # Solo la cabecera; las secciones se cargan bajo demanda desde legajo.seccion_documentos.
+    legajo = legajo_service.get_personal_header(personal_id)
 
-    if not legajo_completo or not legajo_completo.get('personal'):
+    if not legajo:
         flash('El legajo solicitado no existe.', 'danger')
         return redirect(url_for('rrhh.listar_personal'))
 
@@ -71,10 +73,9 @@ def ver_legajo(personal_id):
 
     return render_template(
         'rrhh/ver_legajo_completo.html',
-        legajo=legajo_completo,
-        form_documento=form_documento,
-        legajo_service=legajo_service,
-        today=datetime.now().date()
+        legajo=legajo,
+        secciones=secciones,
+        form_documento=form_documento
     )
 
 # Acontinuación se tiene  la funcionalidad de descargar la lista de personal en formato Excel, simula el REPORTE
@@ -107,12 +108,11 @@ def panel_rrhh():
     legajo_service = current_app.config['LEGAJO_SERVICE']
     empleados_unidad = legajo_service.get_empleados_por_unidad()
 
-    # DEBUG temporal para consola
-    print("DEBUG empleados_unidad:", empleados_unidad)
+    current_app.logger.debug("Panel RRHH: %d unidades", len(empleados_unidad))
 
     # Acontinuación se tiene: Distribución de empleados activos vs inactivos
     empleados_estado = legajo_service.get_empleados_activos_inactivos()
-    print("DEBUG empleados_estado:", empleados_estado)
+    current_app.logger.debug("Panel RRHH, activos/inactivos: %s", empleados_estado)
 
     # Acontinuación se tiene: Distribución de empleados segun genero
     empleados_sexo = legajo_service.get_empleados_por_sexo()
@@ -1,16 +1,14 @@
 # RUTA: app/presentation/routes/sistemas_routes.py
 
-from flask import Blueprint, render_template, request, current_app, flash, redirect, url_for, send_file
+from flask import Blueprint, render_template, request, current_app, flash, redirect, url_for, send_file, jsonify
 from flask_login import login_required, current_user
 from app.decorators import role_required # Asumimos que este decorador verifica el rol
 from app.application.forms import UserManagementForm # Asumimos un formulario para la gestión de usuarios
+from app.application.services.backup_service import BackupInProgressError
+from app.core.logging_config import logging_metrics
 import io
 from datetime import datetime
 
-# --- IMPORTACIÓN ADICIONAL PARA LA NUEVA FUNCIONALIDAD ---
-# Importamos el repositorio que puede hablar con la base de datos para los errores
-from app.infrastructure.persistence.sqlserver_repository import SqlServerBackupRepository
-
 # Blueprint para las funcionalidades exclusivas del rol de Sistemas.
 sistemas_bp = Blueprint('sistemas', __name__) 
 
@@ -35,12 +33,42 @@ def dashboard():
 def auditoria():
     """
     Vista de Auditoría: Muestra la tabla de logs (el 'puro texto').
+    Admite filtros por usuario, módulo, acción y rango de fechas, y pagina por cursor
+    (parámetros 'despues' y 'antes') para que cualquier página cargue igual de rápido.
     """
-    page = request.args.get('page', 1, type=int)
+    filtros = {
+        'username': request.args.get('usuario', '').strip(),
+        'modulo': request.args.get('modulo', '').strip(),
+        'accion': request.args.get('accion', '').strip().upper(),
+        'desde': _fecha_filtro(request.args.get('desde')),
+        'hasta': _fecha_filtro(request.args.get('hasta')),
+    }
+    cursor, direccion = request.args.get('despues'), 'next'
+    if request.args.get('antes'):
+        cursor, direccion = request.args.get('antes'), 'prev'
+
     audit_service = current_app.config['AUDIT_SERVICE']
-    pagination = audit_service.get_logs(page, 20)
-    audit_service.log(current_user.id, 'Auditoria', 'CONSULTA', f'El usuario consultó la página {page} de la bitácora.')
-    return render_template('sistemas/auditoria.html', pagination=pagination)
+    pagination = audit_service.get_logs_filtered(filtros, 20, cursor, direccion)
+    aplicados = {k: v for k, v in filtros.items() if v}
+    audit_service.log(
+        current_user.id, 'Auditoria', 'CONSULTA',
+        f'El usuario consultó la bitácora{" con filtros " + str(aplicados) if aplicados else ""}.'
+    )
+    # Filtros tal como vinieron, para mantenerlos en el formulario y en los enlaces de paginación.
+    filtros_url = {k: request.args.get(k) for k in ('usuario', 'modulo', 'accion', 'desde', 'hasta') if request.args.get(k)}
+    archivo = audit_service.get_archive_stats()
+    archivado_hasta = datetime.fromisoformat(archivo['hasta']).strftime('%d/%m/%Y') if archivo and archivo['hasta'] else None
+    return render_template(
+        'sistemas/auditoria.html', pagination=pagination, filtros=filtros_url, ultima_limpieza=archivado_hasta
+    )
+
+
+def _fecha_filtro(valor):
+    """Convierte 'AAAA-MM-DD' en fecha; un valor vacío o inválido se ignora."""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
 
 
 # ------------------------------------------------------------------------
@@ -79,8 +107,6 @@ def crear_usuario():
 @login_required
 @role_required('Sistemas')
 def editar_usuario(user_id):
-    print("--- DEBUG: INTENTANDO ACCEDER A LA FUNCIÓN EDITAR_USUARIO ---")
-    import traceback
     try:
         usuario_service = current_app.config['USUARIO_SERVICE']
         user = usuario_service.get_user_by_id(user_id)
@@ -103,13 +129,9 @@ def editar_usuario(user_id):
         return render_template('sistemas/editar_usuario.html', form=form, user=user)
 
     except Exception as e:
-        # Bloque de depuración para forzar la visibilidad del error
-        error_trace = traceback.format_exc()
-        current_app.logger.error(f"ERROR CRÍTICO EN EDITAR_USUARIO: {e}\n{error_trace}")
-        print(f"!!!!!!!!!!!!!! ERROR DETECTADO EN EDITAR_USUARIO !!!!!!!!!!!!!!")
-        print(error_trace)
-        print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-        flash(f"Ocurrió un error grave al cargar la página de edición. Revise la terminal.", 'danger')
+        # El traceback se escribe en el log con el id de la petición.
+        current_app.logger.exception("Error crítico en editar_usuario (id %s): %s", user_id, e)
+        flash("Ocurrió un error grave al cargar la página de edición. Revise el registro de la aplicación.", 'danger')
         return redirect(url_for('sistemas.gestionar_usuarios'))
 
 
@@ -135,13 +157,20 @@ def reset_password(user_id):
 @login_required
 @role_required('Sistemas')
 def gestion_backups():
+    trabajo = None
+    tendencia = None
     try:
         backup_service = current_app.config['BACKUP_SERVICE']
         historial_data = backup_service.get_backup_history() 
+        trabajo = backup_service.get_current_job()
+        tendencia = backup_service.get_backup_trends()
     except Exception as e:
         current_app.logger.error(f"Error al cargar historial de backups: {e}")
         historial_data = []
-    return render_template('sistemas/gestion_backups.html', historial=historial_data) 
+    return render_template(
+        'sistemas/gestion_backups.html', historial=historial_data,
+        trabajo=_estado_backup(trabajo) if trabajo else None, tendencia=tendencia
+    )
 
 @sistemas_bp.route('/mantenimiento/run_backup', methods=['POST'])
 @login_required
@@ -150,64 +179,95 @@ def run_backup():
     try:
         if 'BACKUP_SERVICE' not in current_app.config:
             raise Exception("El servicio de backup no está inicializado.")
-        current_app.config['BACKUP_SERVICE'].execute_full_backup()
-        flash('Copia de seguridad iniciada y completada con éxito.', 'success')
+        current_app.config['BACKUP_SERVICE'].start_backup(current_user.id, request.form.get('tipo', 'FULL'))
+        flash('Copia de seguridad iniciada. El avance se muestra en esta página.', 'info')
+    except BackupInProgressError as e:
+        flash(str(e), 'warning')
     except Exception as e:
         current_app.logger.error(f"Error al ejecutar backup manual: {e}")
         flash(f'Error al ejecutar la copia de seguridad. Detalle: {e}', 'danger')
     return redirect(url_for('sistemas.gestion_backups'))
 
+@sistemas_bp.route('/mantenimiento/backups/<string:job_id>')
+@login_required
+@role_required('Sistemas')
+def estado_backup(job_id):
+    """Devuelve el estado de un trabajo de backup (para sondeo desde la vista)."""
+    trabajo = current_app.config['BACKUP_SERVICE'].get_job(job_id)
+    if not trabajo:
+        return jsonify({"error": "El trabajo no existe o ya expiró"}), 404
+    return jsonify(_estado_backup(trabajo))
+
+@sistemas_bp.route('/mantenimiento/backups/<string:job_id>/cancelar', methods=['POST'])
+@login_required
+@role_required('Sistemas')
+def cancelar_backup(job_id):
+    if current_app.config['BACKUP_SERVICE'].cancel_job(job_id):
+        flash('Se solicitó la cancelación de la copia de seguridad.', 'info')
+    else:
+        flash('La copia de seguridad ya había terminado.', 'warning')
+    return redirect(url_for('sistemas.gestion_backups'))
+
+def _estado_backup(trabajo):
+    # Expone el estado del trabajo con las fechas formateadas y sin datos internos.
+    estado = {clave: trabajo[clave] for clave in ('id', 'tipo', 'archivos', 'estado', 'progreso', 'error')}
+    estado['salida'] = trabajo['salida'][-10:]
+    for clave in ('iniciado', 'terminado'):
+        estado[clave] = datetime.fromtimestamp(trabajo[clave]).strftime('%Y-%m-%d %H:%M:%S') if trabajo[clave] else None
+    return estado
+
 
 @sistemas_bp.route('/mantenimiento/estado_servidor')
 @login_required
 @role_required('Sistemas')
 def estado_servidor():
-    return render_template('sistemas/estado_servidor.html')
-
-# --- MODIFICACIÓN: RUTA DE ERRORES CON LÓGICA REAL ---
+    # Métricas internas del proceso agrupadas por componente.
+    metricas = {
+        'Cola de correos': current_app.config['EMAIL_SERVICE'].get_delivery_metrics() or {},
+        'Verificación de contraseñas': current_app.config['PASSWORD_POOL'].metrics(),
+        'Límite de intentos de login': current_app.config['LOGIN_RATE_LIMITER'].metrics(),
+        'Captura de errores': current_app.config['ERROR_CAPTURE_SERVICE'].metrics(),
+        'Registro de la aplicación': logging_metrics(),
+        'Escritura de bitácora': current_app.config['AUDIT_SERVICE'].get_writer_metrics() or {},
+        'Notificaciones del tablero': current_app.config['NOTIFICATION_SERVICE'].metrics(),
+    }
+    return render_template('sistemas/estado_servidor.html', metricas=metricas)
+
+# --- REGISTRO DE ERRORES AGRUPADOS POR HUELLA ---
 @sistemas_bp.route('/errores')
 @login_required
 @role_required('Sistemas')
 def errores():
     """
-    Vista para ver el registro de errores. Ahora obtiene los datos reales de la BD.
+    Vista del registro de errores: un renglón por huella (tipo de excepción + ubicación) con la
+    cantidad de ocurrencias y la primera y última vez, incluidas las aún no volcadas a la bitácora.
     """
+    dias = current_app.config['ERROR_VIEW_DAYS']
     try:
-        # 1. Crea una instancia del repositorio para hablar con la BD
-        repo = SqlServerBackupRepository()
-        # 2. Llama a la función para obtener la lista de errores
-        lista_de_errores = repo.obtener_historial_errores()
-        # 3. Pasa la lista a la plantilla HTML
-        return render_template('sistemas/registro_errores.html', errores=lista_de_errores)
+        grupos = current_app.config['ERROR_CAPTURE_SERVICE'].get_error_groups(dias)
     except Exception as e:
         # Si algo falla al obtener los errores, muestra un mensaje
         current_app.logger.error(f"No se pudo cargar el historial de errores: {e}")
         flash(f"No se pudo cargar el historial de errores: {e}", "danger")
-        return render_template('sistemas/registro_errores.html', errores=[])
+        grupos = []
+    return render_template('sistemas/registro_errores.html', errores=grupos, dias=dias)
 
-# --- NUEVA RUTA PARA GENERAR UN ERROR DE PRUEBA ---
+# --- RUTA PARA GENERAR UN ERROR DE PRUEBA ---
 @sistemas_bp.route('/test-error')
 @login_required
 @role_required('Sistemas')
 def generar_error_prueba():
     """
-    Visita esta URL para forzar un error y que se guarde en la bitácora.
+    Visita esta URL para forzar un error y que se registre en la captura de errores.
     """
-    repo = SqlServerBackupRepository()
     try:
         # Forzamos un error común (división por cero) para probar
         resultado = 1 / 0
     except Exception as e:
-        # Obtenemos el ID del usuario actual para registrar quién causó el error
-        usuario_id = current_user.id if current_user.is_authenticated else None
-        
-        # Usamos la función del repositorio para registrar el error en la base de datos
-        repo.registrar_error(
-            modulo='sistemas.test_error', 
-            descripcion=f"Error de prueba forzado: {str(e)}", 
-            usuario_id=usuario_id
+        current_app.config['ERROR_CAPTURE_SERVICE'].capture(
+            e, modulo='sistemas.test_error', usuario_id=current_user.id, ruta=request.path
         )
-        flash('Se ha generado y registrado un error de prueba en la bitácora.', 'info')
+        flash('Se ha generado un error de prueba; se agrupa con los anteriores del mismo tipo y ubicación.', 'info')
         
     # Redirigimos de vuelta a la página de errores para ver el resultado
     return redirect(url_for('sistemas.errores'))
@@ -250,3 +310,51 @@ def procesar_solicitud(request_id):
         flash('Acción no válida.', 'danger')
     return redirect(url_for('sistemas.solicitudes_pendientes'))
 
+
+@sistemas_bp.route('/solicitudes/procesar-lote', methods=['POST'])
+@login_required
+@role_required('Sistemas')
+def procesar_solicitudes_lote():
+    """
+    Aprueba o rechaza varias solicitudes en una sola transacción. Desde la vista se envían las
+    solicitudes marcadas y una acción común; como JSON se acepta
+    {"decisiones": [{"id": 1, "accion": "aprobar"}, ...], "observaciones": "..."} y se
+    responde con el resultado de cada solicitud.
+    """
+    es_json = request.is_json
+    if es_json:
+        datos = request.get_json(silent=True) or {}
+        decisiones = [(d.get('id'), d.get('accion')) for d in datos.get('decisiones', [])]
+        observaciones = datos.get('observaciones')
+    else:
+        accion = request.form.get('action')
+        decisiones = [(id_solicitud, accion) for id_solicitud in request.form.getlist('solicitud')]
+        observaciones = request.form.get('observaciones') or None
+
+    try:
+        decisiones = [(int(id_solicitud), accion) for id_solicitud, accion in decisiones]
+        resultados = current_app.config['SOLICITUDES_SERVICE'].process_bulk(decisiones, current_user.id, observaciones)
+    except (TypeError, ValueError) as e:
+        if es_json:
+            return jsonify({"error": str(e)}), 400
+        flash(str(e), 'warning')
+        return redirect(url_for('sistemas.solicitudes_pendientes'))
+    except Exception as e:
+        current_app.logger.error(f"Error al procesar solicitudes en lote: {e}")
+        if es_json:
+            return jsonify({"error": "No se pudieron procesar las solicitudes"}), 500
+        flash(f'Error al procesar las solicitudes. No se aplicó ningún cambio. Detalle: {e}', 'danger')
+        return redirect(url_for('sistemas.solicitudes_pendientes'))
+
+    if es_json:
+        return jsonify({"resultados": {str(i): r for i, r in resultados.items()}})
+    procesadas = sum(1 for r in resultados.values() if r['estado'] != 'error')
+    errores = {i: r['motivo'] for i, r in resultados.items() if r['estado'] == 'error'}
+    if procesadas:
+        flash(f'{procesadas} solicitud(es) procesadas con éxito.', 'success')
+    for id_solicitud, motivo in list(errores.items())[:5]:
+        flash(f'Solicitud {id_solicitud}: {motivo}', 'warning')
+    if len(errores) > 5:
+        flash(f'Otras {len(errores) - 5} solicitudes no se pudieron procesar.', 'warning')
+    return redirect(url_for('sistemas.solicitudes_pendientes'))
+
@@ -0,0 +1,112 @@
+# RUTA: app/utils/audit_detail.py
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+# Campos que se guardan en el detalle de la bitácora, por (módulo, acción) o por módulo.
+# Lo que no figura aquí no se registra; los módulos sin entrada guardan todo salvo los excluidos.
+AUDIT_DETAIL_FIELDS = {
+    'Personal': (
+        'dni', 'nombres', 'apellidos', 'sexo', 'fecha_nacimiento', 'telefono', 'email', 'direccion',
+        'estado_civil', 'nacionalidad', 'id_unidad', 'fecha_ingreso', 'activo',
+    ),
+    ('Documentos', 'SUBIR'): (
+        'id_personal', 'id_seccion', 'id_tipo', 'nombre_archivo', 'fecha_emision', 'fecha_vencimiento', 'hash_archivo',
+    ),
+}
+
+# Campos de formulario que nunca se registran (tokens, botones y credenciales).
+CAMPOS_EXCLUIDOS = frozenset({'csrf_token', 'submit', 'password', 'password_hash', 'confirm_password'})
+
+MARCA_TRUNCADO = '…[+{} caracteres]'
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (set, frozenset, tuple)):
+        return list(valor)
+    return str(valor)
+
+
+# Un único codificador compacto (sin espacios y sin escapar acentos) reutilizado en todas las llamadas;
+# json.dumps con opciones no predeterminadas crea un codificador nuevo cada vez.
+_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_serializar)
+
+
+def compact_dumps(valor):
+    return _ENCODER.encode(valor)
+
+
+def campos_permitidos(modulo, accion):
+    """Devuelve la tupla de campos permitidos para el evento, o None si no hay esquema."""
+    return AUDIT_DETAIL_FIELDS.get((modulo, accion), AUDIT_DETAIL_FIELDS.get(modulo))
+
+
+def _filtrar(detalle, permitidos):
+    if permitidos is None:
+        return {k: v for k, v in detalle.items() if k not in CAMPOS_EXCLUIDOS}
+    return {k: detalle[k] for k in permitidos if k in detalle}
+
+
+def _normalizar(valor):
+    # Los formularios entregan texto y la BD tipos nativos: se comparan en una forma común.
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip()
+
+
+def _recortar(valor, max_chars):
+    if isinstance(valor, str) and len(valor) > max_chars:
+        return valor[:max_chars] + MARCA_TRUNCADO.format(len(valor) - max_chars)
+    return valor
+
+
+def build_detail(modulo, accion, detalle, anterior=None, max_bytes=4000, max_value_chars=500):
+    """
+    Arma el JSON del detalle de un evento: aplica la lista de campos del módulo, recorta los
+    textos largos y, si se indica `anterior`, guarda solo los campos que cambiaron como
+    {'cambios': {campo: [antes, después]}}. Si aun así supera `max_bytes`, se descartan los
+    campos más largos y se listan en '_truncado'. Devuelve None si no queda nada que guardar.
+    """
+    if not detalle:
+        return None
+    permitidos = campos_permitidos(modulo, accion)
+    datos = _filtrar(detalle, permitidos)
+
+    if anterior is not None:
+        previos = _filtrar(anterior, permitidos)
+        cambios = {}
+        for campo, nuevo in datos.items():
+            viejo = previos.get(campo)
+            if _normalizar(viejo) != _normalizar(nuevo):
+                cambios[campo] = [_recortar(viejo, max_value_chars), _recortar(nuevo, max_value_chars)]
+        if not cambios:
+            return None
+        datos = {'cambios': cambios}
+    else:
+        datos = {k: _recortar(v, max_value_chars) for k, v in datos.items() if v is not None and v != ''}
+        if not datos:
+            return None
+
+    resultado = compact_dumps(datos)
+    if len(resultado.encode('utf-8')) <= max_bytes:
+        return resultado
+
+    # Se quitan los campos de mayor tamaño hasta entrar en el límite.
+    contenedor = datos['cambios'] if anterior is not None else datos
+    quitados = []
+    for campo in sorted(contenedor, key=lambda c: len(compact_dumps(contenedor[c])), reverse=True):
+        del contenedor[campo]
+        quitados.append(campo)
+        resultado = compact_dumps(dict(datos, _truncado=quitados))
+        if len(resultado.encode('utf-8')) <= max_bytes:
+            break
+    return resultado
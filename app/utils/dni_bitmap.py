@@ -0,0 +1,62 @@
+# RUTA: app/utils/dni_bitmap.py
+
+import threading
+
+
+class DniBitmap:
+    """
+    Conjunto compacto de DNIs de 8 dígitos: un bit por cada número posible
+    (10^8 bits = 12.5 MB por proceso). Responde a la pertenencia en tiempo constante.
+    """
+
+    CAPACIDAD = 10 ** 8
+
+    def __init__(self):
+        self._bits = None
+        self._lock = threading.Lock()
+        self.cargado_en = None
+
+    @property
+    def is_loaded(self):
+        return self._bits is not None
+
+    @staticmethod
+    def posicion(dni):
+        """Convierte un DNI en su posición dentro del mapa de bits, o None si no es válido."""
+        dni = str(dni or '').strip()
+        if len(dni) != 8 or not dni.isdigit():
+            return None
+        return int(dni)
+
+    def build(self, dnis, cargado_en=None):
+        """Construye el mapa de bits completo y lo reemplaza de forma atómica."""
+        bits = bytearray(self.CAPACIDAD // 8)
+        for dni in dnis:
+            posicion = self.posicion(dni)
+            if posicion is not None:
+                bits[posicion >> 3] |= 1 << (posicion & 7)
+        with self._lock:
+            self._bits = bits
+            self.cargado_en = cargado_en
+
+    def add(self, dni):
+        posicion = self.posicion(dni)
+        if posicion is None or self._bits is None:
+            return
+        with self._lock:
+            self._bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def discard(self, dni):
+        posicion = self.posicion(dni)
+        if posicion is None or self._bits is None:
+            return
+        with self._lock:
+            self._bits[posicion >> 3] &= ~(1 << (posicion & 7)) & 0xFF
+
+    def contains(self, dni):
+        """Devuelve True/False, o None si el mapa no está cargado o el DNI no es válido."""
+        posicion = self.posicion(dni)
+        bits = self._bits
+        if posicion is None or bits is None:
+            return None
+        return bool(bits[posicion >> 3] & (1 << (posicion & 7)))
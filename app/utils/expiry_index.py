@@ -0,0 +1,151 @@
+# RUTA: app/utils/expiry_index.py
+
+import bisect
+import threading
+from datetime import date, datetime
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    return valor
+
+
+class ExpiryIndex:
+    """
+    Índice en memoria de los documentos con fecha de vencimiento.
+
+    Mantiene una lista global ordenada de (fecha_vencimiento, id_documento) y, por empleado,
+    una lista ordenada de sus fechas de vencimiento. Como las fechas son absolutas, "vencidos"
+    y "por vencer en N días" se resuelven con búsquedas binarias respecto de la fecha de hoy
+    sin recalcular nada: al cambiar el día, los mismos datos responden para la nueva fecha.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._fechas = []
+        self._documentos = {}
+        self._por_personal = {}
+        # Momento (time.monotonic) de la última construcción; el servicio lo usa para recargar.
+        self.cargado_en = None
+
+    def __len__(self):
+        return len(self._documentos)
+
+    # --- CONSTRUCCIÓN Y MANTENIMIENTO ---
+
+    def build(self, documentos, cargado_en=None):
+        """Reconstruye el índice a partir de filas con id_documento, id_personal y fecha_vencimiento."""
+        fechas = []
+        registros = {}
+        por_personal = {}
+        for doc in documentos:
+            vencimiento = _como_fecha(doc.get('fecha_vencimiento'))
+            if vencimiento is None:
+                continue
+            id_documento = doc['id_documento']
+            id_personal = doc['id_personal']
+            registros[id_documento] = (vencimiento, id_personal)
+            fechas.append((vencimiento, id_documento))
+            por_personal.setdefault(id_personal, []).append(vencimiento)
+        fechas.sort()
+        for lista in por_personal.values():
+            lista.sort()
+        with self._lock:
+            self._fechas = fechas
+            self._documentos = registros
+            self._por_personal = por_personal
+            self.cargado_en = cargado_en
+
+    def add(self, id_documento, id_personal, fecha_vencimiento):
+        """Agrega (o reemplaza) un documento; se ignora si no tiene fecha de vencimiento."""
+        vencimiento = _como_fecha(fecha_vencimiento)
+        with self._lock:
+            self._quitar(id_documento)
+            if vencimiento is None:
+                return
+            self._documentos[id_documento] = (vencimiento, id_personal)
+            bisect.insort(self._fechas, (vencimiento, id_documento))
+            bisect.insort(self._por_personal.setdefault(id_personal, []), vencimiento)
+
+    def remove(self, id_documento):
+        with self._lock:
+            self._quitar(id_documento)
+
+    def remove_personal(self, id_personal):
+        """Quita todos los documentos de un empleado (ej. al desactivarlo)."""
+        with self._lock:
+            for id_documento in [i for i, (_, p) in self._documentos.items() if p == id_personal]:
+                self._quitar(id_documento)
+
+    def _quitar(self, id_documento):
+        registro = self._documentos.pop(id_documento, None)
+        if registro is None:
+            return
+        vencimiento, id_personal = registro
+        posicion = bisect.bisect_left(self._fechas, (vencimiento, id_documento))
+        if posicion < len(self._fechas) and self._fechas[posicion] == (vencimiento, id_documento):
+            del self._fechas[posicion]
+        fechas_personal = self._por_personal.get(id_personal)
+        if fechas_personal:
+            posicion = bisect.bisect_left(fechas_personal, vencimiento)
+            if posicion < len(fechas_personal) and fechas_personal[posicion] == vencimiento:
+                del fechas_personal[posicion]
+            if not fechas_personal:
+                del self._por_personal[id_personal]
+
+    # --- CONSULTAS ---
+
+    def count_expired(self, today):
+        """Cantidad de documentos vencidos (fecha anterior a hoy)."""
+        with self._lock:
+            return bisect.bisect_left(self._fechas, today, key=lambda par: par[0])
+
+    def count_expiring(self, today, days):
+        """Cantidad de documentos que vencen entre hoy y hoy + `days` (inclusive)."""
+        with self._lock:
+            inicio, fin = self._rango(today, days)
+            return fin - inicio
+
+    def expired_ids(self, today):
+        with self._lock:
+            fin = bisect.bisect_left(self._fechas, today, key=lambda par: par[0])
+            return [id_documento for _, id_documento in self._fechas[:fin]]
+
+    def expiring_ids(self, today, days, include_expired=False):
+        """IDs de documentos que vencen dentro de `days` días (opcionalmente, también los vencidos)."""
+        with self._lock:
+            inicio, fin = self._rango(today, days)
+            if include_expired:
+                inicio = 0
+            return [id_documento for _, id_documento in self._fechas[inicio:fin]]
+
+    def status_for_personal(self, id_personal, today, days):
+        """Devuelve {'expired': n, 'expiring_soon': m} para un empleado, o None si no tiene documentos."""
+        with self._lock:
+            fechas = self._por_personal.get(id_personal)
+            if not fechas:
+                return None
+            vencidos = bisect.bisect_left(fechas, today)
+            hasta = bisect.bisect_right(fechas, date.fromordinal(today.toordinal() + days))
+            return {'expired': vencidos, 'expiring_soon': hasta - vencidos}
+
+    def status_summary(self, today, days, personal_ids=None):
+        """Resumen por empleado como {id_personal: {'expired', 'expiring_soon'}} (todos o los indicados)."""
+        with self._lock:
+            ids = self._por_personal.keys() if personal_ids is None else personal_ids
+            resumen = {}
+            for id_personal in ids:
+                estado = self.status_for_personal(id_personal, today, days)
+                if estado is not None:
+                    resumen[id_personal] = estado
+            return resumen
+
+    def _rango(self, today, days):
+        limite = date.fromordinal(today.toordinal() + days)
+        clave = lambda par: par[0]
+        inicio = bisect.bisect_left(self._fechas, today, key=clave)
+        fin = bisect.bisect_right(self._fechas, limite, key=clave)
+        return inicio, fin
@@ -0,0 +1,101 @@
+# RUTA: app/utils/legajo_cache.py
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimar_bytes(valor):
+    """Estima el tamaño en memoria de una estructura de diccionarios, listas y valores simples."""
+    tamanio = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        tamanio += sum(estimar_bytes(k) + estimar_bytes(v) for k, v in valor.items())
+    elif isinstance(valor, (list, tuple, set)):
+        tamanio += sum(estimar_bytes(v) for v in valor)
+    return tamanio
+
+
+class LegajoCache:
+    """
+    Caché LRU en memoria de datos de legajo, agrupados por id_personal y acotada por bytes.
+
+    Cada empleado tiene una entrada con varias claves (legajo completo, cabecera, secciones),
+    de modo que una escritura sobre el legajo invalida todo lo de esa persona de una sola vez.
+    Las entradas caducan tras `ttl_seconds` para acotar la desactualización frente a
+    cambios hechos por otros procesos. Los valores devueltos se comparten entre peticiones
+    y no deben modificarse.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl_seconds=120):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # id_personal -> {'creado': t, 'bytes': n, 'valores': {clave: valor}}
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, id_personal, clave):
+        """Devuelve el valor cacheado o None; una lectura marca la entrada como reciente."""
+        with self._lock:
+            entrada = self._entradas.get(id_personal)
+            if entrada is not None and time.monotonic() - entrada['creado'] > self.ttl_seconds:
+                self._quitar(id_personal)
+                entrada = None
+            if entrada is None or clave not in entrada['valores']:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(id_personal)
+            self.hits += 1
+            return entrada['valores'][clave]
+
+    def set(self, id_personal, clave, valor):
+        if valor is None:
+            return
+        tamanio = estimar_bytes(valor)
+        if tamanio > self.max_bytes:
+            return
+        with self._lock:
+            entrada = self._entradas.get(id_personal)
+            if entrada is None:
+                entrada = {'creado': time.monotonic(), 'bytes': 0, 'valores': {}}
+                self._entradas[id_personal] = entrada
+            anterior = entrada['valores'].get(clave)
+            if anterior is not None:
+                anterior_bytes = estimar_bytes(anterior)
+                entrada['bytes'] -= anterior_bytes
+                self._bytes -= anterior_bytes
+            entrada['valores'][clave] = valor
+            entrada['bytes'] += tamanio
+            self._bytes += tamanio
+            self._entradas.move_to_end(id_personal)
+            # Se expulsan los legajos menos usados hasta volver al límite de bytes.
+            while self._bytes > self.max_bytes and self._entradas:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidate(self, id_personal):
+        """Descarta todo lo cacheado de un empleado."""
+        with self._lock:
+            self._quitar(id_personal)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'legajos': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _quitar(self, id_personal):
+        entrada = self._entradas.pop(id_personal, None)
+        if entrada is not None:
+            self._bytes -= entrada['bytes']
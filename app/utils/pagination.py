@@ -1,5 +1,6 @@
 # Importa la librería math para la operación de techo (ceiling).
 import math
+from datetime import datetime
 
 # Define una clase simple para manejar la lógica de la paginación.
 class SimplePagination:
@@ -45,4 +46,32 @@ class SimplePagination:
                 if last + 1 != num:
                     yield None
                 yield num
-                last = num
\ No newline at end of file
+                last = num
+
+# Página de resultados por cursor (keyset): en lugar de un número de página se usa la clave
+# (fecha_hora, id) del último registro visto, de modo que cualquier página cuesta lo mismo.
+class KeysetPagination:
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor=None, prev_cursor=None,
+                 total=None, total_is_approximate=False):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_approximate = total_is_approximate
+
+    # El cursor es texto apto para URL: 'AAAAMMDDhhmmssffffff-id'.
+    @staticmethod
+    def encode_cursor(fecha_hora, id_registro):
+        return f"{fecha_hora:%Y%m%d%H%M%S%f}-{id_registro}"
+
+    # Devuelve (fecha_hora, id) o None si el cursor no es válido.
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            fecha, id_registro = cursor.split('-', 1)
+            return datetime.strptime(fecha, '%Y%m%d%H%M%S%f'), int(id_registro)
+        except (AttributeError, ValueError):
+            return None
@@ -0,0 +1,65 @@
+# RUTA: app/utils/rate_limiter.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """
+    Limitador por clave con cubetas de fichas: cada clave dispone de `capacity` fichas que se
+    reponen a razón de `refill_per_minute`. Solo guarda las `max_keys` claves usadas más
+    recientemente para acotar la memoria.
+    """
+
+    def __init__(self, capacity, refill_per_minute, max_keys=10000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_minute / 60.0
+        self.max_keys = max_keys
+        self._cubetas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        """Consume una ficha. Devuelve (permitido, segundos_hasta_la_próxima_ficha)."""
+        ahora = time.monotonic()
+        with self._lock:
+            fichas, ultima = self._cubetas.pop(key, (self.capacity, ahora))
+            fichas = min(self.capacity, fichas + (ahora - ultima) * self.refill_per_second)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            self._cubetas[key] = (fichas, ahora)
+            while len(self._cubetas) > self.max_keys:
+                self._cubetas.popitem(last=False)
+        if permitido:
+            return True, 0
+        espera = (1 - fichas) / self.refill_per_second if self.refill_per_second else None
+        return False, espera
+
+
+class LoginRateLimiter:
+    """Límites de intentos de inicio de sesión por IP y por nombre de usuario, con métricas."""
+
+    def __init__(self, ip_capacity=20, ip_per_minute=10, user_capacity=5, user_per_minute=2):
+        self._por_ip = TokenBucketLimiter(ip_capacity, ip_per_minute)
+        self._por_usuario = TokenBucketLimiter(user_capacity, user_per_minute)
+        self._lock = threading.Lock()
+        self._metricas = {'permitidos': 0, 'rechazados_por_ip': 0, 'rechazados_por_usuario': 0}
+
+    def check(self, ip, username):
+        """
+        Registra un intento y devuelve (permitido, segundos_de_espera). Se evalúa primero la IP
+        para que un bot que prueba muchos usuarios no consuma las fichas de cada uno.
+        """
+        permitido, espera = self._por_ip.consume(ip or 'desconocida')
+        motivo = 'rechazados_por_ip'
+        if permitido and username:
+            permitido, espera = self._por_usuario.consume(username.strip().lower())
+            motivo = 'rechazados_por_usuario'
+        with self._lock:
+            self._metricas['permitidos' if permitido else motivo] += 1
+        return permitido, espera
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metricas)
@@ -0,0 +1,277 @@
+# RUTA: app/utils/search_index.py
+
+# Importa las librerías para normalizar texto, búsquedas binarias y sincronización entre hilos.
+import bisect
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+
+def normalizar_texto(texto):
+    """
+    Convierte un texto a minúsculas y elimina tildes y diéresis (ej. 'Núñez' -> 'nunez').
+    La 'ñ' se reduce a 'n' para tolerar teclados sin esa letra.
+    """
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """Divide un texto normalizado en palabras alfanuméricas."""
+    normalizado = normalizar_texto(texto)
+    limpio = ''.join(c if c.isalnum() else ' ' for c in normalizado)
+    return limpio.split()
+
+
+def _trigramas(token):
+    # Se rellena con espacios para que el inicio y el fin de la palabra pesen en la similitud.
+    relleno = f"  {token} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class PersonalSearchIndex:
+    """
+    Índice de búsqueda en memoria sobre nombres, apellidos y DNI del personal.
+
+    Mantiene un vocabulario ordenado (búsqueda por prefijo con bisect), un índice
+    invertido de trigramas sobre el vocabulario (búsqueda difusa tolerante a errores
+    de tipeo) y una lista ordenada de DNIs. Se actualiza de forma incremental con
+    `upsert` y `remove`, y todas las operaciones están protegidas por un candado.
+    """
+
+    # Puntuaciones relativas para ordenar los resultados.
+    SCORE_EXACTO = 1.0
+    SCORE_PREFIJO = 0.8
+    SCORE_DIFUSO = 0.6
+    # Similitud mínima (coeficiente de Dice sobre trigramas) para aceptar un término difuso.
+    UMBRAL_DIFUSO = 0.5
+    # Límite de términos del vocabulario que puede expandir un prefijo corto.
+    MAX_EXPANSION_PREFIJO = 500
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._token_ids = defaultdict(set)
+        self._vocabulario = []
+        self._trigrama_tokens = defaultdict(set)
+        self._dnis = []
+        self.cargado_en = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    # --- CONSTRUCCIÓN Y MANTENIMIENTO ---
+
+    def build(self, registros, cargado_en=None):
+        """Reconstruye el índice completo a partir de una lista de diccionarios de personal."""
+        nuevo = PersonalSearchIndex()
+        # En la carga masiva se agregan sin ordenar y se ordena una sola vez al final.
+        for registro in registros:
+            nuevo._agregar(registro, ordenado=False)
+        nuevo._vocabulario.sort()
+        nuevo._dnis.sort()
+        with self._lock:
+            self._docs = nuevo._docs
+            self._token_ids = nuevo._token_ids
+            self._vocabulario = nuevo._vocabulario
+            self._trigrama_tokens = nuevo._trigrama_tokens
+            self._dnis = nuevo._dnis
+            self.cargado_en = cargado_en
+
+    def upsert(self, registro):
+        """Inserta o reemplaza los datos de una persona en el índice."""
+        with self._lock:
+            self._quitar(registro['id_personal'])
+            self._agregar(registro)
+
+    def set_activo(self, id_personal, activo):
+        """Actualiza solo el estado (activo/inactivo) sin reindexar los términos."""
+        with self._lock:
+            doc = self._docs.get(id_personal)
+            if doc:
+                doc['activo'] = bool(activo)
+
+    def remove(self, id_personal):
+        """Elimina a una persona del índice."""
+        with self._lock:
+            self._quitar(id_personal)
+
+    def _agregar(self, registro, ordenado=True):
+        id_personal = registro['id_personal']
+        dni = str(registro.get('dni') or '').strip()
+        tokens = tuple(tokenizar(f"{registro.get('nombres') or ''} {registro.get('apellidos') or ''}"))
+        self._docs[id_personal] = {
+            'id_personal': id_personal,
+            'dni': dni,
+            'nombres': registro.get('nombres'),
+            'apellidos': registro.get('apellidos'),
+            'activo': bool(registro.get('activo', True)),
+            'tokens': tokens,
+            'orden': normalizar_texto(f"{registro.get('apellidos') or ''} {registro.get('nombres') or ''}"),
+        }
+        for token in set(tokens):
+            if token not in self._token_ids:
+                if ordenado:
+                    bisect.insort(self._vocabulario, token)
+                else:
+                    self._vocabulario.append(token)
+                for trigrama in _trigramas(token):
+                    self._trigrama_tokens[trigrama].add(token)
+            self._token_ids[token].add(id_personal)
+        if dni:
+            if ordenado:
+                bisect.insort(self._dnis, (dni, id_personal))
+            else:
+                self._dnis.append((dni, id_personal))
+
+    def _quitar(self, id_personal):
+        doc = self._docs.pop(id_personal, None)
+        if not doc:
+            return
+        for token in set(doc['tokens']):
+            ids = self._token_ids.get(token)
+            if ids is None:
+                continue
+            ids.discard(id_personal)
+            if not ids:
+                # El término ya no pertenece a nadie: se retira del vocabulario y de los trigramas.
+                del self._token_ids[token]
+                posicion = bisect.bisect_left(self._vocabulario, token)
+                if posicion < len(self._vocabulario) and self._vocabulario[posicion] == token:
+                    del self._vocabulario[posicion]
+                for trigrama in _trigramas(token):
+                    tokens = self._trigrama_tokens.get(trigrama)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigrama_tokens[trigrama]
+        if doc['dni']:
+            posicion = bisect.bisect_left(self._dnis, (doc['dni'], id_personal))
+            if posicion < len(self._dnis) and self._dnis[posicion] == (doc['dni'], id_personal):
+                del self._dnis[posicion]
+
+    # --- CONSULTAS ---
+
+    def contains_dni(self, dni):
+        """Indica si algún registro del índice tiene exactamente ese DNI."""
+        dni = str(dni or '').strip()
+        with self._lock:
+            posicion = bisect.bisect_left(self._dnis, (dni,))
+            return posicion < len(self._dnis) and self._dnis[posicion][0] == dni
+
+    def get(self, id_personal):
+        """Devuelve los datos indexados de una persona (sin los términos internos)."""
+        with self._lock:
+            doc = self._docs.get(id_personal)
+            return self._publico(doc) if doc else None
+
+    def search(self, texto=None, dni=None, limit=None, solo_activos=False):
+        """
+        Busca personal por nombre/apellidos (exacto, prefijo y difuso) y/o por prefijo de DNI.
+        Todas las palabras de la consulta deben coincidir con algún término de la persona.
+        Devuelve una lista de tuplas (id_personal, puntuación) ordenada por relevancia.
+        """
+        palabras = tokenizar(texto)
+        dni = str(dni or '').strip()
+        if not palabras and not dni:
+            return []
+
+        with self._lock:
+            puntuaciones = None
+            if dni:
+                puntuaciones = {id_personal: self.SCORE_EXACTO for id_personal in self._ids_por_prefijo_dni(dni)}
+
+            for palabra in palabras:
+                # Una palabra numérica en el buscador de nombres se interpreta como DNI.
+                if palabra.isdigit():
+                    coincidencias = {id_personal: self.SCORE_EXACTO for id_personal in self._ids_por_prefijo_dni(palabra)}
+                else:
+                    coincidencias = self._puntuar_palabra(palabra)
+                if puntuaciones is None:
+                    puntuaciones = coincidencias
+                else:
+                    puntuaciones = {
+                        id_personal: puntuacion + coincidencias[id_personal]
+                        for id_personal, puntuacion in puntuaciones.items()
+                        if id_personal in coincidencias
+                    }
+                if not puntuaciones:
+                    return []
+
+            resultados = [
+                (id_personal, puntuacion)
+                for id_personal, puntuacion in puntuaciones.items()
+                if not solo_activos or self._docs[id_personal]['activo']
+            ]
+            clave = lambda par: (-par[1], self._docs[par[0]]['orden'])
+            # Con límite basta una selección parcial; sin él se ordena todo (paginación).
+            if limit:
+                return heapq.nsmallest(limit, resultados, key=clave)
+            resultados.sort(key=clave)
+        return resultados
+
+    def suggest(self, texto, limit=10, solo_activos=True):
+        """Devuelve los primeros resultados con sus datos, pensado para autocompletado."""
+        resultados = self.search(texto, limit=limit, solo_activos=solo_activos)
+        with self._lock:
+            sugerencias = []
+            for id_personal, puntuacion in resultados:
+                doc = self._docs.get(id_personal)
+                if doc:
+                    sugerencia = self._publico(doc)
+                    sugerencia['score'] = round(puntuacion, 3)
+                    sugerencias.append(sugerencia)
+            return sugerencias
+
+    def _ids_por_prefijo_dni(self, prefijo):
+        ids = set()
+        posicion = bisect.bisect_left(self._dnis, (prefijo,))
+        while posicion < len(self._dnis) and self._dnis[posicion][0].startswith(prefijo):
+            ids.add(self._dnis[posicion][1])
+            posicion += 1
+        return ids
+
+    def _puntuar_palabra(self, palabra):
+        # Calcula la mejor puntuación de cada término del vocabulario para esta palabra.
+        puntuacion_termino = {}
+
+        posicion = bisect.bisect_left(self._vocabulario, palabra)
+        fin = min(len(self._vocabulario), posicion + self.MAX_EXPANSION_PREFIJO)
+        while posicion < fin and self._vocabulario[posicion].startswith(palabra):
+            termino = self._vocabulario[posicion]
+            puntuacion_termino[termino] = self.SCORE_EXACTO if termino == palabra else self.SCORE_PREFIJO
+            posicion += 1
+
+        if len(palabra) >= 3:
+            trigramas_palabra = _trigramas(palabra)
+            compartidos = defaultdict(int)
+            for trigrama in trigramas_palabra:
+                for termino in self._trigrama_tokens.get(trigrama, ()):
+                    compartidos[termino] += 1
+            for termino, cantidad in compartidos.items():
+                if termino in puntuacion_termino:
+                    continue
+                similitud = 2.0 * cantidad / (len(trigramas_palabra) + len(termino) + 1)
+                if similitud >= self.UMBRAL_DIFUSO:
+                    puntuacion_termino[termino] = self.SCORE_DIFUSO * similitud
+
+        # Cada persona conserva la mejor puntuación entre sus términos coincidentes.
+        coincidencias = {}
+        for termino, puntuacion in puntuacion_termino.items():
+            for id_personal in self._token_ids.get(termino, ()):
+                if puntuacion > coincidencias.get(id_personal, 0):
+                    coincidencias[id_personal] = puntuacion
+        return coincidencias
+
+    @staticmethod
+    def _publico(doc):
+        return {
+            'id_personal': doc['id_personal'],
+            'dni': doc['dni'],
+            'nombres': doc['nombres'],
+            'apellidos': doc['apellidos'],
+            'activo': doc['activo'],
+        }
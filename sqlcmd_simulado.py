@@ -0,0 +1,82 @@
+# Sustituto local de sqlcmd para probar las copias de seguridad sin SQL Server.
+#
+# Uso: en el archivo .env, BACKUP_SQLCMD_STANDIN="python sqlcmd_simulado.py"
+# (y BACKUP_DIR apuntando a una carpeta local). Recibe los mismos argumentos que sqlcmd y
+# entiende las consultas que envía SqlServerBackupRepository:
+#   - BACKUP DATABASE/LOG ... TO DISK = N'...'[, DISK = N'...']: escribe cada banda con datos
+#     aleatorios e informa el avance como sqlcmd ('N percent processed.').
+#   - RESTORE VERIFYONLY FROM DISK = ...: falla si falta alguna banda o está vacía.
+#   - SELECT ... msdb.dbo.backupset ...: devuelve los tamaños de los archivos del backup.
+# Variables opcionales: SQLCMD_SIMULADO_MB (tamaño por banda, 1) y SQLCMD_SIMULADO_PAUSA
+# (segundos entre avances, 0.2), para simular backups más lentos o más grandes.
+
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+PATRON_DISCO = re.compile(r"DISK\s*=\s*N'([^']+)'", re.IGNORECASE)
+PATRON_DISPOSITIVO = re.compile(r"physical_device_name\s*=\s*N'([^']+)'", re.IGNORECASE)
+
+
+def _backup(consulta):
+    rutas = PATRON_DISCO.findall(consulta)
+    tamano = int(float(os.environ.get('SQLCMD_SIMULADO_MB', 1)) * 1024 * 1024)
+    pausa = float(os.environ.get('SQLCMD_SIMULADO_PAUSA', 0.2))
+    for ruta in rutas:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(os.urandom(tamano))
+    for porcentaje in range(10, 101, 10):
+        time.sleep(pausa)
+        print(f"{porcentaje} percent processed.", flush=True)
+    print(f"BACKUP successfully processed {len(rutas)} file(s) (simulado).")
+    return 0
+
+
+def _verificar(consulta):
+    for ruta in PATRON_DISCO.findall(consulta):
+        if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+            print(f"Msg 3201, Level 16: Cannot open backup device '{ruta}' (simulado).")
+            return 1
+    print("The backup set on file 1 is valid.")
+    return 0
+
+
+def _metadatos(consulta):
+    coincidencia = PATRON_DISPOSITIVO.search(consulta)
+    if not coincidencia or not os.path.exists(coincidencia.group(1)):
+        return 0
+    # Las demás bandas del mismo backup comparten el nombre y cambian solo en el sufijo _<n>de<total>.
+    ruta = coincidencia.group(1)
+    bandas = re.match(r'^(.*)_1de(\d+)(\.\w+)$', ruta)
+    if bandas:
+        prefijo, total_bandas, extension = bandas.groups()
+        rutas = [f"{prefijo}_{n}de{total_bandas}{extension}" for n in range(1, int(total_bandas) + 1)]
+    else:
+        rutas = [ruta]
+    total = sum(os.path.getsize(r) for r in rutas if os.path.exists(r))
+    fecha = datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat(timespec='milliseconds')
+    print(f"{total * 3}|{total}|{fecha}|{fecha}")
+    return 0
+
+
+def main(argumentos):
+    if '-Q' not in argumentos:
+        print("sqlcmd_simulado: falta -Q <consulta>")
+        return 1
+    consulta = argumentos[argumentos.index('-Q') + 1]
+    instruccion = consulta.upper()
+    if 'BACKUP ' in instruccion and ' TO DISK' in instruccion:
+        return _backup(consulta)
+    if 'RESTORE VERIFYONLY' in instruccion:
+        return _verificar(consulta)
+    if 'MSDB.DBO.BACKUPSET' in instruccion:
+        return _metadatos(consulta)
+    print(f"sqlcmd_simulado: consulta no soportada: {consulta}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
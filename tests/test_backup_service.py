@@ -0,0 +1,186 @@
+# RUTA: tests/test_backup_service.py
+# Pruebas del plan de backups (due_backup_type) y de la retención (prune_backups).
+# Se ejecutan desde la raíz del proyecto con: python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from app.application.services.backup_service import BackupService
+from app.infrastructure.persistence.backup_catalog import BackupCatalog
+
+# 18/10/2026 es domingo (día de FULL por defecto) y 19/10/2026, lunes.
+DOMINGO = datetime(2026, 10, 18)
+LUNES = datetime(2026, 10, 19)
+
+
+class BackupServiceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta, ignore_errors=True)
+        contexto = Flask(__name__).app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+
+    def crear_servicio(self, **config):
+        config = dict({'BACKUP_DIR': self.carpeta, 'BACKUP_FULL_WEEKDAYS': [6], 'BACKUP_FULL_HOUR': 2}, **config)
+        return BackupService(None, config, None)
+
+    def registrar(self, servicio, tipo, fecha, estado='completado'):
+        """Agrega al catálogo un backup con su archivo en disco; devuelve la entrada."""
+        extension = BackupService.EXTENSIONES[tipo]
+        ruta = os.path.join(self.carpeta, f"Legajo_{tipo}_{fecha:%Y%m%d_%H%M%S}.{extension}")
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'backup')
+        entrada = {
+            'id': uuid.uuid4().hex,
+            'fecha': fecha.isoformat(timespec='seconds'),
+            'tipo': tipo,
+            'archivos': [ruta],
+            'estado': estado,
+        }
+        servicio.catalog.add(entrada)
+        return entrada
+
+
+class DueBackupTypeTests(BackupServiceTestCase):
+
+    def test_sin_backups_corresponde_full(self):
+        servicio = self.crear_servicio()
+        self.assertEqual(servicio.due_backup_type(LUNES.replace(hour=3)), 'FULL')
+
+    def test_antes_de_la_hora_no_corresponde_nada(self):
+        servicio = self.crear_servicio()
+        self.assertIsNone(servicio.due_backup_type(LUNES.replace(hour=1)))
+
+    def test_full_en_el_dia_configurado(self):
+        servicio = self.crear_servicio()
+        self.registrar(servicio, 'FULL', DOMINGO - timedelta(days=7, hours=-2))
+        self.assertEqual(servicio.due_backup_type(DOMINGO.replace(hour=3)), 'FULL')
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2))
+        self.assertIsNone(servicio.due_backup_type(DOMINGO.replace(hour=4)))
+
+    def test_diferencial_los_demas_dias(self):
+        servicio = self.crear_servicio()
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2))
+        self.assertEqual(servicio.due_backup_type(LUNES.replace(hour=3)), 'DIFERENCIAL')
+        self.registrar(servicio, 'DIFERENCIAL', LUNES.replace(hour=3))
+        self.assertIsNone(servicio.due_backup_type(LUNES.replace(hour=4)))
+
+    def test_sin_diferenciales_no_corresponde_nada_fuera_del_dia_de_full(self):
+        servicio = self.crear_servicio(BACKUP_DIFFERENTIAL_ENABLED=False)
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2))
+        self.assertIsNone(servicio.due_backup_type(LUNES.replace(hour=3)))
+
+    def test_full_fallido_no_se_reintenta_el_mismo_dia(self):
+        servicio = self.crear_servicio()
+        self.registrar(servicio, 'FULL', LUNES.replace(hour=2), estado='error')
+        self.assertIsNone(servicio.due_backup_type(LUNES.replace(hour=5)))
+        self.assertEqual(servicio.due_backup_type(LUNES + timedelta(days=1, hours=3)), 'FULL')
+
+    def test_log_cada_intervalo(self):
+        servicio = self.crear_servicio(BACKUP_LOG_INTERVAL_MINUTES=15)
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2))
+        self.assertIsNone(servicio.due_backup_type(DOMINGO.replace(hour=2, minute=10)))
+        self.assertEqual(servicio.due_backup_type(DOMINGO.replace(hour=2, minute=20)), 'LOG')
+        self.registrar(servicio, 'LOG', DOMINGO.replace(hour=2, minute=20))
+        self.assertIsNone(servicio.due_backup_type(DOMINGO.replace(hour=2, minute=30)))
+
+    def test_log_sin_full_correcto_no_corresponde(self):
+        servicio = self.crear_servicio(BACKUP_LOG_INTERVAL_MINUTES=15)
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2), estado='error')
+        self.assertIsNone(servicio.due_backup_type(DOMINGO.replace(hour=3)))
+
+    def test_catalogo_lleno_conserva_el_full_de_la_cadena(self):
+        # Con más LOG que max_entries, el FULL sigue siendo la base: no se vuelve a pedir un FULL.
+        servicio = self.crear_servicio(BACKUP_LOG_INTERVAL_MINUTES=15)
+        servicio.catalog = BackupCatalog(servicio.catalog.path, max_entries=10)
+        self.registrar(servicio, 'FULL', DOMINGO.replace(hour=2))
+        for n in range(1, 31):
+            self.registrar(servicio, 'LOG', DOMINGO.replace(hour=2) + timedelta(minutes=15 * n))
+        self.assertEqual(len(servicio.catalog.list()), 31)
+        self.assertEqual(servicio.due_backup_type(DOMINGO.replace(hour=10)), 'LOG')
+
+
+class PruneBackupsTests(BackupServiceTestCase):
+
+    def test_conserva_el_ultimo_full_anterior_al_corte_y_lo_posterior(self):
+        servicio = self.crear_servicio()
+        antiguo = self.registrar(servicio, 'FULL', LUNES - timedelta(days=20))
+        log_antiguo = self.registrar(servicio, 'LOG', LUNES - timedelta(days=15))
+        base = self.registrar(servicio, 'FULL', LUNES - timedelta(days=10))
+        diferencial = self.registrar(servicio, 'DIFERENCIAL', LUNES - timedelta(days=9))
+        reciente = self.registrar(servicio, 'FULL', LUNES - timedelta(days=3))
+
+        resultado = servicio.prune_backups(retention_days=7, now=LUNES)
+
+        self.assertEqual(resultado['archivos'], 2)
+        for entrada in (antiguo, log_antiguo):
+            self.assertFalse(os.path.exists(entrada['archivos'][0]))
+        for entrada in (base, diferencial, reciente):
+            self.assertTrue(os.path.exists(entrada['archivos'][0]))
+        eliminados = {e['id'] for e in servicio.catalog.list() if e.get('eliminado')}
+        self.assertEqual(eliminados, {antiguo['id'], log_antiguo['id']})
+
+    def test_sin_full_anterior_al_corte_no_elimina_nada(self):
+        servicio = self.crear_servicio()
+        full = self.registrar(servicio, 'FULL', LUNES - timedelta(days=3))
+        log = self.registrar(servicio, 'LOG', LUNES - timedelta(days=2))
+        resultado = servicio.prune_backups(retention_days=7, now=LUNES)
+        self.assertEqual(resultado, {'archivos': 0, 'bytes': 0})
+        self.assertTrue(os.path.exists(full['archivos'][0]))
+        self.assertTrue(os.path.exists(log['archivos'][0]))
+
+    def test_un_full_fallido_no_es_base(self):
+        servicio = self.crear_servicio()
+        base = self.registrar(servicio, 'FULL', LUNES - timedelta(days=20))
+        fallido = self.registrar(servicio, 'FULL', LUNES - timedelta(days=10), estado='error')
+        resultado = servicio.prune_backups(retention_days=7, now=LUNES)
+        self.assertEqual(resultado['archivos'], 0)
+        self.assertTrue(os.path.exists(base['archivos'][0]))
+        self.assertTrue(os.path.exists(fallido['archivos'][0]))
+
+    def test_elimina_archivos_sin_catalogo_anteriores_a_la_base(self):
+        servicio = self.crear_servicio()
+        self.registrar(servicio, 'FULL', LUNES - timedelta(days=10))
+        huerfano = os.path.join(self.carpeta, 'Legajo_FULL_antiguo.bak')
+        ajeno = os.path.join(self.carpeta, 'otra_base.bak')
+        huerfano_reciente = os.path.join(self.carpeta, 'Legajo_LOG_reciente.trn')
+        for ruta, dias in ((huerfano, 30), (ajeno, 30), (huerfano_reciente, 1)):
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'x')
+            marca = (LUNES - timedelta(days=dias)).timestamp()
+            os.utime(ruta, (marca, marca))
+
+        resultado = servicio.prune_backups(retention_days=7, now=LUNES)
+
+        self.assertEqual(resultado['archivos'], 1)
+        self.assertFalse(os.path.exists(huerfano))
+        self.assertTrue(os.path.exists(ajeno))
+        self.assertTrue(os.path.exists(huerfano_reciente))
+
+    def test_catalogo_recortado_conserva_la_base(self):
+        # Al superar max_entries solo se descartan las entradas cuyos archivos ya se eliminaron.
+        servicio = self.crear_servicio()
+        servicio.catalog = BackupCatalog(servicio.catalog.path, max_entries=4)
+        self.registrar(servicio, 'FULL', LUNES - timedelta(days=30))
+        self.registrar(servicio, 'LOG', LUNES - timedelta(days=25))
+        base = self.registrar(servicio, 'FULL', LUNES - timedelta(days=10))
+        servicio.prune_backups(retention_days=7, now=LUNES)
+        for dias in (9, 8, 6, 5):
+            self.registrar(servicio, 'LOG', LUNES - timedelta(days=dias))
+
+        ids = [e['id'] for e in servicio.catalog.list()]
+        self.assertEqual(len(ids), 5)
+        self.assertIn(base['id'], ids)
+        self.assertEqual(servicio.prune_backups(retention_days=7, now=LUNES)['archivos'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()